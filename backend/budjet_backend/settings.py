@@ -90,6 +90,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Any backend works; use a shared one (file, redis, memcached) when running
+# several worker processes so they see the same data versions.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'budjet-backend',
+    }
+}
+
+# Per-user dashboard response cache (see receipts/cache.py)
+DASHBOARD_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,  # Seconds; entries are also invalidated by data writes
+    'IGNORED_PARAMS': ('_t', '_'),  # Cache-buster query parameters left out of cache keys and ETags
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,6 +165,55 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Keyset pagination for list endpoints (see receipts/pagination.py)
+LIST_PAGINATION = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 500,  # Upper bound for ?page_size=
+}
+
+# Rows fetched per database round trip by the streaming data export
+EXPORT_CHUNK_SIZE = 2000
+
+# In-memory merchant autocomplete (see receipts/autocomplete.py)
+MERCHANT_AUTOCOMPLETE = {
+    'MAX_USERS': 1000,  # Per-user indexes kept in each process
+    'HALF_LIFE_DAYS': 30,  # A merchant's weight halves for every 30 days it goes unused
+}
+
+# Per-user recent activity feed (see receipts/activity.py)
+ACTIVITY_FEED = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,  # Upper bound for ?page_size=
+    'HEAD_SIZE': 50,  # Newest entries cached per user
+    'CACHE_TIMEOUT': 600,
+}
+
+# In-process cache of chat answers (see receipts/chat_cache.py)
+CHAT_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1000,  # Least recently used answers are evicted beyond this
+}
+
+# Background jobs such as account data deletion (see receipts/jobs.py)
+BACKGROUND_JOBS = {
+    'RUN_INLINE': False,  # Run in the request thread instead of a worker thread
+    'DELETE_CHUNK_SIZE': 1000,  # Rows deleted per transaction
+    'STALE_AFTER': 3600,  # Seconds before an unfinished job may be started again
+}
+
+# Django admin on large tables (see receipts/admin_performance.py)
+ADMIN_PERFORMANCE = {
+    'ENABLED': True,
+    'SUMMARY_TIMEOUT': 300,  # Seconds the admin summary panels are cached
+    'ESTIMATED_COUNT_THRESHOLD': 10000,  # Unfiltered changelists above this many rows show PostgreSQL's estimated count
+}
+
+# Reporting currency and exchange rates (see receipts/currency.py)
+CURRENCY = {
+    'BASE': 'NPR',  # Totals are reported in this currency unless ?currency= asks for another
+    'RATES_FILE': BASE_DIR / 'exchange_rates.json',  # Default file for the load_exchange_rates command
+}
+
 # JWT Settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -178,6 +248,22 @@ LLM_SETTINGS = {
     'API_URL': 'https://api.openai.com/v1',  # OpenAI API endpoint
     'DEFAULT_MODEL': 'gpt-3.5-turbo',  # Using GPT-3.5 Turbo model
     'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY'),  # Get from .env file
+    'HEALTH_CHECK_TTL': 300,  # Seconds a successful availability check is reused per process
+    'HEALTH_CHECK_TIMEOUT': 5,
+    'CIRCUIT_BREAKER': {
+        'FAILURE_THRESHOLD': 3,  # Consecutive failures before calls are skipped
+        'RESET_TIMEOUT': 60,  # Seconds before a trial call is let through again
+    },
+    # Shared keep-alive HTTP session for LLM calls (see receipts/llm_transport.py)
+    'TRANSPORT': {
+        'POOL_SIZE': 10,  # Open connections kept per host
+        'MAX_RETRIES': 2,  # Retries on 429/5xx and connection errors
+        'BACKOFF_BASE': 0.5,  # Seconds; doubled per retry, with full jitter
+        'BACKOFF_MAX': 8,
+        'CONNECT_TIMEOUT': 5,
+        'DEADLINE': 30,  # Seconds for a whole request, retries included
+        'ASYNC_MAX_CONNECTIONS': 200,  # Concurrent LLM requests per event loop (AsyncChatView)
+    },
 }
 
 # OpenAI Configuration
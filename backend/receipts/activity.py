@@ -0,0 +1,197 @@
+"""
+Recent Activity
+===============
+
+A newest-first feed of a user's expenses, transactions and uploads
+(receipts whose transaction has no date yet).
+
+Each source is read with a keyset query that fetches at most one page
+from an index: ``(user, -date, -id)`` on expenses and transactions, and a
+partial ``(user, -created_at, -id)`` index over undated transactions for
+uploads. The three sorted streams are merged with ``heapq.merge``, so a
+page costs three short index range scans however much history the user
+has.
+
+Entries sort on ``(date, kind, created_at, id)``, descending; an upload is
+dated the day it was uploaded. A cursor is the key of the last entry of a
+page.
+
+The first ``ACTIVITY_FEED['HEAD_SIZE']`` entries of each user's feed are
+kept in the Django cache under the user's data version, so the dashboard
+and the first pages of the feed don't query at all until the user's data
+changes.
+"""
+
+import base64
+import heapq
+import json
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cache import data_version_token, get_cache
+from .models import Expense, Transaction
+
+EXPENSE = 'expense'
+TRANSACTION = 'transaction'
+UPLOAD = 'upload'
+
+# Order of the kinds among entries of the same date, lowest last
+KIND_RANK = {UPLOAD: 0, TRANSACTION: 1, EXPENSE: 2}
+
+TITLE_LENGTH = 50
+
+
+def _activity_settings():
+    return getattr(settings, 'ACTIVITY_FEED', {})
+
+
+def entry_key(entry: Dict) -> Tuple:
+    """Sort key of a feed entry; the feed is in descending key order"""
+    created_at = entry['created_at'] if entry['type'] == UPLOAD else None
+    return entry['date'], KIND_RANK[entry['type']], created_at, entry['id']
+
+
+def encode_cursor(key: Tuple) -> str:
+    day, rank, created_at, pk = key
+    kind = next(kind for kind, kind_rank in KIND_RANK.items() if kind_rank == rank)
+    payload = json.dumps([day.isoformat(), kind, created_at.isoformat() if created_at else None, pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(encoded: str) -> Tuple:
+    """Inverse of ``encode_cursor``; raises ``ValueError`` for a bad token"""
+    try:
+        padded = encoded + '=' * (-len(encoded) % 4)
+        day, kind, created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        day = parse_date(day)
+        created_at = parse_datetime(created_at) if created_at else None
+        if day is None or kind not in KIND_RANK or (kind == UPLOAD and created_at is None):
+            raise ValueError
+        return day, KIND_RANK[kind], created_at, int(pk)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _title(text: Optional[str]) -> str:
+    text = (text or '').strip()
+    return text[:TITLE_LENGTH] + '...' if len(text) > TITLE_LENGTH else text
+
+
+def _start_of_day(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _dated_after(kind: str, cursor: Optional[Tuple]) -> Q:
+    """Rows of a source keyed on ``date`` that sort after ``cursor``"""
+    if cursor is None:
+        return Q()
+    day, rank, _, pk = cursor
+    if KIND_RANK[kind] < rank:
+        return Q(date__lte=day)
+    if KIND_RANK[kind] > rank:
+        return Q(date__lt=day)
+    return Q(date__lt=day) | Q(date=day, id__lt=pk)
+
+
+def _uploaded_after(cursor: Optional[Tuple]) -> Q:
+    """Uploads that sort after ``cursor``; their date is the upload day"""
+    if cursor is None:
+        return Q()
+    day, rank, created_at, pk = cursor
+    if KIND_RANK[UPLOAD] < rank:
+        return Q(created_at__lt=_start_of_day(day + timedelta(days=1)))
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def _expenses(user_id, cursor, limit):
+    rows = Expense.objects.filter(_dated_after(EXPENSE, cursor), user_id=user_id)\
+                          .order_by('-date', '-id')\
+                          .values('id', 'date', 'merchant', 'amount', 'currency', 'category__name', 'created_at')
+    for row in rows[:limit]:
+        yield {
+            'type': EXPENSE,
+            'id': row['id'],
+            'date': row['date'],
+            'title': _title(row['merchant']),
+            'amount': row['amount'],
+            'currency': row['currency'],
+            'category': row['category__name'],
+            'created_at': row['created_at'],
+        }
+
+
+def _transactions(user_id, cursor, limit):
+    rows = Transaction.objects.filter(_dated_after(TRANSACTION, cursor), user_id=user_id, date__isnull=False)\
+                              .order_by('-date', '-id')\
+                              .values('id', 'date', 'description', 'amount', 'category', 'created_at')
+    for row in rows[:limit]:
+        yield {
+            'type': TRANSACTION,
+            'id': row['id'],
+            'date': row['date'],
+            'title': _title(row['description']),
+            'amount': row['amount'],
+            'currency': None,  # Transactions are recorded in the base currency
+            'category': row['category'] or None,
+            'created_at': row['created_at'],
+        }
+
+
+def _uploads(user_id, cursor, limit):
+    rows = Transaction.objects.filter(_uploaded_after(cursor), user_id=user_id, date__isnull=True)\
+                              .order_by('-created_at', '-id')\
+                              .values('id', 'description', 'amount', 'category', 'created_at')
+    for row in rows[:limit]:
+        yield {
+            'type': UPLOAD,
+            'id': row['id'],
+            'date': timezone.localdate(row['created_at']),
+            'title': _title(row['description']),
+            'amount': row['amount'],
+            'currency': None,
+            'category': row['category'] or None,
+            'created_at': row['created_at'],
+        }
+
+
+def _merged(user_id, cursor: Optional[Tuple], count: int) -> List[Dict]:
+    """The ``count`` entries after ``cursor``, merged from every source"""
+    sources = [source(user_id, cursor, count) for source in (_expenses, _transactions, _uploads)]
+    return list(islice(heapq.merge(*sources, key=entry_key, reverse=True), count))
+
+
+def _head(user_id) -> Dict:
+    """The newest entries of the feed, cached until the user's data changes"""
+    cache = get_cache()
+    key = f'receipts:activity:{user_id}:{data_version_token(user_id)}'
+    head = cache.get(key)
+    if head is None:
+        size = _activity_settings().get('HEAD_SIZE', 50)
+        entries = _merged(user_id, None, size + 1)
+        head = {'entries': entries[:size], 'complete': len(entries) <= size}
+        cache.set(key, head, _activity_settings().get('CACHE_TIMEOUT', 600))
+    return head
+
+
+def get_activity(user, cursor: Optional[Tuple] = None, limit: int = 20) -> Tuple[List[Dict], bool]:
+    """
+    A page of ``user``'s feed: up to ``limit`` entries after ``cursor``
+    (a decoded cursor, or None for the newest), and whether there are more.
+    """
+    head = _head(user.pk)
+    entries = head['entries']
+    position = 0
+    if cursor is not None:
+        position = next((index for index, entry in enumerate(entries) if entry_key(entry) < cursor), len(entries))
+    if head['complete'] or position + limit < len(entries):
+        page = entries[position:position + limit]
+        return page, position + limit < len(entries)
+
+    page = _merged(user.pk, cursor, limit + 1)
+    return page[:limit], len(page) > limit
@@ -1,107 +1,108 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from django.db.models import Sum
-from django.utils import timezone
-from .models import Transaction, Expense, Category, PaymentMethod, Budget, MonthlyIncome
-from django.db import models
+from .models import Transaction, Expense, Category, PaymentMethod, Budget, MonthlyIncome, Merchant, MerchantAlias, ExchangeRate
+from .currency import base_currency
+from .admin_performance import AutocompleteFilterMixin, CategoryFilter, PerformanceAdminMixin, UserFilter, summary_totals
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'description', 'amount', 'category', 'date', 'created_at')
     search_fields = ('description', 'category')
     list_filter = ('category', 'date', 'created_at')
     ordering = ('-created_at',)
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'date', 'merchant', 'amount', 'currency', 'category', 'payment_method', 'description', 'created_at')
+    list_select_related = ('user', 'category', 'payment_method')
     search_fields = ('merchant', 'description')
-    list_filter = ('category', 'user', 'date', 'created_at')
+    list_filter = (CategoryFilter, UserFilter, 'date', 'created_at')
+    autocomplete_fields = ('user', 'category', 'payment_method', 'vendor')
     ordering = ('-date',)
     readonly_fields = ('total_expense_summary',)
 
     def total_expense_summary(self, obj=None):
-        from django.utils import timezone
-        from django.db.models import Sum
-        now = timezone.now()
-        total_expenses = Expense.objects.filter(
-            date__year=now.year, date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        from django.utils.html import format_html
+        totals = summary_totals()
         return format_html(
-            "<h3 style='color:#b91c1c;'>Total Expenses (This Month): <strong>{} NPR</strong></h3>",
-            total_expenses
+            "<h3 style='color:#b91c1c;'>Total Expenses (This Month): <strong>{} {}</strong></h3>",
+            totals['total_expenses'], base_currency()
         )
     total_expense_summary.short_description = "Total Expenses (This Month)"
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'user')
+    list_select_related = ('user',)
     search_fields = ('name',)
-    list_filter = ('user',)
+    list_filter = (UserFilter,)
 
 @admin.register(PaymentMethod)
 class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ('id', 'name')
     search_fields = ('name',)
 
+class MerchantAliasInline(admin.TabularInline):
+    model = MerchantAlias
+    extra = 1
+
+@admin.register(Merchant)
+class MerchantAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'normalized_name', 'created_at')
+    search_fields = ('name', 'normalized_name', 'aliases__alias')
+    ordering = ('normalized_name',)
+    inlines = [MerchantAliasInline]
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'rate', 'as_of', 'updated_at')
+    search_fields = ('currency',)
+    ordering = ('currency',)
+
 @admin.register(Budget)
-class BudgetAdmin(admin.ModelAdmin):
+class BudgetAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'category', 'amount', 'currency', 'month', 'year')
+    list_select_related = ('user', 'category')
     search_fields = ('user__username', 'category__name')
-    list_filter = ('user', 'category', 'month', 'year')
+    list_filter = (UserFilter, CategoryFilter, 'month', 'year')
+    autocomplete_fields = ('user', 'category')
     readonly_fields = ('dashboard_summary',)
 
     def dashboard_summary(self, obj=None):
-        from django.utils import timezone
-        from django.db.models import Sum
-        from .models import MonthlyIncome, Expense, Budget
-        now = timezone.now()
-        monthly_income = MonthlyIncome.objects.filter(
-            month=now.month, year=now.year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        total_budgeted = Budget.objects.aggregate(total=Sum('amount'))['total'] or 0
-        total_spent = Expense.objects.filter(
-            date__year=now.year, date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        totals = summary_totals()
+        monthly_income = totals['monthly_income']
+        total_budgeted = totals['total_budgeted']
+        total_spent = totals['total_expenses']
         remaining = monthly_income - total_spent
-        from django.utils.html import format_html
         return format_html(
             "<ul>"
-            "<li><strong>Monthly Income:</strong> {} NPR</li>"
-            "<li><strong>Total Budgeted:</strong> {} NPR</li>"
-            "<li><strong>Total Spent:</strong> {} NPR</li>"
-            "<li><strong>Remaining:</strong> {} NPR</li>"
+            "<li><strong>Monthly Income:</strong> {1} {0}</li>"
+            "<li><strong>Total Budgeted:</strong> {2} {0}</li>"
+            "<li><strong>Total Spent:</strong> {3} {0}</li>"
+            "<li><strong>Remaining:</strong> {4} {0}</li>"
             "</ul>",
-            monthly_income, total_budgeted, total_spent, remaining
+            base_currency(), monthly_income, total_budgeted, total_spent, remaining
         )
     dashboard_summary.short_description = "Dashboard Summary"
 
 @admin.register(MonthlyIncome)
-class MonthlyIncomeAdmin(admin.ModelAdmin):
+class MonthlyIncomeAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'month', 'year', 'created_at')
+    list_select_related = ('user',)
     search_fields = ('user__username',)
     list_filter = ('month', 'year')
+    autocomplete_fields = ('user',)
     readonly_fields = ('summary',)
 
     def summary(self, obj=None):
-        from django.utils import timezone
-        from django.db.models import Sum
-        from .models import Expense, Budget, MonthlyIncome
-        now = timezone.now()
-        monthly_income = MonthlyIncome.objects.filter(
-            month=now.month, year=now.year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses = Expense.objects.filter(
-            date__year=now.year, date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        totals = summary_totals()
+        monthly_income = totals['monthly_income']
+        total_expenses = totals['total_expenses']
         saving_rate = ((monthly_income - total_expenses) / monthly_income * 100) if monthly_income else 0
-        total_budgeted = Budget.objects.aggregate(total=Sum('amount'))['total'] or 0
+        total_budgeted = totals['total_budgeted']
         budget_score = 100
         if total_budgeted:
             percent_spent = (total_expenses / total_budgeted) * 100
             budget_score = max(0, 100 - max(0, percent_spent - 100))
-        from django.utils.html import format_html
         return format_html(
             "<ul>"
             "<li><strong>Total Expenses:</strong> {}</li>"
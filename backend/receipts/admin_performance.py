@@ -0,0 +1,185 @@
+"""
+Admin Performance
+=================
+
+Keeps the Django admin responsive on large tables. Tuned with
+``ADMIN_PERFORMANCE`` in settings.
+
+- Summary panels share one set of totals, computed with one aggregate
+  query per table and cached for ``SUMMARY_TIMEOUT`` seconds, instead of
+  summing whole tables on every page render. The cached totals are keyed
+  on the global data version and on a version bumped with every user's,
+  so new exchange rates and any expense, budget or income write show up
+  at once; the timeout only bounds how long a new month takes to show.
+- On PostgreSQL, changelists page unfiltered querysets larger than
+  ``ESTIMATED_COUNT_THRESHOLD`` rows with the planner's row estimate
+  instead of ``COUNT(*)``; other databases keep the exact count. Either
+  way the second full count behind "x of y selected" is skipped.
+- User and category filters are the admin's autocomplete select, searched
+  through the related admin's ``search_fields`` as the user types, rather
+  than sidebar lists of every user and category.
+"""
+
+from typing import Dict, Optional
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .cache import get_all_users_data_version, get_cache, get_global_data_version
+from .currency import sum_in
+from .models import Budget, Expense, MonthlyIncome
+from .periods import date_range_filter, month_range
+
+SUMMARY_KEY = 'receipts:admin-summary'
+
+
+def _admin_settings():
+    return getattr(settings, 'ADMIN_PERFORMANCE', {})
+
+
+def _enabled() -> bool:
+    return _admin_settings().get('ENABLED', True)
+
+
+def _compute_summary() -> Dict:
+    now = timezone.now()
+    return {
+        'monthly_income': MonthlyIncome.objects.filter(month=now.month, year=now.year)
+                                               .aggregate(total=Sum('amount'))['total'] or 0,
+        'total_expenses': Expense.objects.filter(**date_range_filter(month_range(now.year, now.month)))
+                                         .aggregate(total=sum_in())['total'] or 0,
+        'total_budgeted': Budget.objects.aggregate(total=sum_in())['total'] or 0,
+        'computed_at': now,
+    }
+
+
+def summary_totals() -> Dict:
+    """This month's income and expenses and the budgeted total, cached"""
+    if not _enabled():
+        return _compute_summary()
+    cache = get_cache()
+    key = f'{SUMMARY_KEY}:{get_global_data_version()}:{get_all_users_data_version()}'
+    totals = cache.get(key)
+    if totals is None:
+        totals = _compute_summary()
+        cache.set(key, totals, _admin_settings().get('SUMMARY_TIMEOUT', 300))
+    return totals
+
+
+def estimated_row_count(model) -> Optional[int]:
+    """
+    Cheap approximation of a table's row count, or None where the database
+    has none (anything but PostgreSQL)
+    """
+    connection = connections[model.objects.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 until the table has been analyzed
+    if row and row[0] >= 0:
+        return row[0]
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the row estimate for large unfiltered querysets"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if _enabled() and isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate >= _admin_settings().get('ESTIMATED_COUNT_THRESHOLD', 10000):
+                return estimate
+        return super().count
+
+
+class AutocompleteFilterMixin:
+    """Loads the select2 assets for the changelist's ``AutocompleteFilter``s"""
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(spec, type) and issubclass(spec, AutocompleteFilter) for spec in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+
+class PerformanceAdminMixin(AutocompleteFilterMixin):
+    """Changelist settings for admins over large tables"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class InputFilter(admin.SimpleListFilter):
+    """List filter rendered as a text box, filtering ``lookup`` for an exact match"""
+    template = 'admin/receipts/input_filter.html'
+    lookup = None
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value:
+            return queryset.filter(**{self.lookup: value})
+        return queryset
+
+    def choices(self, changelist):
+        # The filter form submits a new GET, so every other parameter is carried along
+        hidden = [
+            (name, value)
+            for name, values in changelist.params.items()
+            if name not in (self.parameter_name, 'p')
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield {
+            'value': self.value() or '',
+            'hidden': hidden,
+            'reset_query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+class AutocompleteFilter(InputFilter):
+    """
+    List filter on the ``field_name`` foreign key, rendered as the admin's
+    autocomplete select. The related model's admin needs ``search_fields``.
+    """
+    template = 'admin/receipts/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        field = model._meta.get_field(self.field_name)
+        self.title = field.verbose_name
+        self.parameter_name = self.lookup = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        self.form_field = forms.ModelChoiceField(
+            field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'onchange': 'this.form.submit()'}),
+        )
+
+    def widget(self):
+        return self.form_field.widget.render(self.parameter_name, self.value(), attrs={
+            'id': f'filter_{self.parameter_name}', 'aria-label': self.title,
+        })
+
+
+class UserFilter(AutocompleteFilter):
+    field_name = 'user'
+
+
+class CategoryFilter(AutocompleteFilter):
+    field_name = 'category'
@@ -0,0 +1,259 @@
+"""
+Spending Analytics
+==================
+
+Vectorized trend, anomaly, seasonality and projection analysis over
+month x category spending matrices.
+
+Spending for one user, or for a batch of users, is read from the ledger
+view, converted to the base currency, in a single grouped query and pivoted with pandas into a matrix with
+one row per month (oldest first, current month last) and one column per
+category. The statistics are then plain NumPy array operations, so a batch
+job costs one query and a few array passes per user instead of one Python
+loop per category per month.
+
+Results are stored as ``SpendingInsight`` rows and served by the insights
+endpoint; they are recomputed on read when the user's data version has
+moved since.
+"""
+
+import calendar
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .cache import data_version_token
+from .currency import sum_in
+from .models import LedgerEntry, SpendingInsight
+from .periods import months_back_range
+
+# Months of history analysed; two years so seasonality can be estimated
+DEFAULT_MONTHS = 24
+
+# |z| at or above this is reported as an anomaly
+ANOMALY_Z = 2.0
+
+# Recent months checked for anomalies (the current month is projected first)
+ANOMALY_MONTHS = 3
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+def month_index(today: date, months: int) -> pd.PeriodIndex:
+    """The ``months`` months ending with the current one, oldest first"""
+    return pd.period_range(end=pd.Period(today, freq='M'), periods=months, freq='M')
+
+
+def spending_frame(user_ids: Optional[Iterable[int]], today: date, months: int) -> pd.DataFrame:
+    """Long frame of (user_id, period, category, total) from one ledger query"""
+    entries = LedgerEntry.objects.in_period(months_back_range(today, months))
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=list(user_ids))
+    rows = entries.annotate(period=TruncMonth('date'))\
+                  .values('user_id', 'period', 'category')\
+                  .annotate(total=sum_in())\
+                  .order_by()
+    frame = pd.DataFrame.from_records(list(rows), columns=['user_id', 'period', 'category', 'total'])
+    frame['category'] = frame['category'].fillna(UNCATEGORIZED)
+    frame['total'] = frame['total'].astype(float)
+    frame['period'] = pd.PeriodIndex(pd.to_datetime(frame['period']), freq='M') if len(frame) else frame['period']
+    return frame
+
+
+def spending_matrix(frame: pd.DataFrame, index: pd.PeriodIndex) -> pd.DataFrame:
+    """Pivot one user's rows into a months x categories matrix, zero-filled"""
+    if frame.empty:
+        return pd.DataFrame(index=index, dtype=float)
+    matrix = frame.pivot_table(index='period', columns='category', values='total', aggfunc='sum', fill_value=0.0)
+    return matrix.reindex(index, fill_value=0.0)
+
+
+def _slopes(values: np.ndarray) -> np.ndarray:
+    """Least-squares slope of every column against the row number"""
+    x = np.arange(values.shape[0], dtype=float)
+    x -= x.mean()
+    denominator = (x ** 2).sum()
+    if denominator == 0:
+        return np.zeros(values.shape[1:])
+    return x @ (values - values.mean(axis=0)) / denominator
+
+
+def _round(value) -> float:
+    return round(float(value), 2)
+
+
+def analyze(matrix: pd.DataFrame, today: date) -> Dict:
+    """
+    Trend, category trends, anomalies, seasonality and month-end projection
+    for one user's matrix. The last row is the current, incomplete month.
+    """
+    categories = list(matrix.columns)
+    values = matrix.to_numpy(dtype=float)
+    if values.size == 0:
+        values = np.zeros((len(matrix.index), 0))
+    totals = values.sum(axis=1)
+    # Finished months only, from the user's first month with any spending
+    # so months before they signed up don't drag the averages down
+    start = int(np.argmax(totals[:-1] > 0)) if totals[:-1].any() else len(totals) - 1
+    complete = values[start:-1]
+    complete_totals = totals[start:-1]
+
+    # Month-end projection: spending so far plus the rest of the month at
+    # the pace of the last three complete months
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    remaining = 1 - today.day / days_in_month
+    baseline = complete[-3:].mean(axis=0) if len(complete) else np.zeros(values.shape[1])
+    projected = values[-1] + remaining * baseline
+    projection = {
+        'spent_to_date': _round(totals[-1]),
+        'projected_total': _round(projected.sum()),
+        'baseline': _round(baseline.sum()),
+        'days_elapsed': today.day,
+        'days_in_month': days_in_month,
+        'categories': {
+            category: _round(amount) for category, amount in zip(categories, projected) if amount > 0
+        },
+    }
+
+    # Overall trend: last three complete months against the three before,
+    # plus the fitted slope over all complete months
+    recent = complete_totals[-3:]
+    older = complete_totals[-6:-3]
+    avg_recent = recent.mean() if len(recent) else 0.0
+    avg_older = older.mean() if len(older) else avg_recent
+    change = (avg_recent - avg_older) / avg_older * 100 if avg_older > 0 else 0.0
+    active_months = int((complete_totals > 0).sum())
+    if active_months < 2:
+        trend = {'trend': 'insufficient_data', 'message': 'Need more data to analyze trends'}
+    else:
+        if change > 10:
+            direction, message = 'increasing', f'Your spending has increased by {abs(change):.1f}% compared to previous months'
+        elif change < -10:
+            direction, message = 'decreasing', f'Your spending has decreased by {abs(change):.1f}% compared to previous months'
+        else:
+            direction, message = 'stable', 'Your spending has remained relatively stable'
+        trend = {
+            'trend': direction,
+            'change_percentage': _round(change),
+            'message': message,
+            'avg_recent_spending': _round(avg_recent),
+            'avg_older_spending': _round(avg_older),
+            'slope_per_month': _round(_slopes(complete_totals[:, None])[0]) if len(complete) > 1 else 0.0,
+        }
+
+    # Per-category slope over the last six complete months, all columns at once
+    category_slopes = _slopes(complete[-6:]) if len(complete) > 1 else np.zeros(values.shape[1])
+    category_trends = sorted(
+        (
+            {'category': category, 'slope_per_month': _round(slope), 'average': _round(average)}
+            for category, slope, average in zip(categories, category_slopes, complete[-6:].mean(axis=0) if len(complete) else [])
+            if average > 0
+        ),
+        key=lambda row: abs(row['slope_per_month']),
+        reverse=True
+    )
+
+    # Anomalies: z-score of each recent month (current month projected)
+    # against that category's complete-month history
+    anomalies = []
+    if len(complete) >= 3:
+        mean = complete.mean(axis=0)
+        std = complete.std(axis=0)
+        recent_values = np.vstack([complete[-(ANOMALY_MONTHS - 1):], projected])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.where(std > 0, (recent_values - mean) / std, 0.0)
+        recent_periods = list(matrix.index[-len(recent_values):])
+        for row, column in zip(*np.nonzero(np.abs(z_scores) >= ANOMALY_Z)):
+            anomalies.append({
+                'month': str(recent_periods[row]),
+                'category': categories[column],
+                'amount': _round(recent_values[row, column]),
+                'average': _round(mean[column]),
+                'z_score': _round(z_scores[row, column]),
+                'projected': bool(row == len(recent_values) - 1),
+            })
+        anomalies.sort(key=lambda anomaly: abs(anomaly['z_score']), reverse=True)
+
+    # Seasonality: average spend per calendar month relative to the overall
+    # monthly average; needs a full year of complete months
+    seasonality = None
+    if active_months >= 12:
+        complete_periods = matrix.index[start:-1]
+        by_month = pd.Series(complete_totals, index=complete_periods.month).groupby(level=0).mean()
+        overall = complete_totals.mean()
+        if overall > 0:
+            index = (by_month / overall).round(2)
+            next_month = today.month % 12 + 1
+            seasonality = {
+                'index': {calendar.month_abbr[month]: float(ratio) for month, ratio in index.items()},
+                'next_month': calendar.month_name[next_month],
+                'next_month_index': float(index.get(next_month, 1.0)),
+            }
+
+    return {
+        'months': [str(period) for period in matrix.index],
+        'monthly_totals': [_round(total) for total in totals],
+        'trend': trend,
+        'category_trends': category_trends[:10],
+        'anomalies': anomalies,
+        'seasonality': seasonality,
+        'projection': projection,
+    }
+
+
+def compute_insights(user_ids: Optional[Iterable[int]] = None, months: int = DEFAULT_MONTHS, today: Optional[date] = None) -> Dict[int, Dict]:
+    """Analyses keyed by user id, for ``user_ids`` (or every user with spending)"""
+    today = today or timezone.localdate()
+    index = month_index(today, months)
+    frame = spending_frame(user_ids, today, months)
+    ids = list(user_ids) if user_ids is not None else sorted(frame['user_id'].dropna().unique().tolist())
+    groups = dict(tuple(frame.groupby('user_id'))) if not frame.empty else {}
+    empty = frame.iloc[0:0]
+    return {
+        int(user_id): analyze(spending_matrix(groups.get(user_id, empty), index), today)
+        for user_id in ids
+    }
+
+
+def store_insights(results: Dict[int, Dict], months: int = DEFAULT_MONTHS) -> int:
+    """Upsert SpendingInsight rows for the given results"""
+    now = timezone.now()
+    SpendingInsight.objects.bulk_create(
+        [
+            SpendingInsight(
+                user_id=user_id,
+                months=months,
+                data=data,
+                data_version=data_version_token(user_id),
+                computed_at=now
+            )
+            for user_id, data in results.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['months', 'data', 'data_version', 'computed_at']
+    )
+    return len(results)
+
+
+def refresh_all(batch_size: int = 500, months: int = DEFAULT_MONTHS) -> int:
+    """Recompute insights for every user, ``batch_size`` users per query"""
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    stored = 0
+    for start in range(0, len(user_ids), batch_size):
+        stored += store_insights(compute_insights(user_ids[start:start + batch_size], months), months)
+    return stored
+
+
+def get_user_insights(user, refresh: bool = False) -> SpendingInsight:
+    """The user's stored insights, recomputed first if their data changed"""
+    insight = SpendingInsight.objects.filter(user=user).first()
+    if refresh or insight is None or insight.data_version != data_version_token(user.id):
+        store_insights(compute_insights([user.id]))
+        insight = SpendingInsight.objects.get(user=user)
+    return insight
@@ -0,0 +1,152 @@
+"""
+Merchant Autocomplete
+=====================
+
+In-process prefix index over each user's merchants, so suggestions never
+touch the database while the user types.
+
+Each user's index is a sorted array of normalized keys searched with
+``bisect``; every word of a merchant name starts a key, so "java" finds
+"Himalayan Java Coffee". Suggestions are ranked by how often a merchant
+was used, decayed by how long ago it was last used.
+
+Indexes are built on first use with one grouped query and kept in an LRU
+bounded by ``MERCHANT_AUTOCOMPLETE['MAX_USERS']``. Each index remembers the
+user's merchant version, a counter bumped by expense writes only (budget
+or income changes leave it alone). A different version means some process
+changed the user's expenses, and the index is rebuilt.
+
+A new expense is added in place (see signals.py). The index is then marked
+current only if it was current just before that expense's bump. Otherwise
+it missed another change, such as a deletion elsewhere, and it is left to
+be rebuilt.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .cache import get_merchant_version
+from .merchants import normalize_merchant
+from .models import Expense
+
+
+def _autocomplete_settings():
+    return getattr(settings, 'MERCHANT_AUTOCOMPLETE', {})
+
+
+class MerchantPrefixIndex:
+    """Prefix index over one user's merchants"""
+
+    def __init__(self):
+        self.entries: Dict[str, list] = {}  # normalized name -> [display name, uses, last used]
+        self.keys: List[str] = []  # sorted "word suffix\x00normalized name" keys
+
+    @classmethod
+    def for_user(cls, user_id) -> 'MerchantPrefixIndex':
+        index = cls()
+        rows = Expense.objects.filter(user_id=user_id)\
+                              .values('merchant')\
+                              .annotate(uses=Count('id'), last_used=Max('date'))\
+                              .order_by('-uses')
+        for row in rows:
+            index.add(row['merchant'], row['last_used'], uses=row['uses'])
+        return index
+
+    def add(self, name: str, used_on: Optional[date], uses: int = 1):
+        key = normalize_merchant(name)
+        if not key:
+            return
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [name.strip(), uses, used_on]
+            words = key.split(' ')
+            for position in range(len(words)):
+                insort(self.keys, ' '.join(words[position:]) + '\x00' + key)
+            return
+        entry[1] += uses
+        if used_on and (entry[2] is None or used_on > entry[2]):
+            entry[2] = used_on
+
+    def suggest(self, prefix: str, limit: int = 8, today: Optional[date] = None) -> List[Dict]:
+        prefix = normalize_merchant(prefix)
+        if not prefix:
+            return []
+        today = today or timezone.localdate()
+        half_life = _autocomplete_settings().get('HALF_LIFE_DAYS', 30)
+
+        start = bisect_left(self.keys, prefix)
+        matches = set()
+        for position in range(start, len(self.keys)):
+            candidate = self.keys[position]
+            if not candidate.startswith(prefix):
+                break
+            matches.add(candidate.split('\x00', 1)[1])
+
+        def score(key):
+            _, uses, last_used = self.entries[key]
+            age = (today - last_used).days if last_used else 365
+            return uses * 0.5 ** (max(age, 0) / half_life)
+
+        best = heapq.nlargest(limit, matches, key=lambda key: (score(key), key))
+        return [
+            {
+                'merchant': self.entries[key][0],
+                'uses': self.entries[key][1],
+                'last_used': self.entries[key][2],
+            }
+            for key in best
+        ]
+
+
+_indexes: 'OrderedDict[int, tuple]' = OrderedDict()  # user id -> (data version, index)
+_lock = threading.Lock()
+
+
+def get_index(user_id) -> MerchantPrefixIndex:
+    version = get_merchant_version(user_id)
+    with _lock:
+        cached = _indexes.get(user_id)
+        if cached and cached[0] == version:
+            _indexes.move_to_end(user_id)
+            return cached[1]
+
+    index = MerchantPrefixIndex.for_user(user_id)
+    with _lock:
+        _indexes[user_id] = (version, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > _autocomplete_settings().get('MAX_USERS', 1000):
+            _indexes.popitem(last=False)
+    return index
+
+
+def suggest_merchants(user, prefix: str, limit: int = 8) -> List[Dict]:
+    return get_index(user.id).suggest(prefix, limit)
+
+
+def record_merchant_use(user_id, name: str, used_on: Optional[date], version: int):
+    """
+    Add a new expense to the user's index if it is loaded. ``version`` is
+    the merchant version the expense's save bumped to.
+    """
+    with _lock:
+        cached = _indexes.get(user_id)
+        if cached is None:
+            return
+        if cached[0] != version - 1:
+            # Another change came in between; the next lookup rebuilds
+            return
+        cached[1].add(name, used_on)
+        _indexes[user_id] = (version, cached[1])
+
+
+def forget_user(user_id):
+    with _lock:
+        _indexes.pop(user_id, None)
@@ -0,0 +1,249 @@
+"""
+Per-user Response Cache
+=======================
+
+Dashboard payloads only change when a user adds or edits expenses,
+transactions, budgets or income. Every user has a data-version counter in
+the Django cache which is bumped by model signals (see ``signals.py``).
+Cached responses are keyed by that counter, so a write simply makes the old
+entries unreachable and they expire on their own.
+
+The same version token also drives ``ETag`` / ``If-None-Match`` handling,
+so a client polling unchanged data gets a 304 without any aggregation
+queries being run.
+
+Only ``save()`` and ``delete()`` send the signals. Bulk writes
+(``QuerySet.update()``, ``bulk_create()``, ``_raw_delete()``) don't, so
+code that uses them must bump the affected version itself once it is
+done, as the deletion job (``jobs.py``), ``load_rates`` and
+``backfill_merchants`` do.
+
+Works with any Django cache backend (locmem, file, redis, memcached, ...).
+"""
+
+import functools
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+GLOBAL_VERSION_KEY = 'receipts:data-version:global'
+ALL_USERS_VERSION_KEY = 'receipts:data-version:all-users'
+STATS_KEY_PREFIX = 'receipts:cache-stats'
+
+
+def _cache_settings() -> Dict[str, Any]:
+    return getattr(settings, 'DASHBOARD_CACHE', {})
+
+
+def get_cache():
+    """Return the cache backend used for versions and cached responses"""
+    return caches[_cache_settings().get('CACHE_ALIAS', 'default')]
+
+
+def _user_version_key(user_id) -> str:
+    return f'receipts:data-version:user:{user_id}'
+
+
+def _fresh_version() -> int:
+    # Seeded from the clock so a counter that was evicted never comes back
+    # with a value an old cache entry was stored under.
+    return time.time_ns() // 1000
+
+
+def _get_version(key: str) -> int:
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key) or _fresh_version()
+    return version
+
+
+def _bump_version(key: str) -> int:
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_data_version(user_id) -> int:
+    """Current data version of a user"""
+    return _get_version(_user_version_key(user_id))
+
+
+def bump_data_version(user_id) -> int:
+    """Invalidate everything cached for a user, and totals over all users"""
+    _bump_version(ALL_USERS_VERSION_KEY)
+    return _bump_version(_user_version_key(user_id))
+
+
+def get_all_users_data_version() -> int:
+    """Version bumped with every user's data version, for totals across users (the admin summary)"""
+    return _get_version(ALL_USERS_VERSION_KEY)
+
+
+def _merchant_version_key(user_id) -> str:
+    return f'receipts:merchant-version:user:{user_id}'
+
+
+def get_merchant_version(user_id) -> int:
+    """Version of a user's expenses as far as their merchants go (see autocomplete.py)"""
+    return _get_version(_merchant_version_key(user_id))
+
+
+def bump_merchant_version(user_id) -> int:
+    """Mark a user's merchant autocomplete index stale"""
+    return _bump_version(_merchant_version_key(user_id))
+
+
+def get_global_data_version() -> int:
+    """Version of shared data (categories, payment methods)"""
+    return _get_version(GLOBAL_VERSION_KEY)
+
+
+def bump_global_data_version() -> int:
+    """Invalidate everything that depends on shared data"""
+    return _bump_version(GLOBAL_VERSION_KEY)
+
+
+def data_version_token(user_id) -> str:
+    """
+    Cheap token that changes whenever anything a user's responses depend on
+    changes. Includes today's date because the dashboards are relative to
+    the current month.
+    """
+    return f"{get_global_data_version()}.{get_data_version(user_id)}.{timezone.localdate().isoformat()}"
+
+
+def response_cache_key(namespace: str, request) -> str:
+    """
+    Cache key for a user's response to a GET request. Cache-busting
+    parameters (``IGNORED_PARAMS``, e.g. ``?_t=<timestamp>``) are left out,
+    and the order of the others doesn't matter.
+    """
+    ignored = _cache_settings().get('IGNORED_PARAMS', ('_t', '_'))
+    params = sorted((name, value) for name, values in request.GET.lists() if name not in ignored for value in values)
+    # Hashed so arbitrary query strings stay within memcached's key rules
+    query = hashlib.md5(urlencode(params).encode()).hexdigest() if params else ''
+    return f"receipts:response:{namespace}:{request.user.pk}:{data_version_token(request.user.pk)}:{query}"
+
+
+def _record(namespace: str, outcome: str) -> None:
+    cache = get_cache()
+    key = f'{STATS_KEY_PREFIX}:{namespace}:{outcome}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+_namespaces = set()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for every cached view"""
+    cache = get_cache()
+    stats = {'views': {}, 'hits': 0, 'misses': 0}
+    for namespace in sorted(_namespaces):
+        hits = cache.get(f'{STATS_KEY_PREFIX}:{namespace}:hits', 0)
+        misses = cache.get(f'{STATS_KEY_PREFIX}:{namespace}:misses', 0)
+        stats['views'][namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 2) if hits + misses else 0,
+        }
+        stats['hits'] += hits
+        stats['misses'] += misses
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / total * 100, 2) if total else 0
+    return stats
+
+
+def cache_user_response(namespace: str, timeout: Optional[int] = None):
+    """
+    Cache the data of a successful GET response per user and data version.
+
+    Usage::
+
+        class DashboardSummaryView(APIView):
+            @cache_user_response('dashboard-summary')
+            def get(self, request):
+                ...
+    """
+    _namespaces.add(namespace)
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            config = _cache_settings()
+            if not config.get('ENABLED', True) or not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            # Build the key before computing so that a write racing with this
+            # request stores the result under the already-outdated version.
+            key = response_cache_key(namespace, request)
+            data = cache.get(key)
+            if data is not None:
+                _record(namespace, 'hits')
+                return Response(data)
+
+            _record(namespace, 'misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout if timeout is not None else config.get('TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
+
+
+def response_etag(namespace: str, request) -> str:
+    """Strong ETag derived from the user's data version, not the payload"""
+    digest = hashlib.md5(response_cache_key(namespace, request).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def etag_user_response(namespace: str):
+    """
+    Answer conditional GETs from the data version alone.
+
+    When ``If-None-Match`` carries the current ETag the view is not called at
+    all and a 304 is returned. Otherwise the ETag is attached to the response.
+    Apply it outside ``cache_user_response``.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+
+            etag = response_etag(namespace, request)
+            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+            if if_none_match:
+                client_etags = parse_etags(if_none_match)
+                if '*' in client_etags or etag in client_etags:
+                    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                    response['ETag'] = etag
+                    patch_cache_control(response, private=True, no_cache=True)
+                    return response
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                # Let browsers keep the payload but revalidate on every poll
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
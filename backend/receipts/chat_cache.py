@@ -0,0 +1,140 @@
+"""
+Chat Answer Cache
+=================
+
+Users ask the same few questions over and over ("what did I spend most
+on?", "my savings"). A model answer is kept in an in-process LRU keyed by
+the user and a normalized form of the question, together with a digest
+of the financial context it was generated from.
+
+- While the user's data version (see ``cache.py``) is unchanged, the answer
+  is served straight away, before the context is even built.
+- After a change, the context is rebuilt. If its digest still matches,
+  the answer is reused; otherwise it is a miss and the model is asked
+  again.
+- Entries beyond ``CHAT_CACHE['MAX_ENTRIES']`` are evicted least recently
+  used first.
+
+Only model answers are cached. Rule-based fallbacks are cheap, and caching
+them would hide the model once it is back. Counters are per process.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+# Words that don't change what is being asked
+FILLER_WORDS = frozenset({'please', 'pls', 'kindly', 'can', 'could', 'you', 'tell', 'show', 'me', 'my', 'the', 'a', 'an'})
+NON_WORD = re.compile(r'[^\w]+')
+
+
+def _chat_cache_settings():
+    return getattr(settings, 'CHAT_CACHE', {})
+
+
+def normalize_message(message: str) -> str:
+    """'What did I spend MOST on??' -> 'what did i spend most on'"""
+    text = unicodedata.normalize('NFKC', message or '').lower()
+    words = [word for word in NON_WORD.sub(' ', text).split() if word not in FILLER_WORDS]
+    return ' '.join(words)
+
+
+def context_digest(context: Dict[str, Any], model: str = '') -> str:
+    """Stable digest of the financial context an answer was generated from"""
+    payload = json.dumps(context, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.blake2b(f'{model}\x00{payload}'.encode(), digest_size=16).hexdigest()
+
+
+class ChatAnswerCache:
+    """LRU of (user, normalized question) -> (data version, context digest, answer)"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, user_id, message: str, version: str) -> Optional[str]:
+        """
+        The cached answer if the user's data hasn't changed since it was
+        stored. A question never answered counts as a miss here; a stale one
+        is counted by ``revalidate``.
+        """
+        key = (user_id, normalize_message(message))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def revalidate(self, user_id, message: str, version: str, digest: str) -> Optional[str]:
+        """After a data change: the cached answer if the context is still the same"""
+        key = (user_id, normalize_message(message))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Already counted by lookup()
+                return None
+            if entry[1] != digest:
+                self.misses += 1
+                return None
+            self._entries[key] = (version, digest, entry[2])
+            self._entries.move_to_end(key)
+            self.revalidated += 1
+            return entry[2]
+
+    def store(self, user_id, message: str, version: str, digest: str, answer: str):
+        key = (user_id, normalize_message(message))
+        with self._lock:
+            self._entries[key] = (version, digest, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = self.hits + self.revalidated
+            total = served + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'revalidated_hits': self.revalidated,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(served / total * 100, 2) if total else 0,
+            }
+
+
+_chat_cache = None
+_chat_cache_lock = threading.Lock()
+
+
+def get_chat_cache() -> Optional[ChatAnswerCache]:
+    """The process-wide answer cache, or None when ``CHAT_CACHE['ENABLED']`` is off"""
+    global _chat_cache
+    if not _chat_cache_settings().get('ENABLED', True):
+        return None
+    with _chat_cache_lock:
+        if _chat_cache is None:
+            _chat_cache = ChatAnswerCache(_chat_cache_settings().get('MAX_ENTRIES', 1000))
+        return _chat_cache
@@ -0,0 +1,72 @@
+"""
+Lazy Chat Context
+=================
+
+The chat assistant's view of a user's finances: this month's figures,
+12-month history, yearly and all-time category totals, vendors, budget
+analysis, the forecast and recent transactions. Each section costs its own
+queries, and most answers need only a few sections.
+
+``LazyFinancialContext`` is a read-only mapping whose sections are
+computed on first access and then kept. Consumers declare which sections
+they read (``OpenAIAIService.REQUIRED_SECTIONS``) and ``load()`` those up
+front. A question the prompt answers from this month's figures never runs
+the history, vendor or average queries. The rule-based fallback reads
+every section and so still gets all of them.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+SectionKeys = Union[str, Tuple[str, ...]]
+
+
+class LazyFinancialContext(Mapping):
+    """
+    Mapping of section name -> value, each computed by its loader on first
+    access. A loader is called with the context, so it can read other
+    sections and ``context.user``. A loader registered under a tuple of
+    names computes them together and returns a dict of them. ``values``
+    seeds sections the caller has already computed.
+    """
+
+    def __init__(self, user, loaders: Dict[SectionKeys, Callable[['LazyFinancialContext'], Any]],
+                 values: Optional[Dict[str, Any]] = None):
+        self.user = user
+        self._loaders = {}
+        for keys, loader in loaders.items():
+            for key in (keys if isinstance(keys, tuple) else (keys,)):
+                self._loaders[key] = (keys, loader)
+        self._values = dict(values or {})
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            keys, loader = self._loaders[key]
+            if isinstance(keys, tuple):
+                values = loader(self)
+                self._values.update({name: values[name] for name in keys})
+            else:
+                self._values[key] = loader(self)
+        return self._values[key]
+
+    def __contains__(self, key):
+        # Without this, Mapping would compute the section to answer
+        return key in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def load(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Compute ``keys`` now; returns them as a plain dict"""
+        return {key: self[key] for key in keys if key in self._loaders}
+
+    @property
+    def loaded(self):
+        """Sections computed so far"""
+        return list(self._values)
+
+    def __repr__(self):
+        return f'<LazyFinancialContext user={self.user.pk} loaded={self.loaded}>'
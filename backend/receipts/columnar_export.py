@@ -0,0 +1,172 @@
+"""
+Columnar Export (Apache Arrow / Parquet)
+========================================
+
+Writes expenses and transactions as typed Parquet (or Arrow IPC) files for
+analytics consumers. Each table goes to its own file and rows are written
+one calendar month at a time, so every row group (record batch for Arrow)
+holds a single month and readers can skip months by their statistics.
+
+Requires the optional ``pyarrow`` package.
+"""
+
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Expense, Transaction
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FILE_FORMATS = ('parquet', 'arrow')
+
+
+def _amount_type(model) -> 'pa.DataType':
+    """
+    Decimal type of a model's MoneyField: its minor units are an int64,
+    which has at most 19 digits, with ``exponent`` of them after the point
+    """
+    return pa.decimal128(19, model._meta.get_field('amount').exponent)
+
+
+def _schemas() -> Dict[str, 'pa.Schema']:
+    return {
+        'expenses': pa.schema([
+            ('id', pa.int64()),
+            ('user_id', pa.int64()),
+            ('date', pa.date32()),
+            ('merchant', pa.string()),
+            ('amount', _amount_type(Expense)),
+            ('currency', pa.string()),
+            ('category', pa.string()),
+            ('payment_method', pa.string()),
+            ('description', pa.string()),
+            ('created_at', pa.timestamp('us', tz='UTC')),
+        ]),
+        'transactions': pa.schema([
+            ('id', pa.int64()),
+            ('user_id', pa.int64()),
+            ('date', pa.date32()),
+            ('description', pa.string()),
+            ('amount', _amount_type(Transaction)),
+            ('category', pa.string()),
+            ('created_at', pa.timestamp('us', tz='UTC')),
+        ]),
+    }
+
+
+# table -> (queryset factory, values_list lookups in schema order)
+TABLES = {
+    'expenses': (
+        lambda: Expense.objects.all(),
+        ('id', 'user_id', 'date', 'merchant', 'amount', 'currency', 'category__name', 'payment_method__name', 'description', 'created_at'),
+    ),
+    'transactions': (
+        lambda: Transaction.objects.all(),
+        ('id', 'user_id', 'date', 'description', 'amount', 'category', 'created_at'),
+    ),
+}
+
+
+def is_available() -> bool:
+    return pa is not None
+
+
+def chunk_size() -> int:
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _month_batches(rows: Iterable[tuple], width: int) -> Iterator[List[list]]:
+    """
+    Group date-ordered rows (date in column 2) into per-month column lists.
+    Rows without a date form a final batch of their own.
+    """
+    columns = [[] for _ in range(width)]
+    current = None
+    for row in rows:
+        row_date = row[2]
+        month = (row_date.year, row_date.month) if row_date else None
+        if columns[0] and month != current:
+            yield columns
+            columns = [[] for _ in range(width)]
+        current = month
+        for index, value in enumerate(row):
+            columns[index].append(value)
+    if columns[0]:
+        yield columns
+
+
+def _table_rows(table: str, user=None) -> Iterator[tuple]:
+    queryset_factory, lookups = TABLES[table]
+    queryset = queryset_factory()
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    # date ordering gives month-contiguous row groups; nulls come last
+    queryset = queryset.order_by(F('date').asc(nulls_last=True), 'user_id', 'id')
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size())
+
+
+def write_table(table: str, sink, user=None, file_format: str = 'parquet') -> int:
+    """
+    Write one table to ``sink`` (a path or binary file object) with one row
+    group per month. Returns the number of rows written.
+    """
+    if not is_available():
+        raise RuntimeError('pyarrow not installed')
+    schema = _schemas()[table]
+    written = 0
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    elif file_format == 'arrow':
+        writer = pa.ipc.new_file(sink, schema)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    try:
+        for columns in _month_batches(_table_rows(table, user), len(schema)):
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            if file_format == 'parquet':
+                writer.write_batch(batch, row_group_size=batch.num_rows)
+            else:
+                writer.write_batch(batch)
+            written += batch.num_rows
+    finally:
+        writer.close()
+    return written
+
+
+def export_user_archive(user, file_format: str = 'parquet') -> Tuple['tempfile.SpooledTemporaryFile', Dict[str, int]]:
+    """
+    Zip archive with one file per table for a single user. The archive is
+    spooled to disk once it grows past a few MB and is returned rewound.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    counts = {}
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED) as bundle:
+        for table in TABLES:
+            # Parquet is already compressed, so entries are stored as-is
+            with bundle.open(f'{table}.{file_format}', 'w', force_zip64=True) as member:
+                counts[table] = write_table(table, member, user=user, file_format=file_format)
+    archive.seek(0)
+    return archive, counts
+
+
+def export_all(output_dir, tables: Optional[Iterable[str]] = None, file_format: str = 'parquet') -> Dict[str, int]:
+    """Write every user's rows, one file per table, into ``output_dir``"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for table in tables or TABLES:
+        counts[table] = write_table(table, str(output_dir / f'{table}.{file_format}'), file_format=file_format)
+    return counts
@@ -0,0 +1,186 @@
+"""
+Currency Conversion
+===================
+
+Expenses and budgets are stored in the currency they were entered in.
+Totals are reported in one currency: the base currency
+(``CURRENCY['BASE']``) unless the request asks for another with
+``?currency=``.
+
+Exchange rates live in the ``ExchangeRate`` table, one row per currency
+holding the value of one unit in the base currency. They are loaded from a
+local JSON or CSV file (``load_exchange_rates`` command).
+
+Conversion happens inside the aggregate queries: ``Expense``, ``Budget``
+and ``LedgerEntry`` have a column-less ``fx`` relation joining their
+``currency`` to the rate table, so ``Sum(amount_in(currency))`` is still a
+single query (``sum_in``). Rows whose currency has no rate (and transactions, which
+have no currency) count as base currency.
+
+The rates are also kept in each process, keyed by the global data
+version, for the reporting-currency divisor and for single values.
+"""
+
+import csv
+import functools
+import json
+import threading
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import bump_global_data_version, get_global_data_version
+from .models import ExchangeRate, SpendingForecast
+from .money import MoneyField
+
+ONE = Decimal(1)
+
+
+class UnknownCurrency(ValueError):
+    pass
+
+
+def base_currency() -> str:
+    return getattr(settings, 'CURRENCY', {}).get('BASE', 'NPR')
+
+
+_rates = (None, {})  # (global data version, currency -> rate)
+_lock = threading.Lock()
+
+
+def get_rates() -> Dict[str, Decimal]:
+    """Currency -> value in the base currency, reloaded when rates change"""
+    global _rates
+    version = get_global_data_version()
+    cached_version, rates = _rates
+    if cached_version == version:
+        return rates
+    rates = dict(ExchangeRate.objects.values_list('currency', 'rate'))
+    rates[base_currency()] = ONE
+    with _lock:
+        _rates = (version, rates)
+    return rates
+
+
+def normalize_code(code: Optional[str]) -> str:
+    return (code or '').strip().upper()
+
+
+def rate(code: Optional[str]) -> Decimal:
+    """Value of one unit of ``code`` in the base currency"""
+    code = normalize_code(code) or base_currency()
+    try:
+        return get_rates()[code]
+    except KeyError:
+        raise UnknownCurrency(f"No exchange rate for {code}")
+
+
+def convert(amount, from_code: Optional[str], to_code: Optional[str] = None) -> Decimal:
+    """Convert one amount; an unknown source currency counts as base currency"""
+    if amount is None:
+        return amount
+    rates = get_rates()
+    from_rate = rates.get(normalize_code(from_code), ONE)
+    return (Decimal(amount) * from_rate / rate(to_code)).quantize(Decimal('0.01'))
+
+
+def amount_in(code: Optional[str] = None, field: str = 'amount', joined: bool = True):
+    """
+    ``field`` converted to ``code`` (default: base currency) through the
+    ``fx`` join, for use inside ``Sum()`` and other expressions. Pass
+    ``joined=False`` for models without a currency (amounts in base).
+    """
+    expression = F(field) * Coalesce(F('fx__rate'), Value(ONE)) if joined else F(field)
+    divisor = rate(code)
+    if divisor != ONE:
+        # Multiplied by the inverse: SQLite stores whole-number decimals as
+        # integers and would divide them as integers
+        expression = expression * Value(ONE / divisor)
+    # Still minor units; MoneyField rounds them to whole ones when read back
+    return ExpressionWrapper(expression, output_field=MoneyField())
+
+
+def sum_in(code: Optional[str] = None, field: str = 'amount', joined: bool = True):
+    """``Sum()`` of ``amount_in()``"""
+    return Sum(amount_in(code, field, joined), output_field=MoneyField())
+
+
+def with_reporting_currency(view_method):
+    """
+    Pass the request's reporting currency to a view method as ``currency``;
+    a 400 for a currency without a rate. Apply it inside the caching
+    decorators.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            currency = reporting_currency(request)
+        except UnknownCurrency as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return view_method(self, request, *args, currency=currency, **kwargs)
+    return wrapper
+
+
+def reporting_currency(request) -> str:
+    """
+    The ``currency`` query parameter, or the base currency. Raises
+    ``UnknownCurrency`` if there is no rate for it.
+    """
+    code = normalize_code(request.query_params.get('currency')) or base_currency()
+    rate(code)
+    return code
+
+
+def read_rates_file(path) -> Dict[str, Decimal]:
+    """
+    Parse a rates file into currency -> value in the base currency.
+
+    JSON: ``{"base": "USD", "rates": {"NPR": 133.2, "EUR": 0.92}}``, units
+    of each currency per one unit of ``base`` (the format of most rate
+    APIs); ``base`` defaults to the base currency.
+    CSV: ``currency,rate`` rows giving the value of one unit in the base
+    currency.
+    """
+    path = Path(path)
+    base = base_currency()
+    try:
+        if path.suffix.lower() == '.csv':
+            with path.open(newline='') as handle:
+                rows = [row for row in csv.reader(handle) if row and not row[0].startswith('#')]
+            if rows and rows[0][0].strip().lower() == 'currency':
+                rows = rows[1:]
+            return {normalize_code(code): Decimal(value.strip()) for code, value, *_ in rows}
+
+        with path.open() as handle:
+            data = json.load(handle)
+        quoted = {normalize_code(code): Decimal(str(value)) for code, value in data['rates'].items()}
+        quote_base = normalize_code(data.get('base')) or base
+        quoted[quote_base] = ONE
+        if base not in quoted:
+            raise ValueError(f"Rates are quoted against {quote_base} and do not include {base}")
+        return {code: quoted[base] / value for code, value in quoted.items() if value}
+    except (KeyError, InvalidOperation, ValueError) as e:
+        raise ValueError(f"Invalid rates file {path}: {e}")
+
+
+def load_rates(rates: Dict[str, Decimal], as_of=None) -> int:
+    """Upsert exchange rates and invalidate everything computed from the old ones"""
+    as_of = as_of or timezone.localdate()
+    ExchangeRate.objects.bulk_create(
+        [ExchangeRate(currency=code, rate=value, as_of=as_of) for code, value in rates.items()],
+        update_conflicts=True,
+        unique_fields=['currency'],
+        update_fields=['rate', 'as_of', 'updated_at']
+    )
+    # Cached responses, insights and the in-process rates are keyed on it
+    bump_global_data_version()
+    # Forecast rows are running sums in the base currency; rebuild on read
+    SpendingForecast.objects.all().delete()
+    return len(rates)
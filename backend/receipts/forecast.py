@@ -0,0 +1,210 @@
+"""
+Month-End Spending Forecast
+===========================
+
+Projects each category's month-end spending from its daily run-rate this
+month, blended with the average of the previous months.
+
+The inputs live in ``SpendingForecast`` rows: month-to-date spending and
+the historical baseline per category, plus a total row. They are built
+from the ledger the first time a user's month is read, then kept current
+by signals that add each saved or deleted row's amount, converted to the
+base currency, with an F() expression. Reading a forecast is one indexed query for the month's rows
+and one for its budgets, whatever the amount of history.
+
+Rows are keyed by category name. Renaming or deleting a category moves
+spending between names without any expense being saved, so the months of
+every user with a row under the old name are discarded
+(``discard_category``) and rebuilt from the ledger on the next read. Bulk
+writes that change amounts, dates or categories (``QuerySet.update()``,
+``_raw_delete()``) must discard the affected users' rows the same way, as
+the deletion job and ``load_rates`` do.
+"""
+
+import calendar
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import get_global_data_version
+from .currency import base_currency, rate, sum_in
+from .models import Budget, Category, LedgerEntry, SpendingForecast
+from .periods import month_range
+
+# Complete months averaged into the baseline
+BASELINE_MONTHS = 3
+
+# Projected spending above this share of the budget is flagged
+AT_RISK_RATIO = Decimal('0.9')
+
+
+def _previous_months_range(year: int, month: int, months: int):
+    start_year, start_month = year, month - months
+    while start_month <= 0:
+        start_month += 12
+        start_year -= 1
+    start, _ = month_range(start_year, start_month)
+    end, _ = month_range(year, month)
+    return start, end
+
+
+def baselines(user_id, year: int, month: int) -> Dict[str, Decimal]:
+    """Average monthly spending per category over the previous complete months"""
+    rows = LedgerEntry.objects.for_user(user_id)\
+                              .in_period(_previous_months_range(year, month, BASELINE_MONTHS))\
+                              .category_totals()
+    return {(row['category'] or ''): (row['total'] or 0) / BASELINE_MONTHS for row in rows}
+
+
+def initialize_month(user_id, year: int, month: int):
+    """Build the month's forecast rows from the ledger"""
+    spent = {
+        (row['category'] or ''): row['total'] or 0
+        for row in LedgerEntry.objects.for_user(user_id).in_month(year, month).category_totals()
+    }
+    history = baselines(user_id, year, month)
+    rows = [
+        SpendingForecast(
+            user_id=user_id, year=year, month=month, category=category,
+            spent_to_date=spent.get(category, 0), baseline=history.get(category, 0)
+        )
+        for category in set(spent) | set(history)
+    ]
+    rows.append(SpendingForecast(
+        user_id=user_id, year=year, month=month, category=SpendingForecast.TOTAL,
+        spent_to_date=sum(spent.values(), Decimal(0)), baseline=sum(history.values(), Decimal(0))
+    ))
+    with transaction.atomic():
+        SpendingForecast.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def apply_delta(user_id, day: Optional[date], category: Optional[str], amount):
+    """
+    Add ``amount`` (negative to remove) to a month's running totals. Months
+    that have not been read yet are skipped; they are built from the
+    ledger on first read.
+    """
+    if not user_id or not day or not amount:
+        return
+    rows = SpendingForecast.objects.filter(user_id=user_id, year=day.year, month=day.month)
+    if not rows.filter(category=SpendingForecast.TOTAL).update(spent_to_date=F('spent_to_date') + amount):
+        return
+
+    category = category or ''
+    if rows.filter(category=category).update(spent_to_date=F('spent_to_date') + amount):
+        return
+    # First spending in this category this month
+    baseline = baselines(user_id, day.year, day.month).get(category, 0)
+    try:
+        with transaction.atomic():
+            SpendingForecast.objects.create(
+                user_id=user_id, year=day.year, month=day.month, category=category,
+                spent_to_date=amount, baseline=baseline
+            )
+    except IntegrityError:
+        rows.filter(category=category).update(spent_to_date=F('spent_to_date') + amount)
+
+
+def discard_category(name: str):
+    """Drop the forecast rows of every user with spending under category ``name``"""
+    user_ids = list(SpendingForecast.objects.filter(category=name).values_list('user_id', flat=True).distinct())
+    if user_ids:
+        SpendingForecast.objects.filter(user_id__in=user_ids).delete()
+
+
+_category_names = (None, {})  # (global data version, category id -> name)
+
+
+def category_name(category_id) -> str:
+    """
+    Name of a category, remembered per process until categories change
+    (any change bumps the global data version), so saving an expense
+    doesn't query for it
+    """
+    global _category_names
+    if not category_id:
+        return ''
+    version = get_global_data_version()
+    cached_version, names = _category_names
+    if cached_version != version:
+        names = {}
+        _category_names = (version, names)
+    if category_id not in names:
+        names[category_id] = Category.objects.filter(pk=category_id).values_list('name', flat=True).first() or ''
+    return names[category_id]
+
+
+def _project(spent: Decimal, baseline: Decimal, elapsed: Decimal) -> Decimal:
+    """
+    Blend the run-rate projection (spent / elapsed share of the month) with
+    spent + the baseline for the rest of the month, trusting the run-rate
+    more as the month goes on.
+    """
+    if elapsed <= 0:
+        return baseline
+    run_rate = spent / elapsed
+    historical = spent + (1 - elapsed) * baseline
+    return elapsed * run_rate + (1 - elapsed) * historical
+
+
+def get_forecast(user, today: Optional[date] = None, currency: Optional[str] = None) -> Dict:
+    """
+    Month-end projection per category and in total, with budget status,
+    in ``currency`` (default: the base currency)
+    """
+    today = today or timezone.localdate()
+    currency = currency or base_currency()
+    divisor = rate(currency)
+    rows = list(SpendingForecast.objects.filter(user=user, year=today.year, month=today.month))
+    if not any(row.category == SpendingForecast.TOTAL for row in rows):
+        initialize_month(user.id, today.year, today.month)
+        rows = list(SpendingForecast.objects.filter(user=user, year=today.year, month=today.month))
+
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    elapsed = Decimal(today.day) / Decimal(days_in_month)
+    budgets = {
+        (row['category__name'] or ''): row['total']
+        for row in Budget.objects.filter(user=user, year=today.year, month=today.month)
+                                 .values('category__name')
+                                 .annotate(total=sum_in())
+    }
+
+    def describe(row):
+        projected = _project(row.spent_to_date, row.baseline, elapsed)
+        budget = budgets.get(row.category) if row.category != SpendingForecast.TOTAL else (sum(budgets.values()) or None)
+        status = None
+        if budget:
+            if projected > budget:
+                status = 'over'
+            elif projected > budget * AT_RISK_RATIO:
+                status = 'at_risk'
+            else:
+                status = 'on_track'
+        return {
+            'spent_to_date': round(float(row.spent_to_date / divisor), 2),
+            'baseline': round(float(row.baseline / divisor), 2),
+            'projected': round(float(projected / divisor), 2),
+            'budget': round(float(budget / divisor), 2) if budget else None,
+            'status': status,
+        }
+
+    total = next(row for row in rows if row.category == SpendingForecast.TOTAL)
+    categories = [
+        {'category': row.category or 'Uncategorized', **describe(row)}
+        for row in rows
+        if row.category != SpendingForecast.TOTAL and (row.spent_to_date or row.baseline)
+    ]
+    categories.sort(key=lambda row: row['projected'], reverse=True)
+    return {
+        'year': today.year,
+        'month': today.month,
+        'currency': currency,
+        'days_elapsed': today.day,
+        'days_in_month': days_in_month,
+        'total': describe(total),
+        'categories': categories,
+    }
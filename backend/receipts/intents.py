@@ -0,0 +1,213 @@
+"""
+Chat Intent Router
+==================
+
+Factual questions ("what did I spend most on?", "how much have I saved?",
+"my income this month") have one right answer, and it is already in the
+month's aggregates. They are answered here, before the chat answer cache
+and the model. Only open-ended questions reach the LLM.
+
+Classification uses patterns compiled once at import and costs a few
+microseconds per message:
+
+1. A single regular expression holds every intent's keywords as named
+   alternatives. One scan of the message yields the candidate intents.
+2. Each candidate's small confirming pattern must also match. More
+   specific intents win over general ones ("spent most" is the top
+   category, not total spending). Income and savings questions must ask
+   for the amount itself ("my income tax" is not one), and rankings must
+   be of categories, not of vendors or single expenses.
+
+A message with an open-ended cue ("why", "how can I", "tips", "compare",
+...), a period other than this month so far ("in march", "last week", "on
+2nd october", "will I", "by the end of the month"), more than
+``MAX_WORDS`` words, or two competing intents is left to the model.
+Counters (per process) record how often an intent answered and so how
+many model calls were avoided.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+from .currency import base_currency
+
+MAX_WORDS = 14
+
+# Keywords that make an intent a candidate
+INTENT_KEYWORDS = {
+    'top_category': ['most', 'highest', 'top', 'biggest', 'largest'],
+    'lowest_category': ['least', 'lowest', 'smallest', 'minimum'],
+    'income': ['income', 'salary', 'earned', 'earnings'],
+    'savings': ['savings', 'saved', 'saving rate', 'savings rate'],
+    'category_total': ['on', 'for'],
+    'total_spending': ['spent', 'spend', 'spending', 'expenses'],
+}
+
+SPENDING = r'\b(?:categor(?:y|ies)|spen[dt]\w*|expens\w*)\b'
+# Rankings of these are about one vendor or expense, not a category
+NOT_CATEGORY = r'\b(?:vendors?|merchants?|shops?|stores?|places?|payees?|transactions?|purchases?|payments?|bills?|items?|expense)\b'
+RANKED_CATEGORY = re.compile(rf'^(?!.*{NOT_CATEGORY}).*{SPENDING}')
+
+# "how much have i", "what s my", "my", ... in front of the amount asked for
+ASKING_FOR = r'^(?:(?:how much|what(?: s| is| was| are| were)?)\s+)?(?:(?:is|was|are|have|has|did)\s+)?(?:i\s+)?(?:my\s+)?(?:total\s+|monthly\s+)?'
+SO_FAR = r'(?:\s+(?:this month|so far|now))*$'
+
+# Confirming pattern of each candidate
+INTENT_PATTERNS = {
+    'top_category': RANKED_CATEGORY,
+    'lowest_category': RANKED_CATEGORY,
+    'income': re.compile(ASKING_FOR + r'(?:income|salary|earnings|earned)' + SO_FAR),
+    'savings': re.compile(ASKING_FOR + r'(?:savings(?: rate)?|saving rate|saved)' + SO_FAR),
+    'category_total': re.compile(r'\b(?:how much|total)\b.*\bspen[dt]\w*\s+(?:on|for)\s+(?P<name>\w[\w &]*?)(?:\s+(?:(?:in\s+)?this month|so far|lately))?$'
+                                 r'|\bspen[dt]\w*\s+(?:on|for)\s+(?P<name2>\w[\w &]*?)(?:\s+(?:(?:in\s+)?this month|so far))?$'),
+    'total_spending': re.compile(r'\b(?:how much|total|so far|this month)\b'),
+}
+
+# A confirmed intent on the left makes the ones on the right irrelevant
+SUPERSEDES = {
+    'top_category': {'total_spending', 'category_total'},
+    'lowest_category': {'total_spending', 'category_total'},
+    'category_total': {'total_spending'},
+}
+
+# Any period but this month so far, or the future: the figures are month-to-date
+OTHER_PERIOD = (
+    r'last|previous|next|year\w*|week\w*|days?|today|yesterday|tomorrow|ago|since|until|between|during'
+    r'|will|going to|end of|in (?:the )?(?:past|future|coming)'
+    r'|jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?'
+    r'|nov(?:ember)?|dec(?:ember)?|\d+(?:st|nd|rd|th)?'
+)
+
+OPEN_ENDED = re.compile(
+    r'\b(?:why|how (?:can|could|do|should|to)|should i|what if|advi[cs]e|tips?|ways?|suggest\w*|recommend\w*'
+    r'|plan\w*|improve|reduce|cut|compare|vs|versus|explain|analy[sz]\w*|trends?|forecast\w*|predict\w*|budget\w*|'
+    + OTHER_PERIOD + r')\b'
+)
+
+NON_WORD = re.compile(r"[^\w&]+")
+
+
+def _keyword_automaton(keywords: Mapping[str, List[str]]) -> re.Pattern:
+    """One alternation, longest keywords first, with a named group per intent"""
+    groups = []
+    for intent, words in keywords.items():
+        alternatives = '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+        groups.append(f'(?P<{intent}>{alternatives})')
+    return re.compile(r'\b(?:' + '|'.join(groups) + r')\b')
+
+
+KEYWORDS = _keyword_automaton(INTENT_KEYWORDS)
+
+
+class Intent(NamedTuple):
+    name: str
+    subject: Optional[str] = None  # category name for 'category_total'
+
+
+def normalize(message: str) -> str:
+    return ' '.join(NON_WORD.sub(' ', (message or '').lower()).split())
+
+
+def classify(message: str) -> Optional[Intent]:
+    """The factual intent of ``message``, or None if the model should answer it"""
+    text = normalize(message)
+    if not text or len(text.split()) > MAX_WORDS or OPEN_ENDED.search(text):
+        return None
+
+    candidates = {match.lastgroup for match in KEYWORDS.finditer(text)}
+    confirmed = {}
+    for name in candidates:
+        match = INTENT_PATTERNS[name].search(text)
+        if match:
+            confirmed[name] = match
+    for name in list(confirmed):
+        for superseded in SUPERSEDES.get(name, ()):
+            confirmed.pop(superseded, None)
+    if len(confirmed) != 1:
+        return None
+
+    (name, match), = confirmed.items()
+    if name == 'category_total':
+        return Intent(name, (match.group('name') or match.group('name2')).strip())
+    return Intent(name)
+
+
+def _money(amount) -> str:
+    return f"{base_currency()} {amount:,.2f}"
+
+
+def answer(intent: Intent, figures: Mapping[str, Any]) -> Optional[str]:
+    """
+    Answer ``intent`` from this month's ``monthly_income``,
+    ``total_expenses`` and ``category_totals``; None to leave it to the model.
+    """
+    income = figures['monthly_income']
+    spent = figures['total_expenses']
+    categories = figures['category_totals']  # Largest first
+
+    if intent.name == 'top_category':
+        if not categories:
+            return "You don't have any categorized expenses this month yet."
+        top = categories[0]
+        return f"Your highest spending category this month is {top['category']} with {_money(top['amount'])}."
+
+    if intent.name == 'lowest_category':
+        if not categories:
+            return "You don't have any categorized expenses this month yet."
+        lowest = min(categories, key=lambda row: row['amount'])
+        return f"Your lowest spending category this month is {lowest['category']} with {_money(lowest['amount'])}."
+
+    if intent.name == 'income':
+        if not income:
+            return "You haven't recorded any income for this month yet."
+        return f"Your income this month is {_money(income)}."
+
+    if intent.name == 'savings':
+        if not income:
+            return f"You've spent {_money(spent)} this month. Record your income to see your savings."
+        savings = income - spent
+        return f"You've saved {_money(savings)} this month, {savings / income * 100:.1f}% of your income of {_money(income)}."
+
+    if intent.name == 'total_spending':
+        return f"You've spent {_money(spent)} this month."
+
+    if intent.name == 'category_total':
+        subject = intent.subject.lower()
+        matches = [row for row in categories if row['category'].lower() == subject]
+        matches = matches or [row for row in categories if subject in row['category'].lower()]
+        if len(matches) != 1:
+            # Not one of the user's categories: a merchant, an item... let the model look
+            return None
+        row = matches[0]
+        return f"You've spent {_money(row['amount'])} on {row['category']} this month."
+
+    return None
+
+
+class IntentStats:
+    """Per-process counters of routed chat messages"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.answered: Dict[str, int] = {}
+
+    def record(self, intent: Optional[str]):
+        with self._lock:
+            self.messages += 1
+            if intent:
+                self.answered[intent] = self.answered.get(intent, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            answered = sum(self.answered.values())
+            return {
+                'messages': self.messages,
+                'answered_by_intent': dict(self.answered),
+                'llm_calls_avoided': answered,
+                'hit_rate': round(answered / self.messages * 100, 2) if self.messages else 0,
+            }
+
+
+intent_stats = IntentStats()
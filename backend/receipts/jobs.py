@@ -0,0 +1,169 @@
+"""
+Background Jobs
+===============
+
+Long-running work that should not hold up a request. A job row records
+status and progress for the client to poll. Jobs run on a daemon thread
+once the transaction that created them commits, or inline when
+``BACKGROUND_JOBS['RUN_INLINE']`` is set (tests, management commands).
+
+Account data deletion
+---------------------
+Rows are deleted in primary-key chunks, one short transaction per chunk,
+so locks are never held for long and progress can be reported. Tables no
+other model points at are deleted with a single ``DELETE ... WHERE id IN``
+per chunk, skipping Django's collector (which loads every row to work out
+cascades) and per-row signals; the user's data version is bumped once at
+the end instead. Uploaded files are removed from storage only after the
+chunk that referenced them has committed.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .cache import bump_data_version, bump_merchant_version
+from .models import Budget, Category, DataDeletionJob, Expense, MonthlyIncome, SpendingForecast, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Deleted in this order; categories go last since budgets and expenses refer to them
+DELETION_TABLES = {
+    'expenses': Expense,
+    'transactions': Transaction,
+    'budgets': Budget,
+    'monthly_incomes': MonthlyIncome,
+}
+
+
+def _job_settings():
+    return getattr(settings, 'BACKGROUND_JOBS', {})
+
+
+def run_in_background(func, *args):
+    """Run ``func(*args)`` on a daemon thread, or inline if configured"""
+    if _job_settings().get('RUN_INLINE', False):
+        func(*args)
+        return
+    thread = threading.Thread(target=_run_thread, args=(func, *args), daemon=True, name=f'job-{func.__name__}')
+    thread.start()
+
+
+def _run_thread(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background job %s failed", func.__name__)
+    finally:
+        # The thread got its own database connection; don't leak it
+        connection.close()
+
+
+def start_deletion_job(user):
+    """
+    Queue deletion of all of ``user``'s data. Returns ``(job, created)``;
+    a job that is already pending or running is returned instead of
+    starting a second one.
+    """
+    stale_before = timezone.now() - timedelta(seconds=_job_settings().get('STALE_AFTER', 3600))
+    active = DataDeletionJob.objects.filter(
+        user=user,
+        status__in=[DataDeletionJob.STATUS_PENDING, DataDeletionJob.STATUS_RUNNING],
+        created_at__gte=stale_before
+    ).first()
+    if active:
+        return active, False
+
+    job = DataDeletionJob.objects.create(user=user)
+    transaction.on_commit(lambda: run_in_background(run_deletion_job, job.pk))
+    return job, True
+
+
+def run_deletion_job(job_id):
+    """Delete everything the job's user owns, recording progress on the job"""
+    job = DataDeletionJob.objects.select_related('user').get(pk=job_id)
+    user = job.user
+    chunk_size = _job_settings().get('DELETE_CHUNK_SIZE', 1000)
+
+    job.status = DataDeletionJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.deleted_data = {name: 0 for name in [*DELETION_TABLES, 'custom_categories']}
+    job.total_rows = sum(model.objects.filter(user=user).count() for model in DELETION_TABLES.values())
+    job.total_rows += Category.objects.filter(user=user).count()
+    job.save(update_fields=['status', 'started_at', 'deleted_data', 'total_rows'])
+
+    try:
+        for name, model in DELETION_TABLES.items():
+            _delete_in_chunks(job, name, model.objects.filter(user=user), chunk_size)
+
+        # Few rows, and other users' expenses may still point at them, so
+        # these go through the collector (SET_NULL / CASCADE) as usual
+        with transaction.atomic():
+            _, per_model = Category.objects.filter(user=user).delete()
+            deleted = per_model.get(Category._meta.label, 0)
+            _record_progress(job, 'custom_categories', deleted)
+
+        job.status = DataDeletionJob.STATUS_COMPLETED
+    except Exception as e:
+        logger.exception("Deletion job %s failed", job.pk)
+        job.status = DataDeletionJob.STATUS_FAILED
+        job.error = str(e)
+    finally:
+        # Raw deletes skip the post_delete signals that invalidate caches
+        # and keep forecasts current
+        bump_data_version(user.id)
+        bump_merchant_version(user.id)
+        SpendingForecast.objects.filter(user=user).delete()
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def _delete_in_chunks(job, name, queryset, chunk_size):
+    model = queryset.model
+    # The collector is only needed if some other model refers to these rows
+    raw = not model._meta.related_objects
+    file_fields = [field.attname for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('pk').values_list('pk', *file_fields)[:chunk_size])
+            if not rows:
+                return
+            chunk = model.objects.filter(pk__in=[row[0] for row in rows])
+            if raw:
+                chunk._raw_delete(chunk.db)
+            else:
+                chunk.delete()
+            _record_progress(job, name, len(rows))
+
+            file_names = [file_name for row in rows for file_name in row[1:] if file_name]
+            if file_names:
+                transaction.on_commit(lambda file_names=file_names: _remove_files(job, file_names))
+
+
+def _record_progress(job, name, count):
+    job.deleted_data[name] = job.deleted_data.get(name, 0) + count
+    job.deleted_rows += count
+    job.save(update_fields=['deleted_data', 'deleted_rows'])
+
+
+def _remove_files(job, file_names):
+    removed = 0
+    for file_name in file_names:
+        try:
+            # Only files that were still there count as removed
+            if default_storage.exists(file_name):
+                default_storage.delete(file_name)
+                removed += 1
+        except Exception:
+            # A missing or locked file must not fail the whole deletion
+            logger.warning("Could not remove %s", file_name, exc_info=True)
+    if removed:
+        DataDeletionJob.objects.filter(pk=job.pk).update(files_removed=models.F('files_removed') + removed)
+        job.files_removed += removed
@@ -0,0 +1,334 @@
+"""
+LLM Transport
+=============
+
+One pooled HTTP session for every call to a language model API (OpenAI,
+the local Ollama-style endpoint), instead of a bare ``requests.post`` per
+call that opens a new TCP and TLS connection each time.
+
+- Connections are kept alive and reused, up to ``POOL_SIZE`` per host.
+- 429 and 5xx responses and connection errors are retried up to
+  ``MAX_RETRIES`` times with exponential backoff and full jitter. A
+  ``Retry-After`` header is honoured.
+- Every request has a deadline covering all of its attempts and backoff
+  sleeps. Each attempt's read timeout is cut to what is left of it.
+- Latency, retries and outcomes are counted for ``get_service_status``.
+
+``AsyncLLMTransport`` does the same on an ``httpx.AsyncClient`` for async
+views: a request waiting on the model holds no thread, so one ASGI worker
+can keep hundreds in flight. Its deadline is a hard one, cancelling the
+attempt in progress. httpx is optional; without it ``get_async_transport()``
+returns None.
+
+Configured with ``LLM_SETTINGS['TRANSPORT']``. ``get_transport()`` returns
+the process-wide instance; tests build their own ``LLMTransport`` against
+a local server.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMDeadlineExceeded(requests.Timeout):
+    """The request's deadline passed before it got a response"""
+
+
+class TransportMetrics:
+    """Thread-safe counters and a window of recent latencies"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.errors = 0
+        self.statuses = Counter()
+
+    def record_attempt(self, status: Optional[int], retried: bool):
+        with self._lock:
+            self.attempts += 1
+            if status is None:
+                self.statuses['error'] += 1
+            else:
+                self.statuses[str(status)] += 1
+            if retried:
+                self.retries += 1
+
+    def record_request(self, latency: float, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(latency)
+            if failed:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            percentile = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+            return {
+                'requests': self.requests,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'errors': self.errors,
+                'statuses': dict(self.statuses),
+                'latency_ms': {
+                    'p50': percentile(0.50),
+                    'p95': percentile(0.95),
+                    'p99': percentile(0.99),
+                    'max': round(latencies[-1] * 1000, 1) if latencies else None,
+                },
+            }
+
+
+class RetryPolicy:
+    """Retry, backoff and deadline settings shared by both transports"""
+
+    def __init__(self, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 connect_timeout: float = 5.0, deadline: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.metrics = TransportMetrics()
+
+    def backoff(self, attempt: int, response=None) -> float:
+        """Seconds to wait before retry number ``attempt`` (0-based)"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                try:
+                    delay = max(delay, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return delay
+
+
+class LLMTransport(RetryPolicy):
+    """Pooled, retrying HTTP client for LLM APIs"""
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, connect_timeout: float = 5.0, deadline: float = 30.0):
+        super().__init__(max_retries, backoff_base, backoff_max, connect_timeout, deadline)
+
+        self.session = requests.Session()
+        # Retries are done here, where the deadline is known, not by urllib3
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, url: str, deadline: Optional[float] = None,
+                retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying as configured. Returns the last response,
+        which may still be an error status; raises the last connection
+        error, or ``LLMDeadlineExceeded`` once ``deadline`` seconds are up.
+        """
+        started = time.monotonic()
+        expires = started + (deadline if deadline is not None else self.deadline)
+        retries = self.max_retries if retries is None else retries
+        failed = True
+        try:
+            for attempt in range(retries + 1):
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt} attempts: {method} {url}")
+                last_attempt = attempt == retries
+                try:
+                    response = self.session.request(
+                        method, url, timeout=(min(self.connect_timeout, remaining), remaining), **kwargs
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    self.metrics.record_attempt(None, retried=not last_attempt)
+                    if last_attempt:
+                        raise
+                    response = None
+                else:
+                    retry = response.status_code in RETRY_STATUSES and not last_attempt
+                    self.metrics.record_attempt(response.status_code, retried=retry)
+                    if not retry:
+                        failed = response.status_code >= 400
+                        return response
+
+                delay = self.backoff(attempt, response)
+                if time.monotonic() + delay >= expires:
+                    if response is not None:
+                        # No time left to wait for another attempt; hand back what we have
+                        failed = True
+                        return response
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt + 1} attempts: {method} {url}")
+                if response is not None:
+                    response.close()
+                time.sleep(delay)
+        finally:
+            self.metrics.record_request(time.monotonic() - started, failed)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        adapter = self.session.get_adapter('https://')
+        return {**self.metrics.snapshot(), 'pool_size': adapter._pool_maxsize}
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncLLMTransport(RetryPolicy):
+    """``LLMTransport`` for async code, on an ``httpx.AsyncClient``"""
+
+    def __init__(self, max_connections: int = 200, keepalive_connections: int = 10, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, connect_timeout: float = 5.0,
+                 deadline: float = 30.0):
+        super().__init__(max_retries, backoff_base, backoff_max, connect_timeout, deadline)
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=keepalive_connections)
+        )
+
+    async def request(self, method: str, url: str, deadline: Optional[float] = None,
+                      retries: Optional[int] = None, **kwargs) -> 'httpx.Response':
+        """
+        Same contract as ``LLMTransport.request``. An attempt still running
+        at the deadline is cancelled.
+        """
+        started = time.monotonic()
+        expires = started + (deadline if deadline is not None else self.deadline)
+        retries = self.max_retries if retries is None else retries
+        failed = True
+        try:
+            for attempt in range(retries + 1):
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt} attempts: {method} {url}")
+                last_attempt = attempt == retries
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.request(
+                            method, url, timeout=httpx.Timeout(remaining, connect=min(self.connect_timeout, remaining)), **kwargs
+                        ),
+                        remaining
+                    )
+                except asyncio.TimeoutError:
+                    self.metrics.record_attempt(None, retried=False)
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt + 1} attempts: {method} {url}")
+                except httpx.TransportError:
+                    self.metrics.record_attempt(None, retried=not last_attempt)
+                    if last_attempt:
+                        raise
+                    response = None
+                else:
+                    retry = response.status_code in RETRY_STATUSES and not last_attempt
+                    self.metrics.record_attempt(response.status_code, retried=retry)
+                    if not retry:
+                        failed = response.status_code >= 400
+                        return response
+
+                delay = self.backoff(attempt, response)
+                if time.monotonic() + delay >= expires:
+                    if response is not None:
+                        failed = True
+                        return response
+                    raise LLMDeadlineExceeded(f"Deadline exceeded after {attempt + 1} attempts: {method} {url}")
+                await asyncio.sleep(delay)
+        finally:
+            self.metrics.record_request(time.monotonic() - started, failed)
+
+    async def post(self, url: str, **kwargs) -> 'httpx.Response':
+        return await self.request('POST', url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> 'httpx.Response':
+        return await self.request('GET', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics.snapshot(), 'max_connections': self.max_connections}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _transport_settings() -> Dict[str, Any]:
+    return getattr(settings, 'LLM_SETTINGS', {}).get('TRANSPORT', {})
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> LLMTransport:
+    """The process-wide transport, built from ``LLM_SETTINGS['TRANSPORT']``"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            config = _transport_settings()
+            _transport = LLMTransport(
+                pool_size=config.get('POOL_SIZE', 10),
+                max_retries=config.get('MAX_RETRIES', 2),
+                backoff_base=config.get('BACKOFF_BASE', 0.5),
+                backoff_max=config.get('BACKOFF_MAX', 8.0),
+                connect_timeout=config.get('CONNECT_TIMEOUT', 5.0),
+                deadline=config.get('DEADLINE', 30.0)
+            )
+        return _transport
+
+
+# An AsyncClient's connections belong to the event loop they were opened on.
+# Under an ASGI server that is one loop per worker; under WSGI, Django runs
+# each async view in a loop of its own, and the view closes its client
+# (``aclose_async_transport``) before the loop ends.
+_async_transports = weakref.WeakKeyDictionary()
+
+
+def is_async_available() -> bool:
+    return httpx is not None
+
+
+def get_async_transport() -> Optional[AsyncLLMTransport]:
+    """The running event loop's async transport, or None without httpx"""
+    if not is_async_available():
+        return None
+    loop = asyncio.get_running_loop()
+    transport = _async_transports.get(loop)
+    if transport is None:
+        config = _transport_settings()
+        transport = _async_transports[loop] = AsyncLLMTransport(
+            max_connections=config.get('ASYNC_MAX_CONNECTIONS', 200),
+            keepalive_connections=config.get('POOL_SIZE', 10),
+            max_retries=config.get('MAX_RETRIES', 2),
+            backoff_base=config.get('BACKOFF_BASE', 0.5),
+            backoff_max=config.get('BACKOFF_MAX', 8.0),
+            connect_timeout=config.get('CONNECT_TIMEOUT', 5.0),
+            deadline=config.get('DEADLINE', 30.0)
+        )
+    return transport
+
+
+async def aclose_async_transport():
+    """Close the running event loop's async transport, if it has one"""
+    transport = _async_transports.pop(asyncio.get_running_loop(), None)
+    if transport is not None:
+        await transport.aclose()
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from receipts.cache import bump_global_data_version
+from receipts.merchants import normalize_merchant, resolve_merchant_ids
+from receipts.models import Expense
+
+
+class Command(BaseCommand):
+    help = 'Link existing expenses to normalized Merchant rows, in batches'
+
+    # model -> text field the merchant name is read from. Transactions are
+    # left alone: their description is not a merchant name
+    SOURCES = ((Expense, 'merchant'),)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch (default: 1000)')
+        parser.add_argument('--all', action='store_true', help='Re-resolve rows that already have a vendor')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        for model, source_field in self.SOURCES:
+            queryset = model.objects.all() if options['all'] else model.objects.filter(vendor__isnull=True)
+            linked = self.backfill(queryset, source_field, batch_size)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: linked {linked} rows')
+        # The UPDATEs send no signals; drop every cached vendor aggregate
+        bump_global_data_version()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.2f}s'))
+
+    def backfill(self, queryset, source_field, batch_size):
+        linked = 0
+        last_pk = 0
+        while True:
+            # Walk the primary key so rows left unlinked (blank names) aren't re-read
+            rows = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', source_field)[:batch_size]
+            )
+            if not rows:
+                return linked
+            last_pk = rows[-1][0]
+
+            with transaction.atomic():
+                merchant_ids = resolve_merchant_ids(name for _, name in rows)
+                # One UPDATE per merchant rather than one per row
+                by_merchant = {}
+                for pk, name in rows:
+                    merchant_id = merchant_ids.get(normalize_merchant(name))
+                    if merchant_id:
+                        by_merchant.setdefault(merchant_id, []).append(pk)
+                for merchant_id, pks in by_merchant.items():
+                    linked += queryset.model.objects.filter(pk__in=pks).update(vendor_id=merchant_id)
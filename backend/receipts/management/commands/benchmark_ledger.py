@@ -0,0 +1,110 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from receipts.currency import sum_in
+from receipts.models import Expense, LedgerEntry, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Compare query counts and timings of per-model aggregation against the unified ledger view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to benchmark (default: first user)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per scenario (default: 20)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            user = User.objects.first()
+        if not user:
+            self.stdout.write(self.style.ERROR('No user found. Please create a user first.'))
+            return
+
+        now = timezone.now()
+        months = []
+        for i in range(12):
+            month = now.month - i
+            year = now.year
+            if month <= 0:
+                month += 12
+                year -= 1
+            months.append((year, month))
+
+        scenarios = [
+            ('current month total', self.legacy_month_total, self.ledger_month_total),
+            ('current month by category', self.legacy_month_categories, self.ledger_month_categories),
+            ('12 month history', self.legacy_history, self.ledger_history),
+        ]
+
+        self.stdout.write(f'User: {user.username}  '
+                          f'(expenses: {Expense.objects.filter(user=user).count()}, '
+                          f'transactions: {Transaction.objects.filter(user=user).count()})')
+        self.stdout.write(f"{'scenario':<28}{'queries':>16}{'ms/run':>20}")
+        for name, legacy, ledger in scenarios:
+            legacy_queries, legacy_ms, legacy_result = self.measure(legacy, user, now, months, options['repeat'])
+            ledger_queries, ledger_ms, ledger_result = self.measure(ledger, user, now, months, options['repeat'])
+            if legacy_result != ledger_result:
+                self.stdout.write(self.style.WARNING(f'{name}: results differ ({legacy_result} != {ledger_result})'))
+            self.stdout.write(
+                f'{name:<28}{legacy_queries:>7} -> {ledger_queries:<6}'
+                f'{legacy_ms:>9.2f} -> {ledger_ms:<8.2f}'
+            )
+
+    def measure(self, func, user, now, months, repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            result = func(user, now, months)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(user, now, months)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        return len(ctx), elapsed_ms, result
+
+    # Per-model aggregation, as the views did before the ledger view existed,
+    # converted to the base currency the way the ledger is
+
+    def legacy_month_total(self, user, now, months):
+        expense_total = Expense.objects.filter(user=user, date__year=now.year, date__month=now.month).aggregate(total=sum_in())['total'] or 0
+        transaction_total = Transaction.objects.filter(user=user, date__year=now.year, date__month=now.month).aggregate(total=sum_in(joined=False))['total'] or 0
+        return expense_total + transaction_total
+
+    def legacy_month_categories(self, user, now, months):
+        totals = {}
+        for row in Expense.objects.filter(user=user, date__year=now.year, date__month=now.month).values('category__name').annotate(total=sum_in()):
+            if row['category__name']:
+                totals[row['category__name']] = totals.get(row['category__name'], 0) + row['total']
+        for row in Transaction.objects.filter(user=user, date__year=now.year, date__month=now.month).values('category').annotate(total=sum_in(joined=False)):
+            if row['category']:
+                totals[row['category']] = totals.get(row['category'], 0) + (row['total'] or 0)
+        return totals
+
+    def legacy_history(self, user, now, months):
+        history = []
+        for year, month in months:
+            expense_total = Expense.objects.filter(user=user, date__year=year, date__month=month).aggregate(total=sum_in())['total'] or 0
+            transaction_total = Transaction.objects.filter(user=user, date__year=year, date__month=month).aggregate(total=sum_in(joined=False))['total'] or 0
+            history.append(expense_total + transaction_total)
+        return history
+
+    # Single query over the ledger view
+
+    def ledger_month_total(self, user, now, months):
+        return LedgerEntry.objects.for_user(user).in_month(now.year, now.month).total()
+
+    def ledger_month_categories(self, user, now, months):
+        rows = LedgerEntry.objects.for_user(user).in_month(now.year, now.month).category_totals()
+        return {row['category']: row['total'] or 0 for row in rows if row['category']}
+
+    def ledger_history(self, user, now, months):
+        oldest_year, oldest_month = months[-1]
+        rows = LedgerEntry.objects.for_user(user)\
+                                  .filter(date__gte=timezone.datetime(oldest_year, oldest_month, 1).date())\
+                                  .monthly_totals()
+        by_month = {(row['period'].year, row['period'].month): row['total'] for row in rows}
+        return [by_month.get(period, 0) for period in months]
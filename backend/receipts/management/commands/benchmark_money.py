@@ -0,0 +1,63 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from receipts.money import format_minor, from_minor
+
+
+class Command(BaseCommand):
+    help = ('Compare aggregate and serialization throughput of amounts stored as DECIMAL(12,2) '
+            'against integer minor units (MoneyField). Test tables are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of amounts (default: 100000)')
+        parser.add_argument('--groups', type=int, default=12, help='Distinct GROUP BY keys (default: 12)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the best is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        rows, groups = options['rows'], options['groups']
+        minor = [random.randint(100, 500000) for _ in range(rows)]
+        keys = [i % groups for i in range(rows)]
+        decimals = [from_minor(value) for value in minor]
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE TEMPORARY TABLE benchmark_decimal (grp integer, amount decimal(12, 2))')
+                cursor.execute('CREATE TEMPORARY TABLE benchmark_minor (grp integer, amount bigint)')
+                cursor.executemany('INSERT INTO benchmark_decimal VALUES (%s, %s)', list(zip(keys, decimals)))
+                cursor.executemany('INSERT INTO benchmark_minor VALUES (%s, %s)', list(zip(keys, minor)))
+
+                def aggregate(table, convert):
+                    cursor.execute(f'SELECT grp, SUM(amount) FROM {table} GROUP BY grp')
+                    return {grp: convert(total) for grp, total in cursor.fetchall()}
+
+                def read(table, convert):
+                    cursor.execute(f'SELECT amount FROM {table}')
+                    return [convert(amount) for amount, in cursor.fetchall()]
+
+                # Decimal columns come back as float (SQLite) or Decimal and are
+                # converted the way DecimalField does; minor units stay integers
+                to_decimal = lambda value: value if isinstance(value, Decimal) else Decimal(repr(value))
+                scenarios = [
+                    ('SUM ... GROUP BY', lambda: aggregate('benchmark_decimal', to_decimal), lambda: aggregate('benchmark_minor', from_minor)),
+                    ('read column', lambda: read('benchmark_decimal', to_decimal), lambda: read('benchmark_minor', int)),
+                    ('sum in Python', lambda: sum(decimals, Decimal(0)), lambda: sum(minor)),
+                    ('format as "12.34"', lambda: ['{:.2f}'.format(value) for value in decimals], lambda: [format_minor(value) for value in minor]),
+                ]
+
+                self.stdout.write(f'{rows:,} amounts, {groups} groups, {connection.vendor}')
+                self.stdout.write(f"{'scenario':<22}{'decimal rows/s':>16}{'minor rows/s':>16}{'speedup':>10}")
+                for name, before, after in scenarios:
+                    before_rate = rows / min(self.timed(before) for _ in range(options['repeat']))
+                    after_rate = rows / min(self.timed(after) for _ in range(options['repeat']))
+                    self.stdout.write(f'{name:<22}{before_rate:>16,.0f}{after_rate:>16,.0f}{after_rate / before_rate:>9.1f}x')
+
+            transaction.set_rollback(True)
+
+    def timed(self, run):
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from receipts.models import Category, Expense, PaymentMethod
+from receipts.serializers import ExpenseSerializer, ExpenseValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/s of ExpenseSerializer against the values()-based ExpenseValuesSerializer. Test rows are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of expenses to serialize (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer; the best is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            user = self.seed(rows)
+            queryset = Expense.objects.filter(user=user).select_related('category', 'payment_method').order_by('-date', '-id')
+            fast = ExpenseValuesSerializer()
+            sparse = ExpenseValuesSerializer(['id', 'date', 'amount'])
+
+            scenarios = [
+                ('ExpenseSerializer', lambda: ExpenseSerializer(queryset, many=True).data),
+                ('ExpenseValuesSerializer', lambda: fast.serialize(fast.values(queryset))),
+                ('  sparse: id,date,amount', lambda: sparse.serialize(sparse.values(queryset))),
+            ]
+            baseline = None
+            self.stdout.write(f"{'serializer':<28}{'rows/s':>12}{'speedup':>10}")
+            for name, run in scenarios:
+                best = min(self.timed(run) for _ in range(options['repeat']))
+                rate = rows / best
+                baseline = baseline or rate
+                self.stdout.write(f'{name:<28}{rate:>12,.0f}{rate / baseline:>9.1f}x')
+
+            transaction.set_rollback(True)
+
+    def timed(self, run):
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
+
+    def seed(self, rows):
+        User = get_user_model()
+        user = User.objects.create_user(username=f'benchmark-{time.time_ns()}', password=None)
+        categories = [Category.objects.create(name=f'Benchmark {i}', user=user) for i in range(8)]
+        payment_methods = [PaymentMethod.objects.create(name=f'Benchmark {time.time_ns()} {i}') for i in range(3)]
+        today = date.today()
+        Expense.objects.bulk_create([
+            Expense(
+                user=user,
+                date=today - timedelta(days=i % 365),
+                merchant=f'Merchant {i % 200}',
+                amount=Decimal(random.randint(100, 500000)) / 100,
+                currency='NPR',
+                category=categories[i % len(categories)],
+                payment_method=payment_methods[i % len(payment_methods)],
+                description='Benchmark expense',
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        return user
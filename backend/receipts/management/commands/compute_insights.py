@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from receipts.analytics import DEFAULT_MONTHS, refresh_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored spending insights (trends, anomalies, seasonality, projections) for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users analysed per database query (default: 500)')
+        parser.add_argument('--months', type=int, default=DEFAULT_MONTHS, help=f'Months of history to analyse (default: {DEFAULT_MONTHS})')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stored = refresh_all(options['batch_size'], options['months'])
+        self.stdout.write(self.style.SUCCESS(f'Stored insights for {stored} users in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from receipts import columnar_export
+
+
+class Command(BaseCommand):
+    help = 'Export expenses and transactions for all users as Parquet (or Arrow) files, one row group per month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='exports', help='Directory to write the files to (default: exports)')
+        parser.add_argument('--format', dest='file_format', choices=columnar_export.FILE_FORMATS, default='parquet', help='File format (default: parquet)')
+        parser.add_argument('--tables', nargs='+', choices=list(columnar_export.TABLES), help='Tables to export (default: all)')
+
+    def handle(self, *args, **options):
+        if not columnar_export.is_available():
+            raise CommandError('pyarrow not installed')
+
+        started = time.perf_counter()
+        counts = columnar_export.export_all(options['output_dir'], options['tables'], options['file_format'])
+        for table, rows in counts.items():
+            self.stdout.write(f"{table}: {rows} rows -> {options['output_dir']}/{table}.{options['file_format']}")
+        self.stdout.write(self.style.SUCCESS(f'Exported in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from receipts import currency
+
+
+class Command(BaseCommand):
+    help = 'Load exchange rates from a local JSON or CSV file (see receipts/currency.py for the formats)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Rates file (default: CURRENCY['RATES_FILE'])")
+        parser.add_argument('--as-of', help='Date the rates are valid for, YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'CURRENCY', {}).get('RATES_FILE')
+        if not path:
+            raise CommandError('No rates file given')
+        try:
+            rates = currency.read_rates_file(path)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        loaded = currency.load_rates(rates, options['as_of'])
+        for code, rate in sorted(rates.items()):
+            self.stdout.write(f'1 {code} = {rate:.6f} {currency.base_currency()}')
+        self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} exchange rates from {path}'))
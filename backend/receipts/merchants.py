@@ -0,0 +1,145 @@
+"""
+Merchant Normalization
+======================
+
+Maps free-text merchant names (typed in by users or read off receipts by
+OCR) onto shared ``Merchant`` rows, so spending can be grouped by an
+indexed integer ``vendor_id`` instead of by long text columns.
+
+``normalize_merchant`` lowercases, strips accents, punctuation, legal
+suffixes ("Pvt. Ltd.", "Inc") and branch/store numbers:
+
+    "Bhat-Bhateni Supermarket #12"  -> "bhat bhateni supermarket"
+    "BHAT BHATENI SUPERMARKET PVT. LTD." -> "bhat bhateni supermarket"
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from .currency import sum_in
+from .models import Merchant, MerchantAlias
+
+MAX_LENGTH = 100
+
+_AMPERSAND = re.compile(r'\s*&\s*')
+_WEB = re.compile(r'^(?:https?://)?www\.|\.(?:com|net|org)(?:\.[a-z]{2})?$|\.np$')
+_BRANCH_NUMBER = re.compile(r'(?:\b(?:no|store|branch|outlet|shop)\.?\s*#?|#)\s*\d+\s*$')
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_LEGAL_SUFFIXES = frozenset({
+    'co', 'company', 'corp', 'corporation', 'inc', 'incorporated', 'llc', 'llp',
+    'ltd', 'limited', 'plc', 'pvt', 'private', 'pte', 'gmbh',
+})
+
+
+@lru_cache(maxsize=8192)
+def normalize_merchant(raw: Optional[str]) -> str:
+    """Lookup key for a merchant name; empty if nothing meaningful is left"""
+    if not raw:
+        return ''
+    text = raw.strip().splitlines()[0] if raw.strip() else ''
+    text = unicodedata.normalize('NFKD', text[:4 * MAX_LENGTH])
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower().strip()
+    text = _WEB.sub('', text)
+    text = _AMPERSAND.sub(' and ', text)
+    text = _BRANCH_NUMBER.sub('', text)
+
+    words = _NON_ALNUM.sub(' ', text).split()
+    # "Pvt. Ltd.", "& Co." ...
+    while len(words) > 1 and (words[-1] in _LEGAL_SUFFIXES or words[-1] == 'and'):
+        words.pop()
+    if words and words[0] == 'the' and len(words) > 1:
+        words.pop(0)
+    return ' '.join(words)[:MAX_LENGTH].strip()
+
+
+def display_name(raw: str) -> str:
+    """Tidied first line of ``raw`` for Merchant.name"""
+    line = raw.strip().splitlines()[0] if raw and raw.strip() else ''
+    return ' '.join(line.split())[:MAX_LENGTH]
+
+
+def resolve_merchant(raw: Optional[str]) -> Optional[Merchant]:
+    """Merchant for a raw name, created on first sight; None for blank names"""
+    key = normalize_merchant(raw)
+    if not key:
+        return None
+
+    alias = MerchantAlias.objects.select_related('merchant').filter(alias=key).first()
+    if alias:
+        return alias.merchant
+
+    merchant = Merchant.objects.filter(normalized_name=key).first()
+    if merchant:
+        return merchant
+    try:
+        with transaction.atomic():
+            return Merchant.objects.create(name=display_name(raw), normalized_name=key)
+    except IntegrityError:
+        # Created concurrently by another request
+        return Merchant.objects.get(normalized_name=key)
+
+
+def resolve_merchant_ids(raw_names: Iterable[Optional[str]]) -> Dict[str, int]:
+    """
+    Batch version of ``resolve_merchant`` for backfills: normalized key ->
+    merchant id for every distinct name, with one lookup query per table
+    plus one bulk insert for merchants not seen before.
+    """
+    originals = {}
+    for raw in raw_names:
+        key = normalize_merchant(raw)
+        if key:
+            originals.setdefault(key, raw)
+    if not originals:
+        return {}
+
+    ids = dict(MerchantAlias.objects.filter(alias__in=originals).values_list('alias', 'merchant_id'))
+    missing = [key for key in originals if key not in ids]
+    ids.update(Merchant.objects.filter(normalized_name__in=missing).values_list('normalized_name', 'id'))
+
+    new = [key for key in originals if key not in ids]
+    if new:
+        Merchant.objects.bulk_create(
+            [Merchant(name=display_name(originals[key]), normalized_name=key) for key in new],
+            ignore_conflicts=True
+        )
+        ids.update(Merchant.objects.filter(normalized_name__in=new).values_list('normalized_name', 'id'))
+    return ids
+
+
+def add_alias(merchant: Merchant, raw: str) -> Optional[MerchantAlias]:
+    """Make ``raw`` resolve to ``merchant`` from now on"""
+    key = normalize_merchant(raw)
+    if not key or key == merchant.normalized_name:
+        return None
+    alias, _ = MerchantAlias.objects.update_or_create(alias=key, defaults={'merchant': merchant})
+    return alias
+
+
+def vendor_totals(queryset, limit: int = 10, currency: Optional[str] = None) -> List[Dict]:
+    """
+    Top merchants of ``queryset`` (expenses, transactions or ledger entries)
+    by total amount in ``currency``. Groups on the integer vendor id and
+    looks the names up afterwards for just the rows returned.
+    """
+    rows = list(
+        queryset.filter(vendor__isnull=False)
+                .values('vendor')
+                .annotate(total=sum_in(currency, joined=hasattr(queryset.model, 'fx')), count=Count('pk'))
+                .order_by('-total')[:limit]
+    )
+    names = dict(Merchant.objects.filter(pk__in=[row['vendor'] for row in rows]).values_list('id', 'name'))
+    return [
+        {
+            'merchant_id': row['vendor'],
+            'merchant': names.get(row['vendor']),
+            'total': row['total'],
+            'count': row['count'],
+        }
+        for row in rows
+    ]
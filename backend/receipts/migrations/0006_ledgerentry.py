@@ -0,0 +1,67 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+CREATE_LEDGER_VIEW = """
+CREATE VIEW receipts_ledgerentry AS
+SELECT
+    'e:' || e.id AS entry_id,
+    'expense' AS source,
+    e.id AS source_id,
+    e.user_id AS user_id,
+    e.date AS date,
+    e.amount AS amount,
+    e.currency AS currency,
+    c.name AS category,
+    e.merchant AS merchant,
+    e.description AS description,
+    e.created_at AS created_at
+FROM receipts_expense e
+LEFT JOIN receipts_category c ON c.id = e.category_id
+UNION ALL
+SELECT
+    't:' || t.id AS entry_id,
+    'transaction' AS source,
+    t.id AS source_id,
+    t.user_id AS user_id,
+    t.date AS date,
+    t.amount AS amount,
+    NULL AS currency,
+    NULLIF(t.category, '') AS category,
+    NULL AS merchant,
+    t.description AS description,
+    t.created_at AS created_at
+FROM receipts_transaction t
+"""
+
+DROP_LEDGER_VIEW = "DROP VIEW IF EXISTS receipts_ledgerentry"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0005_transaction_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('entry_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=16)),
+                ('source_id', models.BigIntegerField()),
+                ('date', models.DateField(null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('currency', models.CharField(max_length=10, null=True)),
+                ('category', models.CharField(max_length=100, null=True)),
+                ('merchant', models.CharField(max_length=100, null=True)),
+                ('description', models.TextField(null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'receipts_ledgerentry',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_LEDGER_VIEW, DROP_LEDGER_VIEW),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:35
+
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ledger_0006 = importlib.import_module('receipts.migrations.0006_ledgerentry')
+
+# The ledger view gains vendor_id from both sources
+CREATE_LEDGER_VIEW = """
+CREATE VIEW receipts_ledgerentry AS
+SELECT
+    'e:' || e.id AS entry_id,
+    'expense' AS source,
+    e.id AS source_id,
+    e.user_id AS user_id,
+    e.date AS date,
+    e.amount AS amount,
+    e.currency AS currency,
+    c.name AS category,
+    e.merchant AS merchant,
+    e.vendor_id AS vendor_id,
+    e.description AS description,
+    e.created_at AS created_at
+FROM receipts_expense e
+LEFT JOIN receipts_category c ON c.id = e.category_id
+UNION ALL
+SELECT
+    't:' || t.id AS entry_id,
+    'transaction' AS source,
+    t.id AS source_id,
+    t.user_id AS user_id,
+    t.date AS date,
+    t.amount AS amount,
+    NULL AS currency,
+    NULLIF(t.category, '') AS category,
+    NULL AS merchant,
+    t.vendor_id AS vendor_id,
+    t.description AS description,
+    t.created_at AS created_at
+FROM receipts_transaction t
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0008_datadeletionjob'),
+    ]
+
+    operations = [
+        # The view has to go while the tables it selects from are altered
+        migrations.RunSQL(ledger_0006.DROP_LEDGER_VIEW, ledger_0006.CREATE_LEDGER_VIEW),
+        migrations.CreateModel(
+            name='Merchant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expenses', to='receipts.merchant'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='vendor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='receipts.merchant'),
+        ),
+        migrations.CreateModel(
+            name='MerchantAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='receipts.merchant')),
+            ],
+            options={
+                'verbose_name_plural': 'merchant aliases',
+            },
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='vendor',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='receipts.merchant'),
+        ),
+        migrations.RunSQL(CREATE_LEDGER_VIEW, ledger_0006.DROP_LEDGER_VIEW),
+    ]
@@ -0,0 +1,108 @@
+from django.db import migrations
+
+# SQLite: one FTS5 table over both sources. rowid is id * 2 for expenses
+# and id * 2 + 1 for transactions, so triggers address rows directly. The
+# owner column holds a "u<user_id>" token, letting a search intersect with
+# the user's postings inside the full-text index instead of filtering after.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE receipts_search USING fts5(
+        owner, merchant, body,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER receipts_expense_search_ai AFTER INSERT ON receipts_expense BEGIN
+        INSERT INTO receipts_search (rowid, owner, merchant, body)
+        VALUES (new.id * 2, 'u' || new.user_id, new.merchant, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER receipts_expense_search_au AFTER UPDATE OF user_id, merchant, description ON receipts_expense BEGIN
+        DELETE FROM receipts_search WHERE rowid = old.id * 2;
+        INSERT INTO receipts_search (rowid, owner, merchant, body)
+        VALUES (new.id * 2, 'u' || new.user_id, new.merchant, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER receipts_expense_search_ad AFTER DELETE ON receipts_expense BEGIN
+        DELETE FROM receipts_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER receipts_transaction_search_ai AFTER INSERT ON receipts_transaction BEGIN
+        INSERT INTO receipts_search (rowid, owner, merchant, body)
+        VALUES (new.id * 2 + 1, 'u' || coalesce(new.user_id, 0), '', new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER receipts_transaction_search_au AFTER UPDATE OF user_id, description ON receipts_transaction BEGIN
+        DELETE FROM receipts_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO receipts_search (rowid, owner, merchant, body)
+        VALUES (new.id * 2 + 1, 'u' || coalesce(new.user_id, 0), '', new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER receipts_transaction_search_ad AFTER DELETE ON receipts_transaction BEGIN
+        DELETE FROM receipts_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO receipts_search (rowid, owner, merchant, body)
+    SELECT id * 2, 'u' || user_id, merchant, coalesce(description, '') FROM receipts_expense
+    """,
+    """
+    INSERT INTO receipts_search (rowid, owner, merchant, body)
+    SELECT id * 2 + 1, 'u' || coalesce(user_id, 0), '', description FROM receipts_transaction
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS receipts_expense_search_ai",
+    "DROP TRIGGER IF EXISTS receipts_expense_search_au",
+    "DROP TRIGGER IF EXISTS receipts_expense_search_ad",
+    "DROP TRIGGER IF EXISTS receipts_transaction_search_ai",
+    "DROP TRIGGER IF EXISTS receipts_transaction_search_au",
+    "DROP TRIGGER IF EXISTS receipts_transaction_search_ad",
+    "DROP TABLE IF EXISTS receipts_search",
+]
+
+# PostgreSQL: GIN indexes on the same tsvector expressions receipts.search
+# queries with, kept current by the database itself
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX receipts_expense_search_idx ON receipts_expense
+    USING GIN (to_tsvector('simple', coalesce(merchant, '') || ' ' || coalesce(description, '')))
+    """,
+    """
+    CREATE INDEX receipts_transaction_search_idx ON receipts_transaction
+    USING GIN (to_tsvector('simple', coalesce(description, '')))
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS receipts_expense_search_idx",
+    "DROP INDEX IF EXISTS receipts_transaction_search_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0009_merchant'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0012_spendingforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10, unique=True)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('as_of', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Column-less relations used for joins only; no schema change
+        migrations.AddField(
+            model_name='budget',
+            name='fx',
+            field=models.ForeignObject(editable=False, from_fields=['currency'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', serialize=False, to='receipts.exchangerate', to_fields=['currency']),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='fx',
+            field=models.ForeignObject(editable=False, from_fields=['currency'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', serialize=False, to='receipts.exchangerate', to_fields=['currency']),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, models, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+
+# Models whose ``amount`` moves from DecimalField to integer minor units
+MONEY_MODELS = ['expense', 'budget', 'transaction', 'monthlyincome']
+
+# Rows converted per transaction
+CHUNK_SIZE = 5000
+
+
+def backfill_minor_units(apps, schema_editor, only_missing=False):
+    """
+    Copy ``amount`` into ``amount_minor`` (amount * 100, rounded) in primary
+    key chunks, committing after each so no long write lock is held.
+    """
+    db = schema_editor.connection.alias
+    for model_name in MONEY_MODELS:
+        model = apps.get_model('receipts', model_name)
+        pending = model.objects.using(db).filter(amount__isnull=False)
+        if only_missing:
+            pending = pending.filter(amount_minor__isnull=True)
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=db):
+                pks = list(pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+                if not pks:
+                    break
+                pending.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(amount_minor=Round(F('amount') * 100))
+                last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    # Each backfill chunk commits on its own
+    atomic = False
+
+    dependencies = [
+        ('receipts', '0013_exchangerate'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='amount_minor',
+                field=models.BigIntegerField(null=True, blank=True),
+            )
+            for model_name in MONEY_MODELS
+        ],
+        migrations.RunPython(backfill_minor_units, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+import importlib
+
+from django.db import migrations
+
+import receipts.money
+
+ledger_0006 = importlib.import_module('receipts.migrations.0006_ledgerentry')
+ledger_0009 = importlib.import_module('receipts.migrations.0009_merchant')
+search_0010 = importlib.import_module('receipts.migrations.0010_search_index')
+minor_0014 = importlib.import_module('receipts.migrations.0014_amount_minor_units')
+
+# SQLite rebuilds a table to drop or alter a column, which drops its
+# triggers; the full-text search triggers from 0010 are put back afterwards
+SEARCH_TRIGGERS = [statement for statement in search_0010.SQLITE_FORWARD if 'CREATE TRIGGER' in statement]
+DROP_SEARCH_TRIGGERS = [statement for statement in search_0010.SQLITE_BACKWARD if 'DROP TRIGGER' in statement]
+
+
+def backfill_remaining(apps, schema_editor):
+    # Rows written by the old code since 0014 ran
+    minor_0014.backfill_minor_units(apps, schema_editor, only_missing=True)
+
+
+def recreate_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SEARCH_TRIGGERS + SEARCH_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0014_amount_minor_units'),
+    ]
+
+    operations = [
+        # Not reversible: the Decimal columns are gone after this
+        migrations.RunPython(backfill_remaining),
+        # The view has to go while the tables it selects from are altered
+        migrations.RunSQL(ledger_0006.DROP_LEDGER_VIEW, ledger_0009.CREATE_LEDGER_VIEW),
+        *[
+            operation
+            for model_name, null in [('expense', False), ('budget', False), ('transaction', True), ('monthlyincome', False)]
+            for operation in [
+                migrations.RemoveField(model_name=model_name, name='amount'),
+                migrations.RenameField(model_name=model_name, old_name='amount_minor', new_name='amount'),
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='amount',
+                    field=receipts.money.MoneyField(null=True, blank=True) if null else receipts.money.MoneyField(),
+                ),
+            ]
+        ],
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='amount',
+            field=receipts.money.MoneyField(null=True),
+        ),
+        migrations.RunSQL(ledger_0009.CREATE_LEDGER_VIEW, ledger_0006.DROP_LEDGER_VIEW),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
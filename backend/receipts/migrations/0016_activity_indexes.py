@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0015_money_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='receipts_ex_user_id_6943f4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='receipts_tr_user_id_562ad6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-id'], name='receipts_ex_user_id_c9e333_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-id'], name='receipts_tr_user_id_a2b5ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('date__isnull', True)), fields=['user', '-created_at', '-id'], name='receipts_transaction_undated'),
+        ),
+    ]
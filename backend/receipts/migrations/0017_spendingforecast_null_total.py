@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 10:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def discard_forecasts(apps, schema_editor):
+    """
+    Total rows were stored under the name '*', which a category can also
+    have. The rows are running sums rebuilt from the ledger on first read,
+    so drop them all rather than guess which is which.
+    """
+    apps.get_model('receipts', 'SpendingForecast').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0016_activity_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(discard_forecasts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='spendingforecast',
+            name='category',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='spendingforecast',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'year', 'month'), name='unique_spending_forecast_total'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
 
+from .money import MoneyField
+from .periods import date_range_filter, month_range, previous_month_range, year_range
+
 # Create your models here.
 
 class PaymentMethod(models.Model):
@@ -24,28 +27,65 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class Merchant(models.Model):
+    """
+    A merchant shared by all users. ``normalized_name`` is the lookup key
+    produced by ``receipts.merchants.normalize_merchant``.
+    """
+    name = models.CharField(max_length=100)  # Display name, as first seen
+    normalized_name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+class MerchantAlias(models.Model):
+    """Another normalized spelling that resolves to ``merchant``"""
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        verbose_name_plural = 'merchant aliases'
+
+    def __str__(self):
+        return f"{self.alias} -> {self.merchant}"
+
+class ExchangeRate(models.Model):
+    """Value of one unit of ``currency`` in the base currency (``CURRENCY['BASE']``)"""
+    currency = models.CharField(max_length=10, unique=True)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    as_of = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"1 {self.currency} = {self.rate}"
+
+def exchange_rate_relation():
+    """
+    Column-less relation from a row's ``currency`` to its ExchangeRate, so
+    aggregates can convert amounts through a LEFT JOIN (see currency.py)
+    """
+    return models.ForeignObject(
+        ExchangeRate, on_delete=models.DO_NOTHING, from_fields=['currency'], to_fields=['currency'],
+        null=True, related_name='+', editable=False, serialize=False
+    )
+
 class ExpenseQuerySet(models.QuerySet):
-    def monthly_totals(self, user, year, month):
-        return self.filter(user=user, date__year=year, date__month=month)\
-                   .values('category__name')\
-                   .annotate(total=models.Sum('amount'))\
+    def _category_totals(self, currency):
+        from .currency import sum_in
+        return self.values('category__name')\
+                   .annotate(total=sum_in(currency))\
                    .order_by('-total')
 
-    def yearly_totals(self, user, year):
-        return self.filter(user=user, date__year=year)\
-                   .values('category__name')\
-                   .annotate(total=models.Sum('amount'))\
-                   .order_by('-total')
+    def monthly_totals(self, user, year, month, currency=None):
+        return self.filter(user=user, **date_range_filter(month_range(year, month)))._category_totals(currency)
 
-    def top_categories_last_month(self, user, n=3):
-        from datetime import date, timedelta
-        today = date.today()
-        first = date(today.year, today.month, 1)
-        last_month = first - timedelta(days=1)
-        return self.filter(user=user, date__year=last_month.year, date__month=last_month.month)\
-                   .values('category__name')\
-                   .annotate(total=models.Sum('amount'))\
-                   .order_by('-total')[:n]
+    def yearly_totals(self, user, year, currency=None):
+        return self.filter(user=user, **date_range_filter(year_range(year)))._category_totals(currency)
+
+    def top_categories_last_month(self, user, n=3, currency=None):
+        from datetime import date
+        return self.filter(user=user, **date_range_filter(previous_month_range(date.today())))._category_totals(currency)[:n]
 
     def compare_budget_vs_actual(self, user, year, month):
         actuals = self.monthly_totals(user, year, month)
@@ -56,18 +96,20 @@ class Expense(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
     date = models.DateField()
     merchant = models.CharField(max_length=100)
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField()
     currency = models.CharField(max_length=10, default='USD')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='expenses')
     payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True)
+    vendor = models.ForeignKey(Merchant, on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses')
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    fx = exchange_rate_relation()
 
     objects = ExpenseQuerySet.as_manager()
 
     class Meta:
         indexes = [
-            models.Index(fields=['user', 'date']),
+            models.Index(fields=['user', '-date', '-id']),
             models.Index(fields=['category', 'date']),
         ]
         ordering = ['-date']
@@ -78,10 +120,11 @@ class Expense(models.Model):
 class Budget(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='budgets')
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField()
     currency = models.CharField(max_length=10, default='USD')
     month = models.PositiveSmallIntegerField()  # 1-12
     year = models.PositiveSmallIntegerField()
+    fx = exchange_rate_relation()
 
     class Meta:
         unique_together = ('user', 'category', 'month', 'year')
@@ -96,20 +139,168 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions', null=True, blank=True)
     file = models.FileField(upload_to='receipts/', null=True, blank=True)
     description = models.TextField()
-    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    amount = MoneyField(null=True, blank=True)
     category = models.CharField(max_length=100, blank=True)
     date = models.DateField(null=True, blank=True)
+    vendor = models.ForeignKey(Merchant, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date', '-id']),
+            # Uploaded receipts that have no date yet, for the activity feed
+            models.Index(fields=['user', '-created_at', '-id'], condition=models.Q(date__isnull=True),
+                         name='receipts_transaction_undated'),
+        ]
+
     def __str__(self):
         return f"{self.description} - {self.amount}"
 
 class MonthlyIncome(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField()
     month = models.PositiveSmallIntegerField()
     year = models.PositiveSmallIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('user', 'month', 'year')
+
+class LedgerQuerySet(models.QuerySet):
+    def for_user(self, user):
+        return self.filter(user=user)
+
+    def in_period(self, date_range):
+        return self.filter(**date_range_filter(date_range))
+
+    def in_month(self, year, month):
+        return self.in_period(month_range(year, month))
+
+    def total(self, currency=None):
+        """Sum of the amounts in ``currency`` (default: the base currency)"""
+        from .currency import sum_in
+        return self.aggregate(total=sum_in(currency))['total'] or 0
+
+    def category_totals(self, currency=None):
+        from .currency import sum_in
+        return self.values('category')\
+                   .annotate(total=sum_in(currency))\
+                   .order_by('-total')
+
+    def monthly_totals(self, currency=None):
+        from django.db.models.functions import TruncMonth
+        from .currency import sum_in
+        return self.annotate(period=TruncMonth('date'))\
+                   .values('period')\
+                   .annotate(total=sum_in(currency))\
+                   .order_by('period')
+
+class LedgerEntry(models.Model):
+    """
+    Read-only union of Expense and Transaction rows, backed by the
+    ``receipts_ledgerentry`` database view, so spending across both sources
+    can be filtered and aggregated in a single query.
+    """
+    SOURCE_EXPENSE = 'expense'
+    SOURCE_TRANSACTION = 'transaction'
+
+    entry_id = models.CharField(max_length=32, primary_key=True)  # e.g. "e:42" / "t:7"
+    source = models.CharField(max_length=16)
+    source_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    date = models.DateField(null=True)
+    amount = MoneyField(null=True)
+    currency = models.CharField(max_length=10, null=True)
+    category = models.CharField(max_length=100, null=True)  # Category name; NULL when uncategorized
+    merchant = models.CharField(max_length=100, null=True)
+    vendor = models.ForeignKey(Merchant, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    description = models.TextField(null=True)
+    created_at = models.DateTimeField()
+    fx = exchange_rate_relation()
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'receipts_ledgerentry'
+
+    def __str__(self):
+        return f"{self.source} {self.source_id}: {self.amount}"
+
+class DataDeletionJob(models.Model):
+    """Background deletion of all of a user's data, with progress for polling"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deletion_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_rows = models.PositiveIntegerField(default=0)
+    deleted_rows = models.PositiveIntegerField(default=0)
+    deleted_data = models.JSONField(default=dict)  # table name -> rows deleted so far
+    files_removed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.deleted_rows * 100 / self.total_rows))
+
+    def __str__(self):
+        return f"Deletion job {self.pk} for {self.user}: {self.status}"
+
+class SpendingInsight(models.Model):
+    """Precomputed trends, anomalies and projections for a user (see receipts/analytics.py)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='spending_insight')
+    months = models.PositiveSmallIntegerField(default=24)
+    data = models.JSONField(default=dict)
+    data_version = models.CharField(max_length=64, blank=True)  # Data version token the results were computed at
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Insights for {self.user} ({self.computed_at:%Y-%m-%d %H:%M})"
+
+class SpendingForecast(models.Model):
+    """
+    Running month-to-date spending per (user, month, category), kept current
+    by F() deltas as expenses and transactions are saved (see receipts/forecast.py).
+    ``category`` is the ledger category name, '' for uncategorized, and
+    ``TOTAL`` (NULL, so no category name can collide with it) for the
+    month's total row.
+    """
+    TOTAL = None
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_forecasts')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    category = models.CharField(max_length=100, blank=True, null=True)
+    spent_to_date = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    baseline = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Average of the previous months
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year', 'month', 'category'], name='unique_spending_forecast'),
+            # NULLs are distinct in the constraint above
+            models.UniqueConstraint(fields=['user', 'year', 'month'], condition=models.Q(category__isnull=True),
+                                    name='unique_spending_forecast_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.month}/{self.year} {'Total' if self.category is None else self.category or 'Uncategorized'}: {self.spent_to_date}"
@@ -0,0 +1,120 @@
+"""
+Money Amounts
+=============
+
+Amounts are stored as integers in minor units (paisa, cents): 12.34 is
+stored as 1234. Sums, comparisons and ordering in the database are integer
+arithmetic, and code that only adds up or formats amounts can work on the
+integers instead of ``Decimal``.
+
+``MoneyField`` is the model field. Its column is a ``bigint`` and its
+``exponent`` is the number of minor-unit digits: 2, the precision the old
+``DecimalField(decimal_places=2)`` columns had, which covers every
+currency the app records. Model instances, forms and ``values()`` still
+see ``Decimal`` amounts, so existing code keeps working; hot paths read
+the raw integers with ``minor_units()`` and format them with
+``format_minor()``.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.db.models import BigIntegerField, ExpressionWrapper, F
+
+DEFAULT_EXPONENT = 2
+
+
+def to_minor(value, exponent: int = DEFAULT_EXPONENT) -> int:
+    """12.345 -> 1235, rounding half up"""
+    if isinstance(value, int):
+        return value * 10 ** exponent
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.scaleb(exponent).to_integral_value(ROUND_HALF_UP))
+
+
+def from_minor(value: int, exponent: int = DEFAULT_EXPONENT) -> Decimal:
+    """1234 -> Decimal('12.34')"""
+    return Decimal(value).scaleb(-exponent)
+
+
+def format_minor(value, exponent: int = DEFAULT_EXPONENT):
+    """1234 -> '12.34' without going through Decimal; None stays None"""
+    if value is None:
+        return None
+    if value < 0:
+        return '-' + format_minor(-value, exponent)
+    if not exponent:
+        return str(value)
+    units, minor = divmod(value, 10 ** exponent)
+    return '%d.%0*d' % (units, exponent, minor)
+
+
+def minor_units(field: str = 'amount'):
+    """The raw integer column of a MoneyField, for ``annotate()``/``values()``"""
+    return ExpressionWrapper(F(field), output_field=BigIntegerField())
+
+
+class MoneyField(models.Field):
+    """Decimal amount stored as a ``bigint`` of minor units"""
+    description = 'Amount in integer minor units'
+    default_error_messages = {
+        'invalid': '"%(value)s" value must be a decimal number.',
+    }
+
+    def __init__(self, *args, exponent: int = DEFAULT_EXPONENT, **kwargs):
+        self.exponent = exponent
+        self.quantum = Decimal(1).scaleb(-exponent)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.exponent != DEFAULT_EXPONENT:
+            kwargs['exponent'] = self.exponent
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        if isinstance(value, int):
+            return from_minor(value, self.exponent)
+        # Aggregates over converted amounts come back as float (SQLite) or
+        # numeric (PostgreSQL) minor units
+        if isinstance(value, float):
+            value = Decimal(repr(value))
+        return Decimal(value).scaleb(-self.exponent).quantize(self.quantum, ROUND_HALF_UP)
+
+    def to_python(self, value):
+        if value is None or value == '':
+            return None
+        try:
+            if not isinstance(value, Decimal):
+                value = Decimal(str(value))
+            return value.quantize(self.quantum, ROUND_HALF_UP)
+        except (InvalidOperation, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return to_minor(self.to_python(value), self.exponent)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return '' if value is None else str(value)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'decimal_places': self.exponent,
+            'max_digits': None,
+            **kwargs,
+        })
@@ -8,18 +8,148 @@ Provides high-quality, accurate financial responses using GPT models.
 """
 
 import os
-import requests
 import json
+import threading
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 from django.conf import settings
 import logging
 
+from asgiref.sync import sync_to_async
+
+from .currency import base_currency
+from .llm_transport import get_async_transport, get_transport
+
 logger = logging.getLogger(__name__)
 
+
+class LLMUnavailable(Exception):
+    """The API is unreachable or its circuit is open; answer without it"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing API for a while instead of waiting on it.
+
+    Closed: calls go through, and ``failure_threshold`` consecutive failures
+    open the circuit. Open: calls are refused until ``reset_timeout`` seconds
+    have passed, then a single trial call is let through (half-open). Its
+    success closes the circuit, its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.rejected = 0
+        self.total_failures = 0
+
+    def _retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def is_open(self) -> bool:
+        """
+        True if a call now would be refused. Only reads the state: a caller
+        that skips its call because of it reports that with ``record_rejection``
+        """
+        with self._lock:
+            return (self._state == self.OPEN and self._retry_in() > 0) or \
+                   (self._state == self.HALF_OPEN and self._trial_running)
+
+    def allow_request(self) -> bool:
+        """Ask before each call; every allowed call must report its outcome"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._retry_in() > 0:
+                    self.rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_running = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_running:
+                    self.rejected += 1
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("OpenAI circuit opened after %d consecutive failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_running = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._state
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = round(self._retry_in(), 1)
+                if not retry_in:
+                    state = self.HALF_OPEN
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in_seconds': retry_in,
+                'rejected_calls': self.rejected,
+                'total_failures': self.total_failures,
+            }
+
+
+def _llm_settings() -> Dict[str, Any]:
+    return getattr(settings, 'LLM_SETTINGS', {})
+
+
+# Shared by every service instance in the process: ChatView creates a new
+# service per message, so per-instance state would never be reused
+_breaker = None
+_breaker_lock = threading.Lock()
+_healthy_at: Dict[tuple, float] = {}  # (api url, model) -> monotonic time of the last successful check
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            config = _llm_settings().get('CIRCUIT_BREAKER', {})
+            _breaker = CircuitBreaker(
+                failure_threshold=config.get('FAILURE_THRESHOLD', 3),
+                reset_timeout=config.get('RESET_TIMEOUT', 60)
+            )
+        return _breaker
+
+
 class OpenAIAIService:
     """OpenAI API Service for SmartBudget"""
     
+    # Sections of the financial context _build_messages reads (see chat_context.py)
+    REQUIRED_SECTIONS = ('monthly_income', 'total_expenses', 'category_totals', 'all_category_totals', 'forecast')
+    
     def __init__(self):
         # OpenAI configuration
         self.api_key = os.getenv('OPENAI_API_KEY')
@@ -32,64 +162,242 @@ class OpenAIAIService:
         self.api_key = llm_settings.get('OPENAI_API_KEY', self.api_key)
         self.model = llm_settings.get('OPENAI_MODEL', self.model)
         
-        # Check if OpenAI is available
-        self.openai_available = self._check_openai_availability()
+        self.models_url = self.api_url.rsplit('/chat/completions', 1)[0] + '/models'
+        
+        # Views create a service per request, so availability is read once per request
+        self._available = None
+        self._circuit_open = False
+    
+    @property
+    def openai_available(self) -> bool:
+        """Whether the API can be used; checked once per service, and probed at most once per HEALTH_CHECK_TTL"""
+        if self._available is None:
+            self._available = self._check_openai_availability()
+        return self._available
+    
+    def ensure_available(self):
+        """Raise ``LLMUnavailable`` unless ``openai_available``"""
+        if not self.openai_available:
+            self._refuse()
+    
+    async def aensure_available(self):
+        """``ensure_available`` for async views"""
+        if not await self.acheck_openai_availability():
+            self._refuse()
+    
+    def _refuse(self):
+        if self._circuit_open:
+            # Counted once per request, not on every availability read
+            get_circuit_breaker().record_rejection()
+        raise LLMUnavailable("OpenAI is unavailable")
     
     def _check_openai_availability(self) -> bool:
         """Check if OpenAI API is available"""
-        if not self.api_key:
-            logger.warning("OpenAI API key not found")
-            return False
-        
+        available = self._cached_availability()
+        if available is not None:
+            return available
         try:
-            # Test API with a simple request
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                'model': self.model,
-                'messages': [
-                    {'role': 'user', 'content': 'Hello'}
-                ],
-                'max_tokens': 10
-            }
-            
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=10
+            # Looking up the model checks the key and the model without spending tokens
+            # Not retried: failures are counted by the circuit breaker instead
+            response = get_transport().get(
+                f'{self.models_url}/{self.model}',
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                deadline=_llm_settings().get('HEALTH_CHECK_TIMEOUT', 5),
+                retries=0
+            )
+            available = response.status_code == 200
+        except Exception as e:
+            logger.warning(f"OpenAI not available: {str(e)}")
+            available = False
+        return self._record_availability(available)
+    
+    async def acheck_openai_availability(self) -> bool:
+        """``openai_available`` for async views; the probe doesn't block the event loop"""
+        if self._available is None:
+            self._available = await self._acheck_openai_availability()
+        return self._available
+    
+    async def _acheck_openai_availability(self) -> bool:
+        transport = get_async_transport()
+        if transport is None:
+            return await sync_to_async(self._check_openai_availability, thread_sensitive=False)()
+        available = self._cached_availability()
+        if available is not None:
+            return available
+        try:
+            response = await transport.get(
+                f'{self.models_url}/{self.model}',
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                deadline=_llm_settings().get('HEALTH_CHECK_TIMEOUT', 5),
+                retries=0
             )
-            
-            return response.status_code == 200
+            available = response.status_code == 200
         except Exception as e:
             logger.warning(f"OpenAI not available: {str(e)}")
+            available = False
+        return self._record_availability(available)
+    
+    def _cached_availability(self) -> Optional[bool]:
+        """Availability known without a probe, or None if the API has to be asked"""
+        if not self.api_key:
+            logger.warning("OpenAI API key not found")
+            return False
+        
+        breaker = get_circuit_breaker()
+        if breaker.is_open():
+            self._circuit_open = True
+            return False
+        
+        # A recent successful check is reused by every request in the process
+        checked_at = _healthy_at.get((self.api_url, self.model))
+        if checked_at is not None and time.monotonic() - checked_at < _llm_settings().get('HEALTH_CHECK_TTL', 300):
+            return True
+        
+        if not breaker.allow_request():
             return False
+        return None
+    
+    def _record_availability(self, available: bool) -> bool:
+        """Report a probe's outcome to the circuit breaker"""
+        key = (self.api_url, self.model)
+        breaker = get_circuit_breaker()
+        if available:
+            breaker.record_success()
+            _healthy_at[key] = time.monotonic()
+        else:
+            breaker.record_failure()
+            _healthy_at.pop(key, None)
+        return available
     
     def generate_response(self, user_message: str, financial_context: Dict[str, Any]) -> str:
         """Generate AI response using OpenAI"""
         
-        if not self.openai_available:
+        try:
+            return self.answer(user_message, financial_context)
+        except LLMUnavailable:
+            return self._generate_fallback_response(user_message, financial_context)
+        except Exception as e:
+            logger.error(f"OpenAI error: {str(e)}")
             return self._generate_fallback_response(user_message, financial_context)
+    
+    def answer(self, user_message: str, financial_context: Dict[str, Any]) -> str:
+        """
+        The model's answer. Raises ``LLMUnavailable`` or the API error
+        instead of falling back, so callers know the answer came from the model.
+        """
+        self.ensure_available()
+        breaker = get_circuit_breaker()
+        if not breaker.allow_request():
+            raise LLMUnavailable("OpenAI is unavailable")
         
         try:
             messages = self._build_messages(user_message, financial_context)
             response = self._call_openai(messages)
-            return response
-        except Exception as e:
-            logger.error(f"OpenAI error: {str(e)}")
-            return self._generate_fallback_response(user_message, financial_context)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return response
+    
+    async def aanswer(self, user_message: str, financial_context: Dict[str, Any]) -> str:
+        """
+        ``answer`` for async views. The API call awaits on the async
+        transport; without httpx, ``answer`` runs in a worker thread.
+        """
+        transport = get_async_transport()
+        if transport is None:
+            return await sync_to_async(self.answer, thread_sensitive=False)(user_message, financial_context)
+        
+        await self.aensure_available()
+        breaker = get_circuit_breaker()
+        if not breaker.allow_request():
+            raise LLMUnavailable("OpenAI is unavailable")
+        
+        try:
+            response = await transport.post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._request_payload(self._build_messages(user_message, financial_context)),
+                deadline=self.timeout
+            )
+            if response.status_code != 200:
+                raise Exception(self._error_message(response))
+            content = response.json()['choices'][0]['message']['content'].strip()
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return content
     
     def _call_openai(self, messages: list) -> str:
         """Call OpenAI API"""
         
-        headers = {
+        response = get_transport().post(
+            self.api_url,
+            headers=self._headers(),
+            json=self._request_payload(messages),
+            deadline=self.timeout
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            return result['choices'][0]['message']['content'].strip()
+        else:
+            raise Exception(self._error_message(response))
+    
+    def stream_response(self, user_message: str, financial_context: Dict[str, Any]) -> Iterator[str]:
+        """
+        Yield the answer in pieces as the model produces them. Raises
+        ``LLMUnavailable`` before yielding anything if the API can't be used.
+        """
+        self.ensure_available()
+        breaker = get_circuit_breaker()
+        if not breaker.allow_request():
+            raise LLMUnavailable("OpenAI is unavailable")
+        
+        succeeded = False
+        try:
+            response = get_transport().post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._request_payload(self._build_messages(user_message, financial_context), stream=True),
+                deadline=self.timeout,
+                stream=True
+            )
+            with response:
+                if response.status_code != 200:
+                    raise Exception(self._error_message(response))
+                # Server-sent events: "data: {chunk}" lines, ending with "data: [DONE]"
+                for line in response.iter_lines():
+                    # Decoded here: the stream is UTF-8 but declares no charset
+                    line = line.decode('utf-8')
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        break
+                    choices = json.loads(payload).get('choices') or [{}]
+                    content = choices[0].get('delta', {}).get('content')
+                    if content:
+                        yield content
+            succeeded = True
+        except GeneratorExit:
+            # The client went away; the API itself was answering
+            succeeded = True
+            raise
+        finally:
+            if succeeded:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
-        
+    
+    def _request_payload(self, messages: list, stream: bool = False) -> Dict[str, Any]:
         data = {
             'model': self.model,
             'messages': messages,
@@ -99,25 +407,18 @@ class OpenAIAIService:
             'frequency_penalty': 0.1,
             'presence_penalty': 0.1
         }
-        
-        response = requests.post(
-            self.api_url,
-            headers=headers,
-            json=data,
-            timeout=self.timeout
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            error_msg = f"OpenAI API error: {response.status_code}"
-            try:
-                error_data = response.json()
-                error_msg += f" - {error_data.get('error', {}).get('message', 'Unknown error')}"
-            except:
-                error_msg += f" - {response.text}"
-            raise Exception(error_msg)
+        if stream:
+            data['stream'] = True
+        return data
+    
+    def _error_message(self, response) -> str:
+        error_msg = f"OpenAI API error: {response.status_code}"
+        try:
+            error_data = response.json()
+            error_msg += f" - {error_data.get('error', {}).get('message', 'Unknown error')}"
+        except:
+            error_msg += f" - {response.text}"
+        return error_msg
     
     def _build_messages(self, user_message: str, financial_context: Dict[str, Any]) -> list:
         """Build messages for OpenAI API"""
@@ -127,8 +428,8 @@ class OpenAIAIService:
         total_expenses = financial_context.get('total_expenses', 0)
         category_totals = financial_context.get('category_totals', [])
         all_category_totals = financial_context.get('all_category_totals', [])
-        spending_trends = financial_context.get('spending_trends', {})
-        budget_info = financial_context.get('budget_info', {})
+        forecast = financial_context.get('forecast')
+        code = base_currency()  # The context's amounts are all in it
         
         # Calculate savings
         savings = monthly_income - total_expenses
@@ -138,23 +439,35 @@ class OpenAIAIService:
         category_breakdown = ""
         if all_category_totals:
             category_breakdown = "\n".join([
-                f"• {cat['category']}: NPR {cat['amount']:,.2f}" 
+                f"• {cat['category']}: {code} {cat['amount']:,.2f}" 
                 for cat in all_category_totals
             ])
         elif category_totals:
             category_breakdown = "\n".join([
-                f"• {cat['category']}: NPR {cat['amount']:,.2f}" 
+                f"• {cat['category']}: {code} {cat['amount']:,.2f}" 
                 for cat in category_totals
             ])
         
+        # Month-end projection, so "will I go over budget?" can be answered
+        forecast_summary = "Not available"
+        if forecast:
+            total = forecast['total']
+            forecast_summary = f"{code} {total['projected']:,.2f} projected by month end"
+            if total['budget']:
+                forecast_summary += f" against a budget of {code} {total['budget']:,.2f} ({total['status'].replace('_', ' ')})"
+            over = [row['category'] for row in forecast['categories'] if row['status'] == 'over']
+            if over:
+                forecast_summary += f"; projected over budget in: {', '.join(over)}"
+        
         # System message with instructions
         system_message = f"""You are a comprehensive AI financial advisor with complete access to the user's financial data. You should behave like ChatGPT - intelligent, conversational, and able to provide detailed analysis and insights.
 
 FINANCIAL DATA:
-- Income: NPR {monthly_income:,.2f}
-- Expenses: NPR {total_expenses:,.2f}
-- Savings: NPR {savings:,.2f} ({savings_rate:.1f}%)
+- Income: {code} {monthly_income:,.2f}
+- Expenses: {code} {total_expenses:,.2f}
+- Savings: {code} {savings:,.2f} ({savings_rate:.1f}%)
 - Categories: {category_breakdown if category_breakdown else "No categorized expenses"}
+- Month-end forecast: {forecast_summary}
 
 RESPONSE GUIDELINES:
 1. Be conversational and helpful like ChatGPT
@@ -185,6 +498,7 @@ You have access to all their financial data. Be helpful, comprehensive, and inte
         monthly_income = financial_context.get('monthly_income', 0)
         total_expenses = financial_context.get('total_expenses', 0)
         category_totals = financial_context.get('category_totals', [])
+        code = base_currency()
         
         # Simple rule-based fallback
         user_message_lower = user_message.lower()
@@ -197,67 +511,72 @@ You have access to all their financial data. Be helpful, comprehensive, and inte
         if any(word in user_message_lower for word in ['categories', 'category', 'what categories']):
             source = all_category_totals if all_category_totals else category_totals
             if source:
-                category_list = "\n".join([f"• {cat['category']}: NPR {cat['amount']:,.2f}" for cat in source])
+                category_list = "\n".join([f"• {cat['category']}: {code} {cat['amount']:,.2f}" for cat in source])
                 total_all = sum([c['amount'] for c in source])
-                return f"Here are all your spending categories:\n\n{category_list}\n\nTotal spending across all categories: NPR {total_all:,.2f}"
+                return f"Here are all your spending categories:\n\n{category_list}\n\nTotal spending across all categories: {code} {total_all:,.2f}"
             else:
                 return "You don't have any categorized expenses yet. Start tracking your spending to see category breakdowns!"
         
         # Handle spending questions
         elif any(word in user_message_lower for word in ['spending', 'spent', 'expenses', 'ok spending']):
             if category_totals:
-                category_list = "\n".join([f"• {cat['category']}: NPR {cat['amount']:,.2f}" for cat in category_totals])
-                return f"Here's your complete spending breakdown:\n\n{category_list}\n\nTotal spending: NPR {total_expenses:,.2f}\nIncome: NPR {monthly_income:,.2f}\nSavings: NPR {savings:,.2f}"
+                category_list = "\n".join([f"• {cat['category']}: {code} {cat['amount']:,.2f}" for cat in category_totals])
+                return f"Here's your complete spending breakdown:\n\n{category_list}\n\nTotal spending: {code} {total_expenses:,.2f}\nIncome: {code} {monthly_income:,.2f}\nSavings: {code} {savings:,.2f}"
             else:
-                return f"Your total spending is NPR {total_expenses:,.2f}. Start categorizing your expenses to get detailed breakdowns!"
+                return f"Your total spending is {code} {total_expenses:,.2f}. Start categorizing your expenses to get detailed breakdowns!"
         
         # Handle specific category questions
         elif 'entertainment' in user_message_lower:
             entertainment_expenses = sum([cat['amount'] for cat in category_totals if 'entertainment' in cat['category'].lower()])
             if entertainment_expenses > 0:
-                return f"Entertainment spending: NPR {entertainment_expenses:,.2f}"
+                return f"Entertainment spending: {code} {entertainment_expenses:,.2f}"
             else:
                 return "No entertainment expenses recorded."
         
         elif any(word in user_message_lower for word in ['budget', 'show me my budget']):
-            return f"Your monthly budget/income is NPR {monthly_income:,.2f}. Your current spending is NPR {total_expenses:,.2f}, leaving you with NPR {savings:,.2f} in savings."
+            return f"Your monthly budget/income is {code} {monthly_income:,.2f}. Your current spending is {code} {total_expenses:,.2f}, leaving you with {code} {savings:,.2f} in savings."
         
         elif 'least' in user_message_lower or 'lowest' in user_message_lower:
             if category_totals and len(category_totals) > 1:
                 sorted_categories = sorted(category_totals, key=lambda x: x['amount'])
                 lowest_category = sorted_categories[0]
-                return f"Your lowest spending category is {lowest_category['category']} with NPR {lowest_category['amount']:,.2f}."
+                return f"Your lowest spending category is {lowest_category['category']} with {code} {lowest_category['amount']:,.2f}."
             else:
                 return "You don't have enough categorized expenses to determine the lowest spending category."
         
         elif 'biggest' in user_message_lower or 'highest' in user_message_lower:
             if category_totals:
                 top_category = category_totals[0]
-                return f"Your highest spending category is {top_category['category']} with NPR {top_category['amount']:,.2f}."
+                return f"Your highest spending category is {top_category['category']} with {code} {top_category['amount']:,.2f}."
             else:
                 return "You don't have any categorized expenses yet."
         
         elif 'income' in user_message_lower:
-            return f"Your monthly income is NPR {monthly_income:,.2f}. With expenses of NPR {total_expenses:,.2f}, you're saving NPR {savings:,.2f} per month."
+            return f"Your monthly income is {code} {monthly_income:,.2f}. With expenses of {code} {total_expenses:,.2f}, you're saving {code} {savings:,.2f} per month."
         
         elif 'savings' in user_message_lower:
             savings = monthly_income - total_expenses
-            return f"Your current savings are NPR {savings:,.2f}. This represents a savings rate of {savings_rate:.1f}% of your income."
+            return f"Your current savings are {code} {savings:,.2f}. This represents a savings rate of {savings_rate:.1f}% of your income."
         
         else:
             return "I'm your comprehensive AI financial advisor! I can help you with spending analysis, category breakdowns, budget monitoring, savings tracking, and financial insights. Ask me about your categories, spending, income, savings, or any financial questions!"
     
     def get_service_status(self) -> Dict[str, Any]:
         """Get the status of OpenAI service"""
+        available = self.openai_available
+        checked_at = _healthy_at.get((self.api_url, self.model))
         status = {
             'service': 'OpenAI',
-            'available': self.openai_available,
+            'available': available,
             'model': self.model,
             'free': False,
-            'local': False
+            'local': False,
+            'circuit_breaker': get_circuit_breaker().snapshot(),
+            'transport': get_transport().stats(),
+            'health_checked_seconds_ago': round(time.monotonic() - checked_at, 1) if checked_at is not None else None
         }
         
-        if self.openai_available:
+        if available:
             status['api_key_configured'] = bool(self.api_key)
         
         return status
@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) Pagination
+==========================
+
+Pages are selected with a WHERE clause on the ordering columns of the last
+row of the previous page, e.g. ``(date, id) < (last_date, last_id)``,
+instead of OFFSET. With a matching index every page costs O(page size) no
+matter how deep the client has paged.
+
+The cursor is an opaque URL-safe token encoding the last row's key.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _pagination_settings():
+    return getattr(settings, 'LIST_PAGINATION', {})
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over the ``ordering`` fields.
+
+    The last field must be unique (normally ``id``). Nullable fields are
+    ordered NULLS LAST.
+    """
+    ordering = ('-date', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        config = _pagination_settings()
+        page_size = config.get('PAGE_SIZE', 50)
+        max_page_size = config.get('MAX_PAGE_SIZE', 500)
+        # `limit` is accepted for clients written against the old offset API
+        requested = request.query_params.get(self.page_size_query_param) or request.query_params.get('limit')
+        if requested:
+            try:
+                page_size = int(requested)
+            except ValueError:
+                pass
+        return max(1, min(page_size, max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        model = queryset.model
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-'), model._meta.get_field(name.lstrip('-')).null)
+            for name in self.ordering
+        ]
+
+        # NULLS LAST is only spelled out for nullable columns so plain
+        # columns keep an ORDER BY the index can satisfy directly
+        queryset = queryset.order_by(*[
+            (F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)) if nullable
+            else (F(name).desc() if descending else F(name).asc())
+            for name, descending, nullable in self.fields
+        ])
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position = self.decode_cursor(encoded, model)
+            queryset = queryset.filter(self.after_position(position))
+
+        # Fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def after_position(self, position):
+        """Q matching rows that sort strictly after ``position``"""
+        condition = Q(pk__in=[])
+        equal_so_far = Q()
+        for (name, descending, nullable), value in zip(self.fields, position):
+            if value is None:
+                # NULLS LAST: nothing sorts after NULL on this column
+                after = Q(pk__in=[])
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if nullable:
+                    after |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            condition |= equal_so_far & after
+            equal_so_far &= equal
+
+        # Redundant bound on the leading column so the database can start
+        # with an index range scan instead of evaluating the OR per row
+        name, descending, nullable = self.fields[0]
+        if position[0] is not None and not nullable:
+            condition &= Q(**{f'{name}__lte' if descending else f'{name}__gte': position[0]})
+        return condition
+
+    def row_position(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _, _ in self.fields]
+        return [getattr(row, name) for name, _, _ in self.fields]
+
+    def encode_cursor(self, position):
+        payload = json.dumps([None if value is None else str(value) for value in position])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded, model):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(raw, list) or len(raw) != len(self.fields):
+                raise ValueError
+            return [
+                None if value is None else model._meta.get_field(name).to_python(value)
+                for (name, _, _), value in zip(self.fields, raw)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'offset')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.row_position(self.page[-1])))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class DateKeysetPagination(KeysetPagination):
+    """Newest first on (date, id); for expenses and transactions"""
+    ordering = ('-date', '-id')
+
+
+class BudgetKeysetPagination(KeysetPagination):
+    """Newest period first on (year, month, id)"""
+    ordering = ('-year', '-month', '-id')
@@ -0,0 +1,91 @@
+"""
+Date Period Helpers
+===================
+
+Turns calendar periods (month, quarter, year or a custom span) into
+half-open ``[start, end)`` date ranges.
+
+Filtering with ``date__gte`` / ``date__lt`` keeps the ``date`` column bare in
+the WHERE clause, so the ``(user, date)`` indexes can be used for a range
+scan. ``date__year`` / ``date__month`` lookups compile to function calls on
+the column (``django_date_extract`` on SQLite) and force a full scan of the
+user's rows.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+DateRange = Tuple[date, date]
+
+
+def month_range(year: int, month: int) -> DateRange:
+    """[first day of the month, first day of the next month)"""
+    start = date(year, month, 1)
+    if month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def quarter_range(year: int, quarter: int) -> DateRange:
+    """[first day of the quarter, first day of the next quarter)"""
+    if quarter not in (1, 2, 3, 4):
+        raise ValueError(f"Quarter must be 1-4, got {quarter}")
+    first_month = (quarter - 1) * 3 + 1
+    start, _ = month_range(year, first_month)
+    _, end = month_range(year, first_month + 2)
+    return start, end
+
+
+def year_range(year: int) -> DateRange:
+    """[1 January, 1 January of the next year)"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def custom_range(start: date, end: date) -> DateRange:
+    """[start, end] with an inclusive end date, as used by query parameters"""
+    return start, end + timedelta(days=1)
+
+
+def months_back_range(today: date, months: int) -> DateRange:
+    """
+    The current month and the ``months - 1`` months before it, e.g.
+    ``months_back_range(date(2025, 3, 14), 3)`` covers January to March 2025.
+    """
+    year, month = today.year, today.month - (months - 1)
+    while month <= 0:
+        month += 12
+        year -= 1
+    start, _ = month_range(year, month)
+    _, end = month_range(today.year, today.month)
+    return start, end
+
+
+def previous_month_range(today: date) -> DateRange:
+    """The calendar month before the one containing ``today``"""
+    last_day = date(today.year, today.month, 1) - timedelta(days=1)
+    return month_range(last_day.year, last_day.month)
+
+
+def period_range(period: str, year: Optional[int] = None, month: Optional[int] = None,
+                 quarter: Optional[int] = None, start: Optional[date] = None,
+                 end: Optional[date] = None) -> DateRange:
+    """Dispatch on ``period`` ('month', 'quarter', 'year' or 'custom')"""
+    if period == 'month':
+        return month_range(year, month)
+    if period == 'quarter':
+        return quarter_range(year, quarter)
+    if period == 'year':
+        return year_range(year)
+    if period == 'custom':
+        return custom_range(start, end)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def date_range_filter(date_range: DateRange, field: str = 'date') -> Dict[str, date]:
+    """
+    Keyword arguments for ``QuerySet.filter``::
+
+        Expense.objects.filter(user=user, **date_range_filter(month_range(2025, 3)))
+    """
+    start, end = date_range
+    return {f'{field}__gte': start, f'{field}__lt': end}
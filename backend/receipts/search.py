@@ -0,0 +1,195 @@
+"""
+Full-Text Search
+================
+
+Ranked search over expense merchants/descriptions and the OCR text of
+uploaded receipts (``Transaction.description``).
+
+- SQLite: the ``receipts_search`` FTS5 table, kept in sync by triggers
+  (migration 0010), ranked with bm25. SQLite drops a table's triggers
+  when a migration rebuilds it (to drop or alter a column), so they are
+  recreated after every ``migrate`` (``restore_search_triggers``) rather
+  than by hand in each such migration.
+- PostgreSQL: GIN indexes on ``to_tsvector`` expressions, ranked with
+  ``ts_rank``.
+
+Other databases fall back to ``icontains`` without ranking.
+
+User input is never passed to the engine's query syntax directly: it is
+split into words, each quoted, and the last word is prefix-matched so
+results update as the user types.
+"""
+
+import importlib
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db import connection, connections
+from django.db.models import Q
+
+from .models import Expense, Transaction
+
+SOURCES = ('expense', 'transaction')
+
+MAX_LIMIT = 100
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Must match the index expressions in migration 0010
+EXPENSE_VECTOR = "to_tsvector('simple', coalesce(merchant, '') || ' ' || coalesce(description, ''))"
+TRANSACTION_VECTOR = "to_tsvector('simple', coalesce(description, ''))"
+
+
+def restore_search_triggers(sender=None, using='default', **kwargs):
+    """
+    ``post_migrate`` handler: put back the SQLite sync triggers from
+    migration 0010, in case a migration rebuilt a table and dropped them
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite' or 'receipts_search' not in db.introspection.table_names():
+        return
+    search_0010 = importlib.import_module('receipts.migrations.0010_search_index')
+    with db.cursor() as cursor:
+        for statement in search_0010.SQLITE_BACKWARD + search_0010.SQLITE_FORWARD:
+            if 'TRIGGER' in statement:
+                cursor.execute(statement)
+
+
+def query_terms(text: str) -> List[str]:
+    return _WORD.findall(text or '')[:16]
+
+
+def _fts5_query(terms: Sequence[str], user_id: int) -> str:
+    words = [f'"{term}"' for term in terms]
+    words[-1] += '*'
+    return f'owner:"u{user_id}" AND ({" ".join(words)})'
+
+
+def _tsquery(terms: Sequence[str]) -> str:
+    words = [term.lower() for term in terms]
+    words[-1] += ':*'
+    return ' & '.join(words)
+
+
+def _search_sqlite(user_id: int, terms, sources, limit) -> List[Tuple[str, int, float, str]]:
+    sql = (
+        "SELECT rowid, bm25(receipts_search, 0.0, 4.0, 1.0) AS score, "
+        "snippet(receipts_search, 1, '[', ']', '...', 12), "
+        "snippet(receipts_search, 2, '[', ']', '...', 12) "
+        "FROM receipts_search WHERE receipts_search MATCH %s"
+    )
+    params = [_fts5_query(terms, user_id)]
+    if len(sources) == 1:
+        sql += " AND rowid %% 2 = %s"
+        params.append(0 if sources[0] == 'expense' else 1)
+    # bm25 is lower for better matches
+    sql += " ORDER BY score LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # Snippets are taken per column, since the owner column always matches
+        return [
+            ('expense' if rowid % 2 == 0 else 'transaction', rowid // 2, -score, body if '[' in body else merchant)
+            for rowid, score, merchant, body in cursor.fetchall()
+        ]
+
+
+def _search_postgres(user_id: int, terms, sources, limit) -> List[Tuple[str, int, float, str]]:
+    branches = []
+    params = []
+    tsquery = _tsquery(terms)
+    if 'expense' in sources:
+        branches.append(
+            f"SELECT 'expense' AS source, id, ts_rank({EXPENSE_VECTOR}, q) AS score, "
+            f"coalesce(merchant, '') || ' ' || coalesce(description, '') AS body "
+            f"FROM receipts_expense, to_tsquery('simple', %s) q "
+            f"WHERE user_id = %s AND {EXPENSE_VECTOR} @@ q"
+        )
+        params += [tsquery, user_id]
+    if 'transaction' in sources:
+        branches.append(
+            f"SELECT 'transaction' AS source, id, ts_rank({TRANSACTION_VECTOR}, q) AS score, description AS body "
+            f"FROM receipts_transaction, to_tsquery('simple', %s) q "
+            f"WHERE user_id = %s AND {TRANSACTION_VECTOR} @@ q"
+        )
+        params += [tsquery, user_id]
+    # Headlines are only built for the rows that are returned
+    sql = (
+        "SELECT source, id, score, ts_headline('simple', body, to_tsquery('simple', %s), "
+        "'StartSel=[, StopSel=], MaxWords=12, MinWords=4') "
+        f"FROM ({' UNION ALL '.join(branches)} ORDER BY score DESC LIMIT %s) hits ORDER BY score DESC"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, *params, limit])
+        return [(source, pk, score, snippet) for source, pk, score, snippet in cursor.fetchall()]
+
+
+def _search_fallback(user_id: int, terms, sources, limit) -> List[Tuple[str, int, float, str]]:
+    hits = []
+    if 'expense' in sources:
+        condition = Q()
+        for term in terms:
+            condition &= Q(merchant__icontains=term) | Q(description__icontains=term)
+        for pk, merchant in Expense.objects.filter(condition, user_id=user_id).values_list('id', 'merchant')[:limit]:
+            hits.append(('expense', pk, 0.0, merchant))
+    if 'transaction' in sources:
+        condition = Q()
+        for term in terms:
+            condition &= Q(description__icontains=term)
+        for pk, description in Transaction.objects.filter(condition, user_id=user_id).values_list('id', 'description')[:limit]:
+            hits.append(('transaction', pk, 0.0, description[:80]))
+    return hits[:limit]
+
+
+def search(user, text: str, sources: Optional[Sequence[str]] = None, limit: int = 20) -> List[Dict]:
+    """
+    Ranked matches for ``text`` among ``user``'s expenses and transactions,
+    best first, each with the row's main fields and a highlighted snippet.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return []
+    sources = [source for source in (sources or SOURCES) if source in SOURCES]
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if connection.vendor == 'sqlite':
+        hits = _search_sqlite(user.id, terms, sources, limit)
+    elif connection.vendor == 'postgresql':
+        hits = _search_postgres(user.id, terms, sources, limit)
+    else:
+        hits = _search_fallback(user.id, terms, sources, limit)
+
+    # Load the matched rows in one query per source, then keep rank order
+    expense_ids = [pk for source, pk, _, _ in hits if source == 'expense']
+    transaction_ids = [pk for source, pk, _, _ in hits if source == 'transaction']
+    rows = {}
+    if expense_ids:
+        for row in Expense.objects.filter(pk__in=expense_ids, user=user).values(
+                'id', 'date', 'amount', 'currency', 'merchant', 'description', 'category__name'):
+            rows[('expense', row['id'])] = {
+                'date': row['date'],
+                'amount': row['amount'],
+                'currency': row['currency'],
+                'merchant': row['merchant'],
+                'description': row['description'],
+                'category': row['category__name'],
+            }
+    if transaction_ids:
+        for row in Transaction.objects.filter(pk__in=transaction_ids, user=user).values(
+                'id', 'date', 'amount', 'description', 'category'):
+            rows[('transaction', row['id'])] = {
+                'date': row['date'],
+                'amount': row['amount'],
+                'currency': None,
+                'merchant': None,
+                'description': row['description'],
+                'category': row['category'] or None,
+            }
+
+    results = []
+    for source, pk, score, snippet in hits:
+        row = rows.get((source, pk))
+        if row is None:
+            continue
+        results.append({'source': source, 'id': pk, 'score': round(score, 4), 'snippet': snippet, **row})
+    return results
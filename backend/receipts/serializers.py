@@ -1,5 +1,24 @@
 from rest_framework import serializers
-from .models import Budget, Category, Expense, PaymentMethod, Transaction, MonthlyIncome
+from .models import Budget, Category, DataDeletionJob, Expense, PaymentMethod, Transaction, MonthlyIncome
+from .money import DEFAULT_EXPONENT, MoneyField, format_minor, minor_units
+
+class MoneyAmountField(serializers.DecimalField):
+    """Amount of a MoneyField, rendered and validated like a DecimalField"""
+    def __init__(self, decimal_places=DEFAULT_EXPONENT, **kwargs):
+        super().__init__(max_digits=None, decimal_places=decimal_places, **kwargs)
+
+class MoneyModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that maps MoneyField to MoneyAmountField"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        MoneyField: MoneyAmountField,
+    }
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if isinstance(model_field, MoneyField):
+            field_kwargs['decimal_places'] = model_field.exponent
+        return field_class, field_kwargs
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,7 +30,7 @@ class PaymentMethodSerializer(serializers.ModelSerializer):
         model = PaymentMethod
         fields = ['id', 'name']
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(MoneyModelSerializer):
     category = CategorySerializer(read_only=True)
     payment_method = PaymentMethodSerializer(read_only=True)
     
@@ -22,19 +41,134 @@ class ExpenseSerializer(serializers.ModelSerializer):
             'category', 'payment_method', 'description', 'created_at'
         ]
 
-class BudgetSerializer(serializers.ModelSerializer):
+class BudgetSerializer(MoneyModelSerializer):
     category = CategorySerializer(read_only=True)
     
     class Meta:
         model = Budget
         fields = ['id', 'user', 'category', 'amount', 'currency', 'month', 'year']
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(MoneyModelSerializer):
     class Meta:
         model = Transaction
         fields = ['id', 'user', 'description', 'amount', 'category', 'date', 'created_at']
 
-class MonthlyIncomeSerializer(serializers.ModelSerializer):
+class MonthlyIncomeSerializer(MoneyModelSerializer):
     class Meta:
         model = MonthlyIncome
-        fields = ['id', 'user', 'amount', 'currency', 'month', 'year', 'created_at'] 
\ No newline at end of file
+        fields = ['id', 'user', 'amount', 'currency', 'month', 'year', 'created_at'] 
+
+class DataDeletionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DataDeletionJob
+        fields = [
+            'id', 'status', 'progress', 'total_rows', 'deleted_rows', 'deleted_data',
+            'files_removed', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+
+def _iso_date(value):
+    return value.isoformat() if value else None
+
+
+def _iso_datetime(value):
+    # Same output as DRF's DateTimeField for aware UTC datetimes
+    if not value:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _plain(value):
+    return value
+
+
+class ValuesSerializer:
+    """
+    Serializer for read-only list endpoints that works on ``values()`` rows.
+
+    Rows are plain dicts straight from the database cursor, so no model
+    instance or per-row serializer is built. Output matches the
+    corresponding ModelSerializer. Each entry of ``field_map`` is
+    ``name: (lookups, build)`` where ``build`` receives the looked-up values.
+    Lookups named in ``annotations`` are expressions added with
+    ``annotate()`` (e.g. raw minor units of a MoneyField).
+    ``fields`` restricts the output to a sparse fieldset.
+    """
+    field_map = {}
+    annotations = {}
+
+    def __init__(self, fields=None):
+        if fields:
+            unknown = [name for name in fields if name not in self.field_map]
+            if unknown:
+                raise serializers.ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}"})
+            self.fields = [name for name in self.field_map if name in fields]
+        else:
+            self.fields = list(self.field_map)
+        self._plan = [(name, self.field_map[name][0], self.field_map[name][1]) for name in self.fields]
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        requested = query_params.get('fields')
+        return cls([name.strip() for name in requested.split(',') if name.strip()] if requested else None)
+
+    def lookups(self):
+        """Database lookups to pass to ``QuerySet.values()``"""
+        names = []
+        for _, lookups, _ in self._plan:
+            for lookup in lookups:
+                if lookup not in names:
+                    names.append(lookup)
+        return names
+
+    def values(self, queryset, *extra_lookups):
+        """``queryset.values()`` with everything this serializer reads, plus ``extra_lookups``"""
+        lookups = self.lookups()
+        lookups += [name for name in extra_lookups if name not in lookups]
+        annotations = {name: self.annotations[name] for name in lookups if name in self.annotations}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*lookups)
+
+    def to_representation(self, row):
+        return {name: build(*[row[lookup] for lookup in lookups]) for name, lookups, build in self._plan}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+def _related(pk, name):
+    return {'id': pk, 'name': name} if pk is not None else None
+
+
+class ExpenseValuesSerializer(ValuesSerializer):
+    """Fast equivalent of ExpenseSerializer"""
+    field_map = {
+        'id': (('id',), _plain),
+        'user': (('user_id',), _plain),
+        'date': (('date',), _iso_date),
+        'merchant': (('merchant',), _plain),
+        'amount': (('amount_minor',), format_minor),
+        'currency': (('currency',), _plain),
+        'category': (('category_id', 'category__name'), _related),
+        'payment_method': (('payment_method_id', 'payment_method__name'), _related),
+        'description': (('description',), _plain),
+        'created_at': (('created_at',), _iso_datetime),
+    }
+    annotations = {'amount_minor': minor_units('amount')}
+
+
+class TransactionValuesSerializer(ValuesSerializer):
+    """Fast equivalent of TransactionSerializer"""
+    field_map = {
+        'id': (('id',), _plain),
+        'user': (('user_id',), _plain),
+        'description': (('description',), _plain),
+        'amount': (('amount_minor',), format_minor),
+        'category': (('category',), _plain),
+        'date': (('date',), _iso_date),
+        'created_at': (('created_at',), _iso_datetime),
+    }
+    annotations = {'amount_minor': minor_units('amount')}
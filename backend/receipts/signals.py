@@ -0,0 +1,150 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from .autocomplete import record_merchant_use
+from .cache import bump_data_version, bump_global_data_version, bump_merchant_version
+from .currency import convert
+from .forecast import apply_delta, category_name, discard_category
+from .merchants import resolve_merchant
+from .models import Budget, Category, ExchangeRate, Expense, MonthlyIncome, PaymentMethod, Transaction
+
+# Models whose rows belong to a single user
+USER_DATA_MODELS = (Expense, Transaction, Budget, MonthlyIncome)
+
+# Models shared between users
+SHARED_DATA_MODELS = (Category, PaymentMethod, ExchangeRate)
+
+# Model -> text field the vendor (Merchant) is derived from. Transactions
+# have no merchant column (the description is OCR text or a CSV row), so
+# their vendor is only set by code that knows one: the CSV merchant column
+# or receipt extraction
+VENDOR_SOURCE_FIELDS = {Expense: 'merchant'}
+
+
+# Bulk writes (QuerySet.update(), bulk_create(), _raw_delete()) send no
+# signals; their callers bump the data version themselves (see cache.py)
+
+def invalidate_user_data(sender, instance, **kwargs):
+    """Bump the owner's data version whenever one of their rows changes"""
+    if instance.user_id is not None:
+        bump_data_version(instance.user_id)
+
+
+def invalidate_shared_data(sender, instance, **kwargs):
+    """Bump the global data version when categories, payment methods or rates change"""
+    bump_global_data_version()
+
+
+def assign_vendor(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Resolve the normalized Merchant from the free-text name at ingest"""
+    source_field = VENDOR_SOURCE_FIELDS[sender]
+    if raw or (update_fields is not None and source_field not in update_fields):
+        return
+    # An explicitly chosen vendor on a new row is kept; edits re-resolve so
+    # the vendor follows changes to the text
+    if instance._state.adding and instance.vendor_id is not None:
+        return
+    instance.vendor = resolve_merchant(getattr(instance, source_field))
+
+
+def index_new_merchant(sender, instance, created, raw=False, **kwargs):
+    """Add a new expense's merchant to the in-memory autocomplete index"""
+    version = bump_merchant_version(instance.user_id)
+    if created and not raw:
+        transaction.on_commit(lambda: record_merchant_use(instance.user_id, instance.merchant, instance.date, version))
+
+
+def invalidate_merchant_index(sender, instance, **kwargs):
+    bump_merchant_version(instance.user_id)
+
+
+def _forecast_key(sender, instance):
+    """(user id, date, ledger category name, amount in the base currency) of a spending row"""
+    if sender is Expense:
+        if Expense.category.is_cached(instance) and instance.category is not None:
+            category = instance.category.name
+        else:
+            category = category_name(instance.category_id)
+        amount = convert(instance.amount or 0, instance.currency)
+    else:
+        category = instance.category
+        amount = instance.amount or 0
+    # Rows created from extracted or uploaded data may still hold a date string
+    day = sender._meta.get_field('date').to_python(instance.date)
+    return instance.user_id, day, category, amount
+
+
+def remember_forecast_key(sender, instance, raw=False, **kwargs):
+    """Before an update, read the stored row so its old amount can be taken back out"""
+    instance._forecast_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if sender is Expense:
+        row = sender.objects.filter(pk=instance.pk)\
+                            .values_list('user_id', 'date', 'category__name', 'amount', 'currency')\
+                            .first()
+        if row:
+            user_id, day, category, amount, currency = row
+            row = user_id, day, category, convert(amount or 0, currency)
+    else:
+        row = sender.objects.filter(pk=instance.pk)\
+                            .values_list('user_id', 'date', 'category', 'amount')\
+                            .first()
+    instance._forecast_previous = row
+
+
+def update_forecast_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_forecast_previous', None)
+    if previous:
+        user_id, day, category, amount = previous
+        apply_delta(user_id, day, category, -(amount or 0))
+    apply_delta(*_forecast_key(sender, instance))
+
+
+def update_forecast_on_delete(sender, instance, **kwargs):
+    user_id, day, category, amount = _forecast_key(sender, instance)
+    apply_delta(user_id, day, category, -amount)
+
+
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+def discard_forecasts_on_rename(sender, instance, created, raw=False, **kwargs):
+    """Spending under the old name now belongs to the new one; rebuild those forecasts"""
+    previous = getattr(instance, '_previous_name', None)
+    if not created and not raw and previous is not None and previous != instance.name:
+        discard_category(previous)
+
+
+def discard_forecasts_on_delete(sender, instance, **kwargs):
+    # Expenses are moved to uncategorized by a bulk SET NULL, without signals
+    discard_category(instance.name)
+
+
+for model in USER_DATA_MODELS:
+    post_save.connect(invalidate_user_data, sender=model, dispatch_uid=f'invalidate-{model.__name__}-save')
+    post_delete.connect(invalidate_user_data, sender=model, dispatch_uid=f'invalidate-{model.__name__}-delete')
+
+for model in SHARED_DATA_MODELS:
+    post_save.connect(invalidate_shared_data, sender=model, dispatch_uid=f'invalidate-{model.__name__}-save')
+    post_delete.connect(invalidate_shared_data, sender=model, dispatch_uid=f'invalidate-{model.__name__}-delete')
+
+for model in VENDOR_SOURCE_FIELDS:
+    pre_save.connect(assign_vendor, sender=model, dispatch_uid=f'assign-vendor-{model.__name__}')
+
+post_save.connect(index_new_merchant, sender=Expense, dispatch_uid='index-merchant-Expense')
+post_delete.connect(invalidate_merchant_index, sender=Expense, dispatch_uid='invalidate-merchant-index-Expense')
+
+for model in (Expense, Transaction):
+    pre_save.connect(remember_forecast_key, sender=model, dispatch_uid=f'forecast-previous-{model.__name__}')
+    post_save.connect(update_forecast_on_save, sender=model, dispatch_uid=f'forecast-save-{model.__name__}')
+    post_delete.connect(update_forecast_on_delete, sender=model, dispatch_uid=f'forecast-delete-{model.__name__}')
+
+pre_save.connect(remember_category_name, sender=Category, dispatch_uid='forecast-category-name')
+post_save.connect(discard_forecasts_on_rename, sender=Category, dispatch_uid='forecast-category-rename')
+post_delete.connect(discard_forecasts_on_delete, sender=Category, dispatch_uid='forecast-category-delete')
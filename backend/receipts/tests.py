@@ -1,3 +1,1217 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.utils import load_backend
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import autocomplete, columnar_export, jobs, openai_service
+from . import search as full_text_search
+from .admin_performance import EstimatedCountPaginator, estimated_row_count, summary_totals
+from .analytics import analyze, get_user_insights, month_index
+from .cache import get_cache, get_data_version, get_global_data_version, response_cache_key
+from .chat_cache import ChatAnswerCache, get_chat_cache
+from .currency import sum_in
+from .forecast import category_name, get_forecast, initialize_month
+from .intents import Intent, classify
+from .management.commands.benchmark_ledger import Command as BenchmarkLedgerCommand
+from .llm_transport import AsyncLLMTransport, LLMDeadlineExceeded, LLMTransport, is_async_available
+from .models import Budget, Category, DataDeletionJob, ExchangeRate, Expense, LedgerEntry, Merchant, MonthlyIncome, PaymentMethod, SpendingForecast, Transaction
+from .money import MoneyField, format_minor, from_minor, to_minor
+from .openai_service import CircuitBreaker, LLMUnavailable, OpenAIAIService
+from .pagination import DateKeysetPagination
+from .periods import date_range_filter, month_range, months_back_range, period_range, quarter_range
+from .serializers import ExpenseSerializer, ExpenseValuesSerializer, TransactionSerializer, TransactionValuesSerializer
+from .views import ChatView, csv_merchant, last_n_months
 
 # Create your tests here.
+
+class PeriodRangeTests(SimpleTestCase):
+    def test_month_range_is_half_open(self):
+        self.assertEqual(month_range(2025, 2), (date(2025, 2, 1), date(2025, 3, 1)))
+        self.assertEqual(month_range(2025, 12), (date(2025, 12, 1), date(2026, 1, 1)))
+
+    def test_quarter_and_custom_ranges(self):
+        self.assertEqual(quarter_range(2025, 4), (date(2025, 10, 1), date(2026, 1, 1)))
+        self.assertEqual(
+            period_range('custom', start=date(2025, 1, 5), end=date(2025, 1, 9)),
+            (date(2025, 1, 5), date(2025, 1, 10)),
+        )
+
+    def test_months_back_range_crosses_year(self):
+        self.assertEqual(months_back_range(date(2025, 2, 14), 3), (date(2024, 12, 1), date(2025, 3, 1)))
+
+    def test_date_range_filter(self):
+        self.assertEqual(
+            date_range_filter(month_range(2025, 3), field='created'),
+            {'created__gte': date(2025, 3, 1), 'created__lt': date(2025, 4, 1)},
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class PeriodIndexUsageTests(TestCase):
+    """Period filters must compile to index range scans, not per-row function calls"""
+
+    RANGE_SCAN = '(user_id=? AND date>? AND date<?)'
+
+    def setUp(self):
+        self.user = User.objects.create_user('planner', 'planner@example.com', 'pw')
+
+    def test_monthly_totals_uses_user_date_index(self):
+        plan = Expense.objects.monthly_totals(self.user, 2025, 3).explain()
+        self.assertIn(f'USING INDEX receipts_ex_user_id_c9e333_idx {self.RANGE_SCAN}', plan)
+
+    def test_ledger_month_uses_index_on_both_sources(self):
+        plan = LedgerEntry.objects.for_user(self.user).in_month(2025, 3).category_totals().explain()
+        self.assertIn(f'receipts_ex_user_id_c9e333_idx {self.RANGE_SCAN}', plan)
+        self.assertIn(f'receipts_tr_user_id_a2b5ff_idx {self.RANGE_SCAN}', plan)
+
+
+class StandInLLMHandler(BaseHTTPRequestHandler):
+    """Answers with the statuses queued on the server, then 200"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.clients.add(self.client_address)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        time.sleep(self.server.delay)
+        body = json.dumps({'response': 'ok'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up at its deadline
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in_llm():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInLLMHandler)
+    server.statuses, server.clients, server.delay = [], set(), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/generate'
+
+
+class LLMTransportTests(SimpleTestCase):
+    """The pooled transport against a local stand-in for the LLM API"""
+
+    def setUp(self):
+        self.server, self.url = start_stand_in_llm()
+        self.transport = LLMTransport(max_retries=2, backoff_base=0.01, deadline=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_one_connection(self):
+        for _ in range(5):
+            self.assertEqual(self.transport.post(self.url, json={'prompt': 'hi'}).status_code, 200)
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 429]
+        response = self.transport.post(self.url, json={'prompt': 'hi'})
+        self.assertEqual(response.status_code, 200)
+        stats = self.transport.stats()
+        self.assertEqual((stats['requests'], stats['attempts'], stats['retries'], stats['errors']), (1, 3, 2, 0))
+
+    def test_returns_last_response_when_retries_run_out(self):
+        self.server.statuses = [500, 500, 500, 500]
+        self.assertEqual(self.transport.post(self.url, json={}).status_code, 500)
+        self.assertEqual(self.transport.stats()['errors'], 1)
+
+    def test_deadline_covers_all_attempts(self):
+        self.server.delay = 1
+        started = time.monotonic()
+        with self.assertRaises(LLMDeadlineExceeded):
+            self.transport.post(self.url, json={}, deadline=0.3)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+@skipUnless(is_async_available(), 'httpx is not installed')
+class AsyncLLMTransportTests(SimpleTestCase):
+    """The async transport against the same stand-in"""
+
+    def setUp(self):
+        self.server, self.url = start_stand_in_llm()
+        self.async_transport = AsyncLLMTransport(max_retries=2, backoff_base=0.01, deadline=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_retries_server_errors(self):
+        self.server.statuses = [503, 429]
+        response = await self.async_transport.post(self.url, json={'prompt': 'hi'})
+        self.assertEqual(response.status_code, 200)
+        stats = self.async_transport.stats()
+        self.assertEqual((stats['requests'], stats['attempts'], stats['retries'], stats['errors']), (1, 3, 2, 0))
+        await self.async_transport.aclose()
+
+    async def test_deadline_cancels_the_attempt(self):
+        self.server.delay = 1
+        started = time.monotonic()
+        with self.assertRaises(LLMDeadlineExceeded):
+            await self.async_transport.post(self.url, json={}, deadline=0.3)
+        self.assertLess(time.monotonic() - started, 1)
+        await self.async_transport.aclose()
+
+    async def test_requests_run_concurrently(self):
+        self.server.delay = 0.5
+        started = time.monotonic()
+        responses = await asyncio.gather(*[self.async_transport.post(self.url, json={}) for _ in range(10)])
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertLess(time.monotonic() - started, 2)
+        await self.async_transport.aclose()
+
+
+class ResponseCacheTests(TestCase):
+    """Writes through the ORM make a user's cached responses unreachable"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user('saver', 'saver@example.com', 'pw')
+        self.category = Category.objects.create(name='Food')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _rows(self):
+        today = date.today()
+        return [
+            lambda: Expense.objects.create(user=self.user, date=today, merchant='Cafe', amount=Decimal('4.50'), currency='NPR'),
+            lambda: Transaction.objects.create(user=self.user, description='Receipt', amount=Decimal('3.00'), date=today),
+            lambda: Budget.objects.create(user=self.user, category=self.category, amount=Decimal('100'), month=today.month, year=today.year),
+            lambda: MonthlyIncome.objects.create(user=self.user, amount=Decimal('500'), month=today.month, year=today.year),
+        ]
+
+    def test_save_and_delete_of_each_watched_model_bump_the_version(self):
+        for create in self._rows():
+            before = get_data_version(self.user.pk)
+            row = create()
+            after_save = get_data_version(self.user.pk)
+            self.assertNotEqual(before, after_save, type(row).__name__)
+            row.save()
+            self.assertNotEqual(after_save, get_data_version(self.user.pk), type(row).__name__)
+            before_delete = get_data_version(self.user.pk)
+            row.delete()
+            self.assertNotEqual(before_delete, get_data_version(self.user.pk), type(row).__name__)
+
+    def test_shared_models_bump_the_global_version(self):
+        before = get_global_data_version()
+        PaymentMethod.objects.create(name='Card')
+        self.assertNotEqual(before, get_global_data_version())
+
+    def test_cached_dashboard_is_recomputed_after_a_write(self):
+        url = reverse('dashboard-summary')
+        self.assertEqual(self.client.get(url).data['total_expenses'], 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['total_expenses'], 0)
+
+        Expense.objects.create(user=self.user, date=date.today(), merchant='Cafe', amount=Decimal('12.50'), currency='NPR')
+        self.assertEqual(self.client.get(url).data['total_expenses'], Decimal('12.50'))
+
+    def test_cache_busting_parameters_share_the_entry(self):
+        url = reverse('expense-stats')
+        self.client.get(url, {'_t': 1, '_v': '2.0'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {'_v': '2.0', '_t': 2}).status_code, 200)
+        # Parameters the view reads still get their own entries
+        keys = set()
+        for params in [{'_v': '1'}, {'_v': '2'}, {'_v': '2', '_t': 3}]:
+            request = APIRequestFactory().get(url, params)
+            request.user = self.user
+            keys.add(response_cache_key('expense-stats', request))
+        self.assertEqual(len(keys), 2)
+
+
+class ETagTests(TestCase):
+    """Conditional GETs are answered from the data version"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user('poller', 'poller@example.com', 'pw')
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('133.2'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('dashboard-summary')
+
+    def test_matching_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cache_buster_does_not_change_the_etag(self):
+        url = reverse('expense-stats')
+        etag = self.client.get(url, {'_t': 1700000000000, '_v': '2.0'})['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'_t': 1700000005000, '_v': '2.0'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_a_write(self):
+        etag = self.client.get(self.url)['ETag']
+        MonthlyIncome.objects.create(user=self.user, amount=Decimal('500'), month=date.today().month, year=date.today().year)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_currency_is_400_without_etag(self):
+        response = self.client.get(self.url, {'currency': 'XYZ'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_etag_differs_per_currency(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'currency': 'USD'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pager', 'pager@example.com', 'pw')
+        for day in (date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 2), date(2025, 3, 2), date(2025, 3, 2), date(2025, 3, 3), date(2025, 3, 2)):
+            Expense.objects.create(user=self.user, date=day, merchant='Shop', amount=Decimal('1.00'), currency='NPR')
+
+    def paginate(self, params):
+        paginator = DateKeysetPagination()
+        request = Request(APIRequestFactory().get('/expenses/', params))
+        page = paginator.paginate_queryset(Expense.objects.filter(user=self.user), request)
+        return paginator, page
+
+    def test_pages_are_stable_across_equal_dates(self):
+        seen, params = [], {'page_size': 2}
+        while True:
+            paginator, page = self.paginate(params)
+            seen.extend(expense.pk for expense in page)
+            next_link = paginator.get_next_link()
+            if not next_link:
+                break
+            params = {'page_size': 2, 'cursor': parse_qs(urlparse(next_link).query)['cursor'][0]}
+        expected = list(Expense.objects.filter(user=self.user).order_by('-date', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_404(self):
+        with self.assertRaises(NotFound):
+            self.paginate({'cursor': 'not-a-cursor'})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(reverse('expense-list'), {'cursor': 'bm90IGpzb24'}).status_code, 404)
+
+    @override_settings(LIST_PAGINATION={'PAGE_SIZE': 3, 'MAX_PAGE_SIZE': 5})
+    def test_page_size_is_clamped(self):
+        for requested, expected in [(None, 3), ('0', 1), ('-4', 1), ('4', 4), ('100', 5), ('many', 3)]:
+            paginator, page = self.paginate({'page_size': requested} if requested else {})
+            self.assertEqual((paginator.page_size, len(page)), (expected, expected), requested)
+
+
+class VendorResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pw')
+
+    def test_transactions_get_no_vendor_from_their_description(self):
+        Transaction.objects.create(user=self.user, description="{'amount': 5, 'category': 'Food'}", amount=Decimal('5'))
+        Transaction.objects.create(user=self.user, description='TOTAL RS 450\nBhat Bhateni', amount=Decimal('450'))
+        self.assertFalse(Merchant.objects.exists())
+
+    def test_csv_merchant_column(self):
+        self.assertEqual(csv_merchant({'amount': 5, 'merchant': float('nan'), 'payee': 'Himalayan Java'}), 'Himalayan Java')
+        self.assertIsNone(csv_merchant({'amount': 5, 'merchant': float('nan')}))
+
+    def test_expenses_resolve_their_merchant(self):
+        first = Expense.objects.create(user=self.user, date=date.today(), merchant='Bhat-Bhateni Supermarket #12', amount=Decimal('1'), currency='NPR')
+        second = Expense.objects.create(user=self.user, date=date.today(), merchant='BHAT BHATENI SUPERMARKET PVT. LTD.', amount=Decimal('1'), currency='NPR')
+        self.assertIsNotNone(first.vendor_id)
+        self.assertEqual(first.vendor_id, second.vendor_id)
+
+    def test_backfill_bumps_the_global_version(self):
+        Expense.objects.create(user=self.user, date=date.today(), merchant='Cafe', amount=Decimal('1'), currency='NPR')
+        Expense.objects.filter(user=self.user).update(vendor=None)
+        before = get_global_data_version()
+        call_command('backfill_merchants', stdout=StringIO())
+        self.assertIsNotNone(Expense.objects.get(user=self.user).vendor_id)
+        self.assertNotEqual(before, get_global_data_version())
+
+
+class MerchantAutocompleteTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        autocomplete.forget_user(1)
+        self.user = User.objects.create_user('typist', 'typist@example.com', 'pw')
+        self.today = date.today()
+
+    def add(self, merchant, day=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Expense.objects.create(user=self.user, date=day or self.today, merchant=merchant, amount=Decimal('1'), currency='NPR')
+
+    def names(self, prefix):
+        return [row['merchant'] for row in autocomplete.suggest_merchants(self.user, prefix)]
+
+    def test_prefix_matches_any_word(self):
+        self.add('Himalayan Java Coffee')
+        self.add('Bhat-Bhateni Supermarket')
+        self.assertEqual(self.names('java'), ['Himalayan Java Coffee'])
+        self.assertEqual(self.names('him'), ['Himalayan Java Coffee'])
+        self.assertEqual(self.names('super'), ['Bhat-Bhateni Supermarket'])
+        self.assertEqual(self.names('xyz'), [])
+
+    def test_ranked_by_decayed_use(self):
+        old = self.today - timedelta(days=365)
+        for _ in range(3):
+            self.add('Cafe Old', old)
+        self.add('Cafe New')
+        self.add('Cafe Often')
+        self.add('Cafe Often')
+        self.assertEqual(self.names('cafe'), ['Cafe Often', 'Cafe New', 'Cafe Old'])
+
+    def test_new_expense_is_added_in_place(self):
+        self.add('Cafe One')
+        index = autocomplete.get_index(self.user.pk)
+        self.add('Cafe Two')
+        with self.assertNumQueries(0):
+            self.assertIs(autocomplete.get_index(self.user.pk), index)
+        self.assertEqual(sorted(self.names('cafe')), ['Cafe One', 'Cafe Two'])
+
+    def test_unrelated_writes_keep_the_index(self):
+        self.add('Cafe One')
+        index = autocomplete.get_index(self.user.pk)
+        MonthlyIncome.objects.create(user=self.user, amount=Decimal('500'), month=self.today.month, year=self.today.year)
+        self.assertIs(autocomplete.get_index(self.user.pk), index)
+
+    def test_deletion_rebuilds_the_index(self):
+        expense = self.add('Cafe One')
+        self.assertEqual(self.names('cafe'), ['Cafe One'])
+        expense.delete()
+        self.assertEqual(self.names('cafe'), [])
+
+    def test_missed_change_is_not_stamped_over(self):
+        self.add('Cafe One')
+        self.assertEqual(self.names('cafe'), ['Cafe One'])
+        # Another process removes the merchant, then this one saves an expense
+        Expense.objects.filter(user=self.user).delete()
+        self.add('Cafe Two')
+        self.assertEqual(self.names('cafe'), ['Cafe Two'])
+
+
+class ForecastInvariantTests(TestCase):
+    """Rows moved by deltas must match rows built fresh from the ledger"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('forecaster', 'forecaster@example.com', 'pw')
+        self.food = Category.objects.create(name='Food')
+        self.today = date.today()
+        get_forecast(self.user)
+
+    def spending(self):
+        return dict(SpendingForecast.objects.filter(user=self.user, year=self.today.year, month=self.today.month)
+                                            .values_list('category', 'spent_to_date'))
+
+    def assertMatchesRebuild(self):
+        get_forecast(self.user)
+        incremental = {category: spent for category, spent in self.spending().items() if spent}
+        SpendingForecast.objects.filter(user=self.user).delete()
+        initialize_month(self.user.pk, self.today.year, self.today.month)
+        fresh = {category: spent for category, spent in self.spending().items() if spent}
+        self.assertEqual(incremental, fresh)
+        return incremental
+
+    def expense(self, amount, category=None):
+        return Expense.objects.create(user=self.user, date=self.today, merchant='Shop', amount=Decimal(amount),
+                                      currency='NPR', category=category or self.food)
+
+    def test_create_update_delete(self):
+        first = self.expense('10.00')
+        Transaction.objects.create(user=self.user, description='Receipt', amount=Decimal('2.50'), category='Food', date=self.today)
+        self.assertEqual(self.assertMatchesRebuild(), {'Food': Decimal('12.50'), SpendingForecast.TOTAL: Decimal('12.50')})
+
+        first.amount = Decimal('7.00')
+        first.category = Category.objects.create(name='Rent')
+        first.save()
+        self.assertMatchesRebuild()
+
+        first.delete()
+        self.assertEqual(self.assertMatchesRebuild(), {'Food': Decimal('2.50'), SpendingForecast.TOTAL: Decimal('2.50')})
+
+    def test_rename_category(self):
+        self.expense('10.00')
+        self.expense('5.00')
+        self.food.name = 'Groceries'
+        self.food.save()
+        self.expense('1.00')
+        self.assertEqual(self.assertMatchesRebuild(), {'Groceries': Decimal('16.00'), SpendingForecast.TOTAL: Decimal('16.00')})
+
+    def test_delete_category(self):
+        self.expense('10.00')
+        self.food.delete()
+        self.assertEqual(self.assertMatchesRebuild(), {'': Decimal('10.00'), SpendingForecast.TOTAL: Decimal('10.00')})
+
+    def test_category_named_like_a_wildcard(self):
+        self.expense('10.00')
+        self.expense('4.00', category=Category.objects.create(name='*'))
+        self.assertEqual(self.assertMatchesRebuild(), {'Food': Decimal('10.00'), '*': Decimal('4.00'), SpendingForecast.TOTAL: Decimal('14.00')})
+        forecast = get_forecast(self.user)
+        self.assertEqual(forecast['total']['spent_to_date'], 14)
+        self.assertEqual(sorted(row['category'] for row in forecast['categories']), ['*', 'Food'])
+
+    def test_saving_an_expense_does_not_look_up_its_category(self):
+        self.expense('1.00')
+        expense = Expense.objects.get(user=self.user)
+        category_name(self.food.pk)
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        self.assertFalse([query for query in queries if 'receipts_category' in query['sql'] and 'receipts_expense' not in query['sql']])
+
+
+class MoneyTests(SimpleTestCase):
+    def test_round_trip(self):
+        for amount in ['0.00', '0.01', '12.34', '-12.34', '99999999.99']:
+            self.assertEqual(from_minor(to_minor(Decimal(amount))), Decimal(amount))
+        self.assertEqual(to_minor(12), 1200)
+        self.assertEqual(to_minor(12.34), 1234)
+
+    def test_rounds_half_up(self):
+        self.assertEqual(to_minor(Decimal('12.345')), 1235)
+        self.assertEqual(to_minor(Decimal('12.3449')), 1234)
+        self.assertEqual(to_minor(Decimal('-12.345')), -1235)
+        self.assertEqual(to_minor(Decimal('0.005')), 1)
+
+    def test_format_minor(self):
+        self.assertEqual(format_minor(1234), '12.34')
+        self.assertEqual(format_minor(5), '0.05')
+        self.assertEqual(format_minor(-5), '-0.05')
+        self.assertEqual(format_minor(-1234), '-12.34')
+        self.assertEqual(format_minor(0), '0.00')
+        self.assertEqual(format_minor(1234, exponent=0), '1234')
+        self.assertIsNone(format_minor(None))
+
+    def test_from_db_value_of_aggregates(self):
+        # SQLite returns sums through the fx join as floats or Decimals
+        field = MoneyField()
+        self.assertEqual(field.from_db_value(1234, None, None), Decimal('12.34'))
+        self.assertEqual(field.from_db_value(1234.0, None, None), Decimal('12.34'))
+        self.assertEqual(field.from_db_value(1234.5, None, None), Decimal('12.35'))
+        self.assertEqual(field.from_db_value(Decimal('1233.9999999'), None, None), Decimal('12.34'))
+        self.assertIsNone(field.from_db_value(None, None, None))
+
+
+class MoneyStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('money', 'money@example.com', 'pw')
+
+    def test_sum_in_converts_through_the_rate(self):
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('133.25'))
+        Expense.objects.create(user=self.user, date=date(2024, 5, 1), merchant='Shop', amount=Decimal('10.01'), currency='USD')
+        Expense.objects.create(user=self.user, date=date(2024, 5, 2), merchant='Shop', amount=Decimal('0.10'), currency='NPR')
+        total = Expense.objects.filter(user=self.user).aggregate(total=sum_in())['total']
+        # 10.01 * 133.25 = 1333.8325 -> 1333.83, plus 0.10
+        self.assertEqual(total, Decimal('1333.93'))
+
+    def test_serializers_render_the_old_decimal_strings(self):
+        expense = Expense.objects.create(user=self.user, date=date(2024, 5, 1), merchant='Shop', amount=Decimal('12.34'), currency='NPR')
+        Transaction.objects.create(user=self.user, description='Refund', amount=Decimal('-0.50'), date=date(2024, 5, 1))
+        Transaction.objects.create(user=self.user, description='Pending', amount=None, date=date(2024, 5, 2))
+        self.assertEqual(ExpenseSerializer(Expense.objects.get(pk=expense.pk)).data['amount'], '12.34')
+        values = ExpenseValuesSerializer()
+        self.assertEqual(values.serialize(values.values(Expense.objects.all()))[0]['amount'], '12.34')
+
+        transactions = Transaction.objects.order_by('date')
+        self.assertEqual([row['amount'] for row in TransactionSerializer(transactions, many=True).data], ['-0.50', None])
+        values = TransactionValuesSerializer()
+        self.assertEqual([row['amount'] for row in values.serialize(values.values(transactions))], ['-0.50', None])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Migrates a scratch SQLite database')
+class MoneyMigrationTests(SimpleTestCase):
+    """0014 and 0015 carry decimal amounts over to minor units"""
+    alias = 'premigration'
+
+    def setUp(self):
+        # A database of its own, since 0015 cannot be unapplied from the
+        # test one; left out of settings so the test runner doesn't set it up
+        self.directory = tempfile.TemporaryDirectory()
+        settings_dict = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            'NAME': os.path.join(self.directory.name, 'premigration.sqlite3'),
+        }
+        connections[self.alias] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, self.alias)
+
+    def tearDown(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+        self.directory.cleanup()
+
+    def migrate(self, migration):
+        target = ('receipts', migration)
+        executor = MigrationExecutor(connections[self.alias])
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def test_amounts_are_converted(self):
+        apps = self.migrate('0013_exchangerate')
+        user = apps.get_model('auth', 'User').objects.using(self.alias).create(username='old')
+        category = apps.get_model('receipts', 'Category').objects.using(self.alias).create(name='Food')
+        Expense = apps.get_model('receipts', 'Expense')
+        Transaction = apps.get_model('receipts', 'Transaction')
+        Expense.objects.using(self.alias).create(user=user, date=date(2024, 5, 1), merchant='Cafe', amount=Decimal('12.35'), currency='NPR')
+        Transaction.objects.using(self.alias).create(user=user, description='Refund', amount=Decimal('-4.50'), date=date(2024, 5, 1))
+        Transaction.objects.using(self.alias).create(user=user, description='Pending', amount=None, date=date(2024, 5, 1))
+        apps.get_model('receipts', 'Budget').objects.using(self.alias).create(user=user, category=category, amount=Decimal('500.00'), month=5, year=2024)
+        apps.get_model('receipts', 'MonthlyIncome').objects.using(self.alias).create(user=user, amount=Decimal('1000.10'), month=5, year=2024)
+
+        apps = self.migrate('0014_amount_minor_units')
+        # Written by the old code between the two migrations
+        apps.get_model('receipts', 'Expense').objects.using(self.alias).create(
+            user_id=user.pk, date=date(2024, 5, 2), merchant='Late', amount=Decimal('0.07'), currency='NPR')
+
+        self.migrate('0015_money_fields')
+        with connections[self.alias].cursor() as cursor:
+            def amounts(table):
+                cursor.execute(f'SELECT amount FROM {table} ORDER BY id')
+                return [row[0] for row in cursor.fetchall()]
+            self.assertEqual(amounts('receipts_expense'), [1235, 7])
+            self.assertEqual(amounts('receipts_transaction'), [-450, None])
+            self.assertEqual(amounts('receipts_budget'), [50000])
+            self.assertEqual(amounts('receipts_monthlyincome'), [100010])
+
+
+class AdminPerformanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin-perf', 'admin-perf@example.com', 'pw')
+        today = date.today()
+        self.expenses = [
+            Expense.objects.create(user=self.user, date=today, merchant='Shop', amount=Decimal('10.00'), currency='USD')
+            for _ in range(5)
+        ]
+
+    @override_settings(ADMIN_PERFORMANCE={'ESTIMATED_COUNT_THRESHOLD': 0})
+    def test_count_is_exact_without_an_estimate(self):
+        Expense.objects.filter(pk__in=[expense.pk for expense in self.expenses[1:4]]).delete()
+        if connection.vendor != 'postgresql':
+            self.assertIsNone(estimated_row_count(Expense))
+        self.assertEqual(EstimatedCountPaginator(Expense.objects.all(), 10).count, 2)
+
+    def test_summary_follows_exchange_rates(self):
+        self.assertEqual(summary_totals()['total_expenses'], Decimal('50.00'))
+        with self.assertNumQueries(0):
+            summary_totals()
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('2'))
+        self.assertEqual(summary_totals()['total_expenses'], Decimal('100.00'))
+
+    def test_summary_follows_user_writes(self):
+        self.assertEqual(summary_totals()['total_expenses'], Decimal('50.00'))
+        self.expenses[0].delete()
+        Budget.objects.create(user=self.user, category=Category.objects.create(name='Food'), amount=Decimal('30'), currency='NPR',
+                              month=date.today().month, year=date.today().year)
+        totals = summary_totals()
+        self.assertEqual((totals['total_expenses'], totals['total_budgeted']), (Decimal('40.00'), Decimal('30.00')))
+
+    def test_autocomplete_filters(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        food = Category.objects.create(name='Food')
+        Expense.objects.filter(pk=self.expenses[0].pk).update(category=food)
+        self.client.force_login(admin_user)
+        url = reverse('admin:receipts_expense_changelist')
+
+        response = self.client.get(url, {'category__id__exact': food.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([expense.pk for expense in response.context['cl'].result_list], [self.expenses[0].pk])
+        # The selected category is the only option rendered; the rest are searched
+        self.assertContains(response, 'data-field-name="category"')
+        self.assertContains(response, f'<option value="{food.pk}" selected>Food</option>', html=True)
+        self.assertContains(response, 'select2.full')
+        for name in ['budget', 'category']:
+            response = self.client.get(reverse(f'admin:receipts_{name}_changelist'), {'user__id__exact': self.user.pk})
+            self.assertContains(response, 'data-field-name="user"')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'receipts', 'model_name': 'expense', 'field_name': 'user', 'term': 'admin-p',
+        })
+        self.assertEqual([row['text'] for row in response.json()['results']], ['admin-perf'])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.snapshot()['rejected_calls'], 1)
+
+    def test_is_open_only_reads(self):
+        self.fail(3)
+        for _ in range(5):
+            self.assertTrue(self.breaker.is_open())
+        self.assertEqual(self.breaker.snapshot()['rejected_calls'], 0)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(3)
+        self.clock.now += 59
+        self.assertFalse(self.breaker.allow_request())
+        self.clock.now += 1
+        self.assertFalse(self.breaker.is_open())
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertTrue(self.breaker.is_open())
+        self.assertFalse(self.breaker.allow_request())
+
+        # A failed trial opens the circuit for another reset_timeout
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.snapshot()['retry_in_seconds'], 60)
+        self.clock.now += 60
+
+        # A successful one closes it
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.snapshot()['rejected_calls'], 2)
+
+
+@override_settings(LLM_SETTINGS={'OPENAI_API_KEY': 'test-key'})
+class ServiceAvailabilityTests(SimpleTestCase):
+    def setUp(self):
+        self.saved_breaker = openai_service._breaker
+        self.breaker = openai_service._breaker = CircuitBreaker(failure_threshold=1, clock=FakeClock())
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+
+    def tearDown(self):
+        openai_service._breaker = self.saved_breaker
+
+    def test_status_reads_do_not_count_as_rejections(self):
+        service = OpenAIAIService()
+        self.assertFalse(service.openai_available)
+        self.assertFalse(service.get_service_status()['available'])
+        self.assertFalse(OpenAIAIService().get_service_status()['available'])
+        self.assertEqual(self.breaker.snapshot()['rejected_calls'], 0)
+
+    def test_each_refused_call_counts_once(self):
+        service = OpenAIAIService()
+        with self.assertRaises(LLMUnavailable):
+            service.ensure_available()
+        with self.assertRaises(LLMUnavailable):
+            service.answer('how am I doing?', {})
+        self.assertEqual(self.breaker.snapshot()['rejected_calls'], 2)
+        self.assertEqual(service.generate_response('hello', {}), service._generate_fallback_response('hello', {}))
+
+
+class ChatAnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.answers = ChatAnswerCache(max_entries=2)
+
+    def test_unanswered_question_is_a_miss(self):
+        self.assertIsNone(self.answers.lookup(1, 'What did I spend most on?', 'v1'))
+        self.assertIsNone(self.answers.revalidate(1, 'What did I spend most on?', 'v1', 'd1'))
+        self.answers.store(1, 'What did I spend most on?', 'v1', 'd1', 'Food')
+        self.assertEqual(self.answers.lookup(1, 'what did i spend MOST on', 'v1'), 'Food')
+        stats = self.answers.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 50.0))
+
+    def test_version_change_revalidates(self):
+        self.answers.store(1, 'my savings', 'v1', 'd1', 'Plenty')
+        self.assertIsNone(self.answers.lookup(1, 'my savings', 'v2'))
+        self.assertEqual(self.answers.revalidate(1, 'my savings', 'v2', 'd1'), 'Plenty')
+        # Stored under the new version from now on
+        self.assertEqual(self.answers.lookup(1, 'my savings', 'v2'), 'Plenty')
+        stats = self.answers.stats()
+        self.assertEqual((stats['hits'], stats['revalidated_hits'], stats['misses']), (1, 1, 0))
+
+    def test_digest_change_is_a_miss(self):
+        self.answers.store(1, 'my savings', 'v1', 'd1', 'Plenty')
+        self.assertIsNone(self.answers.lookup(1, 'my savings', 'v2'))
+        self.assertIsNone(self.answers.revalidate(1, 'my savings', 'v2', 'd2'))
+        self.assertEqual(self.answers.stats()['misses'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.answers.store(1, 'first', 'v1', 'd1', 'One')
+        self.answers.store(1, 'second', 'v1', 'd1', 'Two')
+        self.assertEqual(self.answers.lookup(1, 'first', 'v1'), 'One')
+        self.answers.store(1, 'third', 'v1', 'd1', 'Three')
+        self.assertIsNone(self.answers.lookup(1, 'second', 'v1'))
+        self.assertEqual(self.answers.lookup(1, 'first', 'v1'), 'One')
+        self.assertEqual(self.answers.lookup(1, 'third', 'v1'), 'Three')
+        self.assertEqual(self.answers.stats()['evictions'], 1)
+        # Per user
+        self.assertIsNone(self.answers.lookup(2, 'first', 'v1'))
+
+
+class IntentClassificationTests(SimpleTestCase):
+    CASES = [
+        ('What did I spend most on?', Intent('top_category')),
+        ('top spending category', Intent('top_category')),
+        ('which category has the lowest spending', Intent('lowest_category')),
+        ("what's my income this month?", Intent('income')),
+        ('how much have I earned', Intent('income')),
+        ('How much have I saved?', Intent('savings')),
+        ('what is my savings rate', Intent('savings')),
+        ('how much did I spend on groceries', Intent('category_total', 'groceries')),
+        ('how much have I spent this month', Intent('total_spending')),
+        # Not the figures the router answers
+        ('what is my income tax', None),
+        ('savings account interest', None),
+        ('which vendor did I spend most at', None),
+        ('which merchant has the lowest spending', None),
+        ('what is my highest expense', None),
+        ('what was my biggest purchase', None),
+        ('largest transaction this month', None),
+        # Left to the model
+        ('why is my spending so high', None),
+        ('how can I spend less on food', None),
+        # Other periods and the future; the figures are this month's so far
+        ('how much did i spend in march', None),
+        ('how much did I spend on food in january', None),
+        ('how much did I spend on 2nd october', None),
+        ('how much did I spend on food on 2024-10-02', None),
+        ('how much will I spend this month', None),
+        ('how much will i spend by the end of the month', None),
+        ('how much am I going to spend on food', None),
+        ('how much did I spend last week', None),
+        ('how much did I spend on food next month', None),
+        ('how much did I spend on food in this month', Intent('category_total', 'food')),
+    ]
+
+    def test_classify(self):
+        for message, intent in self.CASES:
+            with self.subTest(message=message):
+                self.assertEqual(classify(message), intent)
+
+
+@override_settings(LLM_SETTINGS={'OPENAI_API_KEY': ''})
+class ChatContextTests(TestCase):
+    """Questions the intent router declines go to the rule-based answer here, the model being off"""
+
+    def setUp(self):
+        get_chat_cache().clear()
+        self.user = User.objects.create_user('chatter', 'chatter@example.com', 'pw')
+        food = Category.objects.create(name='Food')
+        Expense.objects.create(user=self.user, date=date.today(), merchant='Cafe', amount=Decimal('10.00'), currency='NPR', category=food)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def month_figures_calls(self, url_name, message):
+        with mock.patch.object(ChatView, 'month_figures', autospec=True, side_effect=ChatView.month_figures) as month_figures:
+            response = self.client.post(reverse(url_name), {'message': message}, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return month_figures.call_count
+
+    def test_declined_intent_reuses_month_figures(self):
+        # A category_total the user has no category for
+        self.assertEqual(self.month_figures_calls('chat', 'how much did I spend on unicorns'), 1)
+        self.assertEqual(self.month_figures_calls('chat-stream', 'how much did I spend on unicorns'), 1)
+
+    def test_transaction_details_name_the_vendor(self):
+        vendor = Merchant.objects.create(name='Bhat Bhateni', normalized_name='bhat bhateni')
+        Transaction.objects.create(user=self.user, description='Groceries', amount=Decimal('450'), date=date.today(), vendor=vendor)
+        Transaction.objects.create(user=self.user, description='Cash', amount=Decimal('5'), date=date.today() - timedelta(days=1))
+        context = ChatView().build_financial_context(self.user)
+        with self.assertNumQueries(1):
+            details = context['transaction_details']
+        self.assertEqual([row['vendor'] for row in details], ['Bhat Bhateni', 'Unknown'])
+
+    def test_budget_analysis_in_the_base_currency(self):
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('2'))
+        today = date.today()
+        for name in ['Food', 'Rent']:
+            category, _ = Category.objects.get_or_create(name=name)
+            Budget.objects.create(user=self.user, category=category, amount=Decimal('10'), currency='USD', month=today.month, year=today.year)
+        spending = [{'category': 'Food', 'amount': Decimal('10.00')}]
+        ChatView().get_budget_analysis(self.user, spending, 0)  # Loads the rates
+        with self.assertNumQueries(2):
+            analysis = ChatView().get_budget_analysis(self.user, spending, 0)
+        food = next(row for row in analysis['budget_status'] if row['category'] == 'Food')
+        self.assertEqual((food['budget_limit'], food['percentage_used']), (Decimal('20.00'), 50))
+
+
+@override_settings(LLM_SETTINGS={'OPENAI_API_KEY': ''})
+class AsyncChatViewTests(TestCase):
+    def setUp(self):
+        get_chat_cache().clear()
+        self.user = User.objects.create_user('async-chatter', 'async-chatter@example.com', 'pw')
+        Expense.objects.create(user=self.user, date=date.today(), merchant='Cafe', amount=Decimal('10.00'), currency='NPR')
+        self.client = AsyncClient()
+        # Per request: AsyncClient(headers=...) doesn't reach the ASGI scope
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.url = reverse('chat-async')
+
+    async def ask(self, message, headers=None):
+        return await self.client.post(self.url, {'message': message}, content_type='application/json',
+                                      headers=self.headers if headers is None else headers)
+
+    async def test_requires_authentication(self):
+        response = await self.ask('how much have I spent this month', headers={})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_only_post(self):
+        self.assertEqual((await self.client.get(self.url, headers=self.headers)).status_code, 405)
+
+    async def test_intent_is_answered_without_the_model(self):
+        response = await self.ask('how much have I spent this month')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], "You've spent NPR 10.00 this month.")
+
+    async def test_falls_back_to_the_rule_based_answer(self):
+        with self.assertLogs(level='WARNING') as logs:
+            response = await self.ask('what should I do with my money')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['message'])
+        self.assertNotIn('cached', response.json())
+        self.assertTrue(any('OpenAI AI service error' in line for line in logs.output))
+
+    async def test_stream_is_async_under_asgi(self):
+        response = await self.client.post(reverse('chat-stream'), {'message': 'how much have I spent this month'},
+                                          content_type='application/json', headers=self.headers)
+        # A synchronous body would be read whole before the first event is sent
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(re.findall(r'^event: (\w+)$', body, re.M), ['message', 'done'])
+        self.assertIn("You've spent NPR 10.00 this month.", body)
+
+    async def test_export_is_async_under_asgi(self):
+        response = await self.client.get(reverse('export-user-data'), {'export_format': 'ndjson'}, headers=self.headers)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('"Cafe"', body)
+
+    def test_wsgi_request_closes_its_transport(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(AsyncLLMTransport, 'aclose', autospec=True) as aclose, self.assertLogs(level='WARNING'):
+            response = client.post(self.url, {'message': 'what should I do with my money'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['message'])
+        # The request's event loop is gone; so is its client
+        self.assertEqual(aclose.call_count, 1)
+
+
+class LedgerTests(TestCase):
+    """The ledger view against per-model sums, for single-currency data"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ledger', 'ledger@example.com', 'pw')
+        self.other = User.objects.create_user('neighbour', 'neighbour@example.com', 'pw')
+        food = Category.objects.create(name='Food')
+        rent = Category.objects.create(name='Rent')
+        self.today = date.today()
+        earlier = self.today.replace(day=1) - timedelta(days=40)
+        for user, scale in [(self.user, 1), (self.other, 100)]:
+            for day, amount, category in [(self.today, '12.34', food), (self.today, '500.00', rent), (earlier, '7.01', food), (self.today, '0.99', None)]:
+                Expense.objects.create(user=user, date=day, merchant='Shop', amount=Decimal(amount) * scale, currency='NPR', category=category)
+            for day, amount, category in [(self.today, '3.50', 'Food'), (earlier, '20.00', 'Travel'), (self.today, None, 'Food')]:
+                Transaction.objects.create(user=user, description='Receipt', amount=Decimal(amount) * scale if amount else None,
+                                           category=category, date=day)
+            MonthlyIncome.objects.create(user=user, amount=Decimal('1000.00') * scale, month=self.today.month, year=self.today.year)
+
+    def test_ledger_matches_per_model_sums(self):
+        command = BenchmarkLedgerCommand()
+        now = timezone.now()
+        months = last_n_months(now, 12)
+        for name in ['month_total', 'month_categories', 'history']:
+            with self.subTest(name):
+                legacy = getattr(command, f'legacy_{name}')(self.user, now, months)
+                self.assertEqual(getattr(command, f'ledger_{name}')(self.user, now, months), legacy)
+        self.assertEqual(command.ledger_month_total(self.user, now, months), Decimal('516.83'))
+
+    def test_budget_summary_is_per_user(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get(reverse('budget-summary')).data
+        self.assertEqual((data['monthly_income'], data['total_expenses']), (Decimal('1000.00'), Decimal('516.83')))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', 'exporter@example.com', 'pw')
+        other = User.objects.create_user('bystander', 'bystander@example.com', 'pw')
+        food = Category.objects.create(name='Food')
+        Expense.objects.create(user=self.user, date=date(2024, 5, 1), merchant='Cafe', amount=Decimal('12.34'), currency='NPR', category=food)
+        Transaction.objects.create(user=self.user, description='Voided', amount=Decimal('0'), date=date(2024, 5, 2))
+        Transaction.objects.create(user=self.user, description='Pending', amount=None, date=date(2024, 5, 3))
+        Expense.objects.create(user=other, date=date(2024, 5, 1), merchant='Elsewhere', amount=Decimal('99.00'), currency='NPR')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export-user-data'), params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        return gzip.decompress(content) if params.get('compress') == 'gzip' else content
+
+    def test_json(self):
+        document = json.loads(self.export())
+        self.assertEqual(document['user_info']['username'], 'exporter')
+        self.assertEqual([(row['merchant'], row['amount'], row['category']) for row in document['expenses']], [('Cafe', 12.34, 'Food')])
+        self.assertEqual([row['amount'] for row in document['transactions']], [0.0, None])
+
+    def test_ndjson_matches_json(self):
+        records = [json.loads(line) for line in self.export(export_format='ndjson').decode().splitlines()]
+        self.assertEqual([record['record_type'] for record in records], ['user_info', 'expense', 'transaction', 'transaction'])
+        self.assertEqual(records[2]['amount'], 0.0)
+
+    def test_csv(self):
+        rows = list(csv.reader(StringIO(self.export(export_format='csv', table='transactions', compress='gzip').decode())))
+        self.assertEqual(rows[0], ['description', 'amount', 'category', 'date', 'created_at'])
+        self.assertEqual([row[:2] for row in rows[1:]], [['Voided', '0.0'], ['Pending', '']])
+
+
+@skipUnless(columnar_export.is_available(), 'pyarrow not installed')
+class ColumnarExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', 'analyst@example.com', 'pw')
+        other = User.objects.create_user('someone', 'someone@example.com', 'pw')
+        Expense.objects.create(user=self.user, date=date(2024, 4, 30), merchant='Cafe', amount=Decimal('12.34'), currency='NPR')
+        Expense.objects.create(user=self.user, date=date(2024, 5, 1), merchant='Rent', amount=Decimal('123456789012.99'), currency='NPR')
+        Expense.objects.create(user=other, date=date(2024, 5, 1), merchant='Elsewhere', amount=Decimal('1.00'), currency='NPR')
+        Transaction.objects.create(user=self.user, description='Refund', amount=Decimal('-0.05'), date=date(2024, 5, 2))
+        Transaction.objects.create(user=self.user, description='Pending', amount=None, date=None)
+
+    def read_back(self, table):
+        import pyarrow.parquet as pq
+        sink = BytesIO()
+        columnar_export.write_table(table, sink, user=self.user)
+        sink.seek(0)
+        return pq.ParquetFile(sink)
+
+    def test_parquet_round_trip(self):
+        expenses = self.read_back('expenses')
+        self.assertEqual(expenses.read().column('amount').to_pylist(), [Decimal('12.34'), Decimal('123456789012.99')])
+        # One row group per month
+        self.assertEqual(expenses.metadata.num_row_groups, 2)
+
+        transactions = self.read_back('transactions').read()
+        self.assertEqual(transactions.column('amount').to_pylist(), [Decimal('-0.05'), None])
+        self.assertEqual(transactions.column('description').to_pylist(), ['Refund', 'Pending'])
+
+
+@override_settings(BACKGROUND_JOBS={'RUN_INLINE': True, 'DELETE_CHUNK_SIZE': 2})
+class DeletionJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = User.objects.create_user('leaving', 'leaving@example.com', 'pw')
+        self.other = User.objects.create_user('staying', 'staying@example.com', 'pw')
+        today = date.today()
+        for user in [self.user, self.other]:
+            category = Category.objects.create(name=f'Own {user.username}', user=user)
+            for amount in ['1.00', '2.00', '3.00']:
+                Expense.objects.create(user=user, date=today, merchant='Shop', amount=Decimal(amount), currency='NPR', category=category)
+                Transaction.objects.create(user=user, description='Receipt', amount=Decimal(amount), date=today)
+            Budget.objects.create(user=user, category=category, amount=Decimal('100'), month=today.month, year=today.year)
+            MonthlyIncome.objects.create(user=user, amount=Decimal('500'), month=today.month, year=today.year)
+            get_forecast(user)
+
+        receipt = Transaction.objects.filter(user=self.user).first()
+        receipt.file.save('receipt.txt', ContentFile(b'scan'))
+        self.stored_file = receipt.file.name
+        # One whose file is already gone from storage
+        missing = Transaction.objects.filter(user=self.user).exclude(pk=receipt.pk).first()
+        Transaction.objects.filter(pk=missing.pk).update(file='receipts/missing.txt')
+
+    def owned(self, user):
+        return [model.objects.filter(user=user).count() for model in [Expense, Transaction, Budget, MonthlyIncome, Category, SpendingForecast]]
+
+    def test_deletes_only_the_users_rows(self):
+        other_before = self.owned(self.other)
+        versions = get_data_version(self.user.pk), get_data_version(self.other.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            job, created = jobs.start_deletion_job(self.user)
+        job.refresh_from_db()
+
+        self.assertTrue(created)
+        self.assertEqual(job.status, DataDeletionJob.STATUS_COMPLETED)
+        self.assertEqual(self.owned(self.user), [0] * 6)
+        self.assertEqual(self.owned(self.other), other_before)
+        self.assertEqual((job.total_rows, job.deleted_rows), (9, 9))
+        self.assertEqual(job.deleted_data, {'expenses': 3, 'transactions': 3, 'budgets': 1, 'monthly_incomes': 1, 'custom_categories': 1})
+        self.assertEqual(job.files_removed, 1)
+        self.assertFalse(default_storage.exists(self.stored_file))
+
+        self.assertNotEqual(get_data_version(self.user.pk), versions[0])
+        self.assertEqual(get_data_version(self.other.pk), versions[1])
+
+    def test_failure_is_reported(self):
+        version = get_data_version(self.user.pk)
+        with mock.patch.object(jobs, '_delete_in_chunks', side_effect=RuntimeError('disk on fire')), self.assertLogs('receipts.jobs', 'ERROR'):
+            job = jobs.run_deletion_job(DataDeletionJob.objects.create(user=self.user).pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (DataDeletionJob.STATUS_FAILED, 'disk on fire'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+        self.assertFalse(SpendingForecast.objects.filter(user=self.user).exists())
+
+
+class SearchTests(TestCase):
+    """On whichever backend is configured"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', 'searcher@example.com', 'pw')
+        self.other = User.objects.create_user('snoop', 'snoop@example.com', 'pw')
+        today = date.today()
+        self.expense = Expense.objects.create(user=self.user, date=today, merchant='Himalayan Java', amount=Decimal('4.50'),
+                                              currency='NPR', description='flat white')
+        Expense.objects.create(user=self.other, date=today, merchant='Himalayan Java', amount=Decimal('9.00'), currency='NPR')
+        self.receipt = Transaction.objects.create(user=self.user, description='BHAT BHATENI SUPERSTORE groceries', amount=Decimal('450'), date=today)
+        Transaction.objects.create(user=self.other, description='Bhat Bhateni groceries', amount=Decimal('99'), date=today)
+
+    def found(self, text, user=None, sources=None):
+        return [(hit['source'], hit['id']) for hit in full_text_search.search(user or self.user, text, sources)]
+
+    def test_only_own_rows_match(self):
+        self.assertEqual(self.found('himalayan java'), [('expense', self.expense.pk)])
+        self.assertEqual(self.found('hima'), [('expense', self.expense.pk)])
+        self.assertEqual(self.found('groceries'), [('transaction', self.receipt.pk)])
+        self.assertEqual(self.found('white'), [('expense', self.expense.pk)])
+        self.assertEqual(self.found('white', self.other), [])
+        self.assertEqual(self.found('groceries', sources=['expense']), [])
+
+    def test_updates_and_deletes_are_reflected(self):
+        self.expense.merchant = 'Roadhouse Cafe'
+        self.expense.save()
+        self.assertEqual(self.found('himalayan'), [])
+        self.assertEqual(self.found('roadhouse'), [('expense', self.expense.pk)])
+
+        self.receipt.description = 'Salesberry'
+        self.receipt.save()
+        self.assertEqual(self.found('groceries'), [])
+        self.assertEqual(self.found('salesberry'), [('transaction', self.receipt.pk)])
+
+        self.expense.delete()
+        self.receipt.delete()
+        self.assertEqual(self.found('roadhouse'), [])
+        self.assertEqual(self.found('salesberry'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite triggers')
+    def test_triggers_are_restored_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER receipts_expense_search_ai')
+        full_text_search.restore_search_triggers(using=DEFAULT_DB_ALIAS)
+        expense = Expense.objects.create(user=self.user, date=date.today(), merchant='Trisara', amount=Decimal('1'), currency='NPR')
+        self.assertEqual(self.found('trisara'), [('expense', expense.pk)])
+
+
+class AnalyticsTests(TestCase):
+    def test_analyze(self):
+        today = date(2024, 6, 15)
+        index = month_index(today, 7)
+        # Dec (before any spending) .. Jun (current month, half over)
+        matrix = pd.DataFrame({
+            'Food': [0, 100, 100, 100, 100, 100, 50],
+            'Rent': [0, 200, 200, 200, 260, 260, 0],
+        }, index=index, dtype=float)
+        result = analyze(matrix, today)
+
+        self.assertEqual(result['months'][0], '2023-12')
+        self.assertEqual(result['monthly_totals'], [0, 300, 300, 300, 360, 360, 50])
+        # Half the month left at the pace of Mar-May
+        self.assertEqual(result['projection'], {
+            'spent_to_date': 50, 'projected_total': 220, 'baseline': 340,
+            'days_elapsed': 15, 'days_in_month': 30, 'categories': {'Food': 100, 'Rent': 120},
+        })
+        # Mar-May against Jan-Feb; December is before the first spending
+        self.assertEqual((result['trend']['trend'], result['trend']['change_percentage']), ('increasing', 13.33))
+        self.assertEqual(result['trend']['slope_per_month'], 18)
+        self.assertEqual([(row['category'], row['slope_per_month']) for row in result['category_trends']], [('Rent', 18), ('Food', 0)])
+        # Rent projected at 120 against a 224 average
+        self.assertEqual([(anomaly['month'], anomaly['category'], anomaly['projected']) for anomaly in result['anomalies']],
+                         [('2024-06', 'Rent', True)])
+        self.assertIsNone(result['seasonality'])
+
+    def test_recomputed_after_a_write(self):
+        user = User.objects.create_user('analysed', 'analysed@example.com', 'pw')
+        Expense.objects.create(user=user, date=date.today(), merchant='Shop', amount=Decimal('10.00'), currency='NPR')
+        insight = get_user_insights(user)
+        self.assertEqual(insight.data['projection']['spent_to_date'], 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_insights(user).computed_at, insight.computed_at)
+
+        Expense.objects.create(user=user, date=date.today(), merchant='Shop', amount=Decimal('5.25'), currency='NPR')
+        self.assertEqual(get_user_insights(user).data['projection']['spent_to_date'], 15.25)
+
+
+@override_settings(ACTIVITY_FEED={'HEAD_SIZE': 3, 'CACHE_TIMEOUT': 600})
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('active', 'active@example.com', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_continue_across_sources_on_the_same_date(self):
+        day = date(2024, 5, 10)
+        expenses = [Expense.objects.create(user=self.user, date=day, merchant=f'Shop {n}', amount=Decimal('1'), currency='NPR')
+                    for n in range(3)]
+        transactions = [Transaction.objects.create(user=self.user, description=f'Receipt {n}', amount=Decimal('2'), date=day)
+                        for n in range(3)]
+        older = Expense.objects.create(user=self.user, date=day - timedelta(days=1), merchant='Older', amount=Decimal('1'), currency='NPR')
+
+        seen = []
+        url = reverse('activity-feed') + '?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            seen += [(entry['type'], entry['id']) for entry in body['results']]
+            url = body['next']
+
+        # Expenses before transactions on a date, each newest first; pages
+        # past the cached head are read from the database
+        self.assertEqual(seen, [('expense', expense.pk) for expense in reversed(expenses)]
+                         + [('transaction', transaction.pk) for transaction in reversed(transactions)]
+                         + [('expense', older.pk)])
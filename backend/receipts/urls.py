@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import UploadReceiptView, TransactionListView, CategoryTotalsView, BudgetListView, MonthlyIncomeView, BudgetSummaryView, BudgetCategoriesView, DashboardSummaryView, DashboardTrendsView, ChatView, LoginView, RegisterView, ExpenseListView, ExpenseStatsView, CategoryListView, PaymentMethodListView, LogoutView, UserProfileView, TokenRefreshView, ExpenseExtractionView, BulkExpenseExtractionView, ChangePasswordView, DeleteUserDataView, ExportUserDataView, PrivacySettingsView
+from .views import UploadReceiptView, TransactionListView, CategoryTotalsView, BudgetListView, MonthlyIncomeView, BudgetSummaryView, BudgetCategoriesView, DashboardSummaryView, DashboardTrendsView, ActivityFeedView, ChatView, ChatStreamView, AsyncChatView, LoginView, RegisterView, ExpenseListView, ExpenseStatsView, CategoryListView, PaymentMethodListView, LogoutView, UserProfileView, TokenRefreshView, ExpenseExtractionView, BulkExpenseExtractionView, ChangePasswordView, DeleteUserDataView, DataDeletionJobView, ExportUserDataView, PrivacySettingsView, CacheStatsView, SearchView, MerchantAutocompleteView, SpendingInsightsView, SpendingForecastView
 
 urlpatterns = [
     path('', UploadReceiptView.as_view(), name='upload-receipt'),
@@ -11,7 +11,10 @@ urlpatterns = [
     path('budget-categories/', BudgetCategoriesView.as_view(), name='budget-categories'),
     path('dashboard-summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
     path('dashboard-trends/', DashboardTrendsView.as_view(), name='dashboard-trends'),
+    path('activity/', ActivityFeedView.as_view(), name='activity-feed'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('chat/stream/', ChatStreamView.as_view(), name='chat-stream'),
+    path('chat/async/', AsyncChatView.as_view(), name='chat-async'),
     path('login/', LoginView.as_view(), name='login'),
     path('register/', RegisterView.as_view(), name='register'),
     path('logout/', LogoutView.as_view(), name='logout'),
@@ -22,6 +25,11 @@ urlpatterns = [
     path('expense-stats/', ExpenseStatsView.as_view(), name='expense-stats'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
     path('payment-methods/', PaymentMethodListView.as_view(), name='payment-method-list'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('insights/', SpendingInsightsView.as_view(), name='spending-insights'),
+    path('forecast/', SpendingForecastView.as_view(), name='spending-forecast'),
+    path('merchants/autocomplete/', MerchantAutocompleteView.as_view(), name='merchant-autocomplete'),
     
     # Expense Extraction endpoints
     path('extract-expense/', ExpenseExtractionView.as_view(), name='extract-expense'),
@@ -31,4 +39,5 @@ urlpatterns = [
     path('privacy/settings/', PrivacySettingsView.as_view(), name='privacy-settings'),
     path('privacy/export-data/', ExportUserDataView.as_view(), name='export-user-data'),
     path('privacy/delete-data/', DeleteUserDataView.as_view(), name='delete-user-data'),
+    path('privacy/delete-data/<int:job_id>/', DataDeletionJobView.as_view(), name='delete-user-data-status'),
 ]
\ No newline at end of file
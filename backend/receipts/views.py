@@ -1,7 +1,10 @@
 from django.shortcuts import render
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from rest_framework import status, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
 import tempfile
 import os
@@ -10,8 +13,9 @@ import pytesseract
 import pandas as pd
 import traceback
 from rest_framework import generics
-from .models import Budget, Category, Expense, PaymentMethod, Transaction, MonthlyIncome
+from .models import Budget, Category, DataDeletionJob, Expense, PaymentMethod, Transaction, MonthlyIncome, LedgerEntry
 from .serializers import BudgetSerializer, CategorySerializer, ExpenseSerializer, PaymentMethodSerializer, TransactionSerializer, MonthlyIncomeSerializer
+from .serializers import DataDeletionJobSerializer, ExpenseValuesSerializer, TransactionValuesSerializer
 from django.db.models import Sum
 from datetime import date
 from .models import MonthlyIncome
@@ -27,11 +31,35 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters import rest_framework as filters
 from .expense_extractor import ExpenseExtractor
+from .pagination import BudgetKeysetPagination, DateKeysetPagination
+from .exporters import CONTENT_TYPES as EXPORT_CONTENT_TYPES, EXPORT_FORMATS, TABLES as EXPORT_TABLES, export_stream
+from . import columnar_export
+from .jobs import start_deletion_job
+from .merchants import resolve_merchant, vendor_totals
+from . import search as full_text_search
+from .autocomplete import suggest_merchants
+from .analytics import get_user_insights
+from .forecast import get_forecast
+from .activity import decode_cursor, encode_cursor, entry_key, get_activity
+from .currency import amount_in, base_currency, convert, sum_in, with_reporting_currency
+from .cache import cache_user_response, data_version_token, etag_user_response, get_cache_stats
+from .chat_cache import context_digest, get_chat_cache
+from .chat_context import LazyFinancialContext
+from .intents import answer as answer_intent, classify as classify_intent, intent_stats
+from .llm_transport import aclose_async_transport
+from .periods import date_range_filter, month_range, months_back_range, year_range
 import tempfile
 import os
 from datetime import datetime
+import asyncio
+import functools
+import json
 import logging
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+logger = logging.getLogger(__name__)
 
 try:
     import easyocr
@@ -46,6 +74,39 @@ except ImportError:
 
 # Create your views here.
 
+def last_n_months(now, n):
+    """(year, month) pairs for the current month and the n - 1 before it, newest first"""
+    months = []
+    for i in range(n):
+        month = now.month - i
+        year = now.year
+        if month <= 0:
+            month += 12
+            year -= 1
+        months.append((year, month))
+    return months
+
+def monthly_income_totals(user, months, currency=None):
+    """Income per (year, month) for the given months in a single query, in ``currency``"""
+    period_filter = models.Q()
+    for year, month in months:
+        period_filter |= models.Q(year=year, month=month)
+    rows = MonthlyIncome.objects.filter(period_filter, user=user)\
+                                .values('year', 'month')\
+                                .annotate(total=sum_in(currency, joined=False))
+    return {(row['year'], row['month']): row['total'] for row in rows}
+
+# CSV columns a transaction's merchant may be read from, in order
+CSV_MERCHANT_COLUMNS = ('merchant', 'vendor', 'payee')
+
+def csv_merchant(row):
+    """The merchant named in a CSV row, or None (empty cells are NaN floats)"""
+    for column in CSV_MERCHANT_COLUMNS:
+        value = row.get(column)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
 class UploadReceiptView(APIView):
     parser_classes = (MultiPartParser, FormParser)
 
@@ -114,7 +175,8 @@ class UploadReceiptView(APIView):
                         description=str(row),
                         amount=row.get('amount'),
                         category=row.get('category', ''),
-                        date=row.get('date', date.today())
+                        date=row.get('date', date.today()),
+                        vendor=resolve_merchant(csv_merchant(row))
                     )
                 return Response({'type': 'csv', 'message': f'Processed {len(data)} transactions from CSV'})
 
@@ -127,18 +189,42 @@ class UploadReceiptView(APIView):
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
 
-class TransactionListView(generics.ListAPIView):
+class ValuesListMixin:
+    """
+    List endpoint that serializes ``values()`` rows with a ValuesSerializer
+    instead of building a model instance and serializer per row.
+    Supports sparse fieldsets via ``?fields=id,date,amount``.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class.from_query_params(request.query_params)
+        # The paginator reads its ordering columns from each row
+        ordering = [name.lstrip('-') for name in self.paginator.ordering]
+        rows = serializer.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serializer.serialize(page))
+
+class TransactionListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = TransactionSerializer
+    values_serializer_class = TransactionValuesSerializer
+    pagination_class = DateKeysetPagination
+    
+    @etag_user_response('transaction-list')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).order_by('-date')
+        # Ordered newest first by the paginator
+        return Transaction.objects.filter(user=self.request.user)
 
 class CategoryTotalsView(APIView):
-    def get(self, request):
+    @with_reporting_currency
+    def get(self, request, currency):
         categories = Category.objects.all()
         category_totals = []
         for category in categories:
-            total = Expense.objects.filter(category=category).aggregate(total=Sum('amount'))['total'] or 0
+            total = Expense.objects.filter(category=category).aggregate(total=sum_in(currency))['total'] or 0
             category_totals.append({
                 'category': category.name,
                 'total': total,
@@ -147,8 +233,11 @@ class CategoryTotalsView(APIView):
         return Response(category_totals)
 
 class BudgetListView(generics.ListAPIView):
-    queryset = Budget.objects.all()
     serializer_class = BudgetSerializer
+    pagination_class = BudgetKeysetPagination
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user).select_related('category')
 
 class MonthlyIncomeView(generics.ListAPIView):
     serializer_class = MonthlyIncomeSerializer
@@ -157,52 +246,47 @@ class MonthlyIncomeView(generics.ListAPIView):
         return MonthlyIncome.objects.filter(month=timezone.now().month, year=timezone.now().year)
 
 class BudgetSummaryView(APIView):
-    def get(self, request):
+    @with_reporting_currency
+    def get(self, request, currency):
         now = timezone.now()
-        monthly_income = MonthlyIncome.objects.filter(month=now.month, year=now.year).aggregate(total=Sum('amount'))['total'] or 0
-        # Get expenses from both Expense and Transaction models for current month
-        expense_total = Expense.objects.filter(date__year=now.year, date__month=now.month).aggregate(total=Sum('amount'))['total'] or 0
-        transaction_total = Transaction.objects.filter(date__year=now.year, date__month=now.month).aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses = expense_total + transaction_total
+        monthly_income = MonthlyIncome.objects.filter(user=request.user, month=now.month, year=now.year)\
+                                              .aggregate(total=sum_in(currency, joined=False))['total'] or 0
+        # Expenses from both Expense and Transaction models for current month
+        total_expenses = LedgerEntry.objects.for_user(request.user).in_month(now.year, now.month).total(currency)
         savings_rate = ((monthly_income - total_expenses) / monthly_income * 100) if monthly_income > 0 else 0
         
         return Response({
             'monthly_income': monthly_income,
             'total_expenses': total_expenses,
             'savings_rate': round(savings_rate, 2),
-            'currency': 'NPR'
+            'currency': currency
         })
 
 class BudgetCategoriesView(APIView):
-    def get(self, request):
+    @etag_user_response('budget-categories')
+    @cache_user_response('budget-categories')
+    @with_reporting_currency
+    def get(self, request, currency):
         categories = Category.objects.all()
         category_data = []
         now = timezone.now()
         
+        # Spending per category from both Expense and Transaction models for current month
+        spent_by_category = {
+            row['category']: row['total']
+            for row in LedgerEntry.objects.for_user(request.user).in_month(now.year, now.month).category_totals(currency)
+        }
+        
+        # Budget limits from Budget model for the current user, converted alongside
+        budget_by_category = dict(
+            Budget.objects.filter(user=request.user, month=now.month, year=now.year)
+                          .annotate(converted=amount_in(currency))
+                          .values_list('category_id', 'converted')
+        )
+        
         for category in categories:
-            # Get expenses from both Expense and Transaction models for current month
-            expense_amount = Expense.objects.filter(
-                user=request.user,
-                category=category, 
-                date__year=now.year, 
-                date__month=now.month
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            transaction_amount = Transaction.objects.filter(
-                user=request.user,
-                category=category, 
-                date__year=now.year, 
-                date__month=now.month
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            amount_spent = expense_amount + transaction_amount
-            
-            # Get budget limit from Budget model for the current user
-            budget_obj = Budget.objects.filter(
-                user=request.user,
-                category=category,
-                month=now.month,
-                year=now.year
-            ).first()
-            budget_limit = budget_obj.amount if budget_obj else 0
+            amount_spent = spent_by_category.get(category.name) or 0
+            budget_limit = budget_by_category.get(category.id, 0)
             
             percentage_used = (amount_spent / budget_limit * 100) if budget_limit > 0 else 0
             
@@ -213,71 +297,68 @@ class BudgetCategoriesView(APIView):
                 'amount_spent': amount_spent,
                 'percentage_used': round(percentage_used, 2),
                 'color': getattr(category, 'color', '#3b82f6'),  # Default color if not set
-                'status': 'over' if amount_spent > budget_limit else 'under' if amount_spent < float(budget_limit) * 0.8 else 'normal'
+                # Under 80% of the limit, compared without leaving Decimal
+                'status': 'over' if amount_spent > budget_limit else 'under' if amount_spent * 5 < budget_limit * 4 else 'normal'
             })
         
         return Response(category_data)
 
 class DashboardSummaryView(APIView):
-    def get(self, request):
+    @etag_user_response('dashboard-summary')
+    @cache_user_response('dashboard-summary')
+    @with_reporting_currency
+    def get(self, request, currency):
         now = timezone.now()
         monthly_income = MonthlyIncome.objects.filter(
             user=request.user,
             month=now.month, 
             year=now.year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        # Get expenses from both Expense and Transaction models for current month
-        expense_total = Expense.objects.filter(
-            user=request.user,
-            date__year=now.year, 
-            date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        transaction_total = Transaction.objects.filter(
-            user=request.user,
-            date__year=now.year, 
-            date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses = expense_total + transaction_total
+        ).aggregate(total=sum_in(currency, joined=False))['total'] or 0
+        # Expenses from both Expense and Transaction models for current month
+        total_expenses = LedgerEntry.objects.for_user(request.user).in_month(now.year, now.month).total(currency)
         savings_rate = ((monthly_income - total_expenses) / monthly_income * 100) if monthly_income > 0 else 0
         
-        # Get recent transactions
-        recent_transactions = Transaction.objects.all().order_by('-date')[:5]
+        # The user's latest expenses, transactions and uploads, from the activity feed
+        recent_activity, _ = get_activity(request.user, limit=5)
         transaction_data = []
-        for transaction in recent_transactions:
+        for entry in recent_activity:
             transaction_data.append({
-                'id': transaction.id,
-                'description': transaction.description[:50] + '...' if len(transaction.description) > 50 else transaction.description,
-                'amount': transaction.amount or 0,
-                'date': transaction.date.strftime('%Y-%m-%d') if transaction.date else None,
-                'category': transaction.category or 'Uncategorized'
+                'id': entry['id'],
+                'type': entry['type'],
+                'description': entry['title'],
+                'amount': convert(entry['amount'] or 0, entry['currency'], currency),
+                'date': entry['date'].strftime('%Y-%m-%d'),
+                'category': entry['category'] or 'Uncategorized'
             })
         
         return Response({
             'monthly_income': monthly_income,
             'total_expenses': total_expenses,
             'savings_rate': round(savings_rate, 2),
-            'currency': 'NPR',
+            'currency': currency,
             'recent_transactions': transaction_data
         })
 
 class DashboardTrendsView(APIView):
-    def get(self, request):
+    @etag_user_response('dashboard-trends')
+    @cache_user_response('dashboard-trends')
+    @with_reporting_currency
+    def get(self, request, currency):
         now = timezone.now()
         trends = []
+        months = last_n_months(now, 6)
+        
+        # Income and expenses (both Expense and Transaction models) for the whole window, one query each
+        income_by_month = monthly_income_totals(request.user, months, currency)
+        expense_rows = LedgerEntry.objects.for_user(request.user)\
+                                          .in_period(months_back_range(now.date(), 6))\
+                                          .monthly_totals(currency)
+        expenses_by_month = {(row['period'].year, row['period'].month): row['total'] for row in expense_rows}
         
         # Get last 6 months of data
-        for i in range(6):
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            
-            monthly_income = MonthlyIncome.objects.filter(user=request.user, month=month, year=year).aggregate(total=Sum('amount'))['total'] or 0
-            # Get expenses from both Expense and Transaction models for the month
-            expense_total = Expense.objects.filter(user=request.user, date__year=year, date__month=month).aggregate(total=Sum('amount'))['total'] or 0
-            transaction_total = Transaction.objects.filter(user=request.user, date__year=year, date__month=month).aggregate(total=Sum('amount'))['total'] or 0
-            total_expenses = expense_total + transaction_total
+        for year, month in months:
+            monthly_income = income_by_month.get((year, month), 0)
+            total_expenses = expenses_by_month.get((year, month), 0)
             
             trends.append({
                 'month': f"{year}-{month:02d}",
@@ -288,25 +369,120 @@ class DashboardTrendsView(APIView):
         
         return Response(trends[::-1])  # Reverse to show oldest first
 
-class ChatView(APIView):
-    def post(self, request):
-        user_message = request.data.get('message', '').lower()
-        now = timezone.now()
+class ActivityFeedView(APIView):
+    """
+    The user's expenses, transactions and uploads, newest first. Paged with
+    an opaque ``cursor``; each page reads only about ``page_size`` rows.
+    """
+    
+    @etag_user_response('activity')
+    @with_reporting_currency
+    def get(self, request, currency):
+        config = getattr(settings, 'ACTIVITY_FEED', {})
+        try:
+            page_size = int(request.query_params.get('page_size', config.get('PAGE_SIZE', 20)))
+        except ValueError:
+            page_size = config.get('PAGE_SIZE', 20)
+        page_size = max(1, min(page_size, config.get('MAX_PAGE_SIZE', 100)))
         
-        # Get comprehensive financial data for complete AI knowledge
-        monthly_income = MonthlyIncome.objects.filter(user=request.user, month=now.month, year=now.year).aggregate(total=Sum('amount'))['total'] or 0
+        cursor = request.query_params.get('cursor')
+        try:
+            cursor = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise NotFound('Invalid cursor')
         
-        # Get expenses from both Expense and Transaction models
-        expense_total = Expense.objects.filter(user=request.user, date__year=now.year, date__month=now.month).aggregate(total=Sum('amount'))['total'] or 0
-        transaction_total = Transaction.objects.filter(user=request.user, date__year=now.year, date__month=now.month).aggregate(total=Sum('amount'))['total'] or 0
-        total_expenses = expense_total + transaction_total
+        entries, has_more = get_activity(request.user, cursor, page_size)
+        next_link = None
+        if has_more and entries:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(entry_key(entries[-1])))
         
-        # Calculate savings
-        savings = monthly_income - total_expenses
-        savings_rate = (savings / monthly_income * 100) if monthly_income > 0 else 0
+        return Response({
+            'next': next_link,
+            'page_size': page_size,
+            'currency': currency,
+            'results': [
+                {
+                    'type': entry['type'],
+                    'id': entry['id'],
+                    'date': entry['date'].isoformat(),
+                    'title': entry['title'],
+                    'amount': convert(entry['amount'], entry['currency'], currency),
+                    'category': entry['category'],
+                    'created_at': entry['created_at'],
+                }
+                for entry in entries
+            ]
+        })
+
+class ChatView(APIView):
+    def post(self, request):
+        user_message = request.data.get('message', '').lower()
+        # Nothing is queried until a section is read
+        context = self.build_financial_context(request.user)
+        
+        response = self.canned_reply(user_message)
+        if response is None:
+            # Factual questions are answered from this month's aggregates, without the model
+            response = self.intent_reply(context, user_message)
+        if response is not None:
+            return Response({'message': response, 'timestamp': timezone.now()})
+        
+        # Repeated question and nothing changed since: skip the context and the model
+        answers = get_chat_cache()
+        version = data_version_token(request.user.pk)
+        if answers:
+            response = answers.lookup(request.user.pk, user_message, version)
+            if response is not None:
+                return Response({'message': response, 'timestamp': timezone.now(), 'cached': True})
+        
+        # Use OpenAI AI service for financial questions
+        try:
+            from .openai_service import OpenAIAIService
+            
+            ai_service = OpenAIAIService()
+            # Raises if the cached health check failed or the circuit is open:
+            # straight to the rule-based answer instead of waiting on the API
+            ai_service.ensure_available()
+            
+            # Only the sections the prompt reads are computed
+            digest = context_digest(context.load(ai_service.REQUIRED_SECTIONS), ai_service.model)
+            
+            response = answers.revalidate(request.user.pk, user_message, version, digest) if answers else None
+            if response is None:
+                response = ai_service.answer(user_message, context)
+                if answers:
+                    answers.store(request.user.pk, user_message, version, digest, response)
+            
+        except Exception as e:
+            print(f"OpenAI AI service error: {str(e)}")
+            # Fallback to rule-based response if AI service fails
+            response = self.rule_based_response(user_message, context)
         
-        # Get ALL transactions for complete context
-        all_transactions = Transaction.objects.filter(user=request.user).order_by('-date')[:50]  # Last 50 transactions
+        return Response({'message': response, 'timestamp': timezone.now()})
+    
+    def build_financial_context(self, user, figures=None):
+        """
+        Everything the assistant knows about the user's finances, as a lazy
+        mapping: each section's queries run the first time it is read.
+        ``figures`` are this month's, if ``month_figures`` already ran.
+        """
+        return LazyFinancialContext(user, {
+            ('monthly_income', 'total_expenses', 'category_totals'): lambda context: self.month_figures(context.user),
+            'all_category_totals': self.all_category_totals,
+            'historical_spending': self.historical_spending,
+            'year_category_totals': self.year_category_totals,
+            'top_vendors': self.top_vendors,
+            'avg_category_spending': self.avg_category_spending,
+            'transaction_details': self.transaction_details,
+            # Spending trends and patterns (precomputed, see analytics.py)
+            'spending_trends': lambda context: get_user_insights(context.user).data['trend'],
+            'budget_info': lambda context: self.get_budget_analysis(context.user, context['category_totals'], context['monthly_income']),
+            'forecast': lambda context: get_forecast(context.user)
+        }, figures)
+    
+    def transaction_details(self, context):
+        """The last 50 transactions"""
+        all_transactions = Transaction.objects.filter(user=context.user).select_related('vendor').order_by('-date')[:50]
         transaction_details = []
         for transaction in all_transactions:
             transaction_details.append({
@@ -314,61 +490,18 @@ class ChatView(APIView):
                 'amount': float(transaction.amount) if transaction.amount else 0,
                 'category': transaction.category if transaction.category else 'Uncategorized',
                 'date': transaction.date.strftime('%Y-%m-%d') if transaction.date else '',
-                'vendor': 'Unknown'  # Transaction model doesn't have vendor field
+                'vendor': transaction.vendor.name if transaction.vendor else 'Unknown'
             })
-        
-        # Get category spending data for current month (from both Expense and Transaction models)
-        category_totals = {}
-        all_category_totals_map = {}
-        
-        # Get expenses from Expense model
-        expense_totals = Expense.objects.filter(
-            user=request.user, 
-            date__year=now.year, 
-            date__month=now.month
-        ).values('category__name').annotate(total=Sum('amount'))
-        
-        for expense in expense_totals:
-            if expense['category__name']:
-                cat_name = expense['category__name']
-                category_totals[cat_name] = category_totals.get(cat_name, 0) + expense['total']
-        
-        # Get expenses from Transaction model
-        transaction_totals = Transaction.objects.filter(
-            user=request.user, 
-            date__year=now.year, 
-            date__month=now.month
-        ).values('category').annotate(total=Sum('amount'))
-        
-        for transaction in transaction_totals:
-            if transaction['category']:
-                cat_name = transaction['category']
-                category_totals[cat_name] = category_totals.get(cat_name, 0) + transaction['total']
-        
-        # Convert to list format and sort
-        category_totals = [{'category': k, 'amount': v} for k, v in category_totals.items() if v > 0]
-        category_totals.sort(key=lambda x: x['amount'], reverse=True)
-
-        # Build ALL-TIME category totals (include categories with zero)
-        # Expenses (all-time)
-        all_expense_totals = Expense.objects.filter(
-            user=request.user
-        ).values('category__name').annotate(total=Sum('amount'))
-
-        for expense in all_expense_totals:
-            if expense['category__name']:
-                cat_name = expense['category__name']
-                all_category_totals_map[cat_name] = all_category_totals_map.get(cat_name, 0) + expense['total']
-
-        # Transactions (all-time)
-        all_transaction_totals = Transaction.objects.filter(
-            user=request.user
-        ).values('category').annotate(total=Sum('amount'))
-
-        for transaction in all_transaction_totals:
-            if transaction['category']:
-                cat_name = transaction['category']
-                all_category_totals_map[cat_name] = all_category_totals_map.get(cat_name, 0) + transaction['total']
+        return transaction_details
+    
+    def all_category_totals(self, context):
+        """ALL-TIME category totals, including categories with nothing spent"""
+        # Both Expense and Transaction models via the ledger view
+        all_category_totals_map = {
+            row['category']: row['total'] or 0
+            for row in LedgerEntry.objects.for_user(context.user).category_totals()
+            if row['category']
+        }
 
         # Ensure all defined categories appear, even if zero
         all_categories_qs = Category.objects.all().values_list('name', flat=True)
@@ -380,21 +513,19 @@ class ChatView(APIView):
             for cat_name in all_categories_qs
         ]
         all_category_totals.sort(key=lambda x: x['amount'], reverse=True)
-        
-        # Get historical spending data for the last 12 months (full year)
+        return all_category_totals
+    
+    def historical_spending(self, context):
+        """Income, spending and savings for each of the last 12 months (full year)"""
+        now = timezone.now()
+        months = last_n_months(now, 12)
+        window = LedgerEntry.objects.for_user(context.user).in_period(months_back_range(now.date(), 12))
+        expenses_by_month = {(row['period'].year, row['period'].month): row['total'] for row in window.monthly_totals()}
+        income_by_month = monthly_income_totals(context.user, months)
         historical_spending = []
-        for i in range(12):  # Last 12 months
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            
-            # Get expenses from both models for historical data
-            month_expense_total = Expense.objects.filter(user=request.user, date__year=year, date__month=month).aggregate(total=Sum('amount'))['total'] or 0
-            month_transaction_total = Transaction.objects.filter(user=request.user, date__year=year, date__month=month).aggregate(total=Sum('amount'))['total'] or 0
-            month_expenses = month_expense_total + month_transaction_total
-            month_income = MonthlyIncome.objects.filter(user=request.user, month=month, year=year).aggregate(total=Sum('amount'))['total'] or 0
+        for year, month in months:
+            month_expenses = expenses_by_month.get((year, month), 0)
+            month_income = income_by_month.get((year, month), 0)
             month_savings = month_income - month_expenses
             month_name = timezone.datetime(year, month, 1).strftime('%B')
             historical_spending.append({
@@ -405,197 +536,106 @@ class ChatView(APIView):
                 'savings': month_savings,
                 'savings_rate': (month_savings / month_income * 100) if month_income > 0 else 0
             })
-        
-        # Get top spending categories for the year (from both models)
-        year_categories = {}
-        
-        # Add expenses from Expense model
-        year_expenses = Expense.objects.filter(user=request.user, date__year=now.year)
-        for expense in year_expenses:
-            if expense.category:
-                cat_name = expense.category.name
-                if cat_name in year_categories:
-                    year_categories[cat_name] += expense.amount
-                else:
-                    year_categories[cat_name] = expense.amount
-        
-        # Add expenses from Transaction model
-        year_transactions = Transaction.objects.filter(user=request.user, date__year=now.year)
-        for transaction in year_transactions:
-            if transaction.category:
-                cat_name = transaction.category
-                if cat_name in year_categories:
-                    year_categories[cat_name] += transaction.amount or 0
-                else:
-                    year_categories[cat_name] = transaction.amount or 0
-        
-        year_category_totals = [{'category': k, 'amount': v} for k, v in year_categories.items()]
+        return historical_spending
+    
+    def year_category_totals(self, context):
+        """Top spending categories for the year"""
+        now = timezone.now()
+        year_category_totals = [
+            {'category': row['category'], 'amount': row['total'] or 0}
+            for row in LedgerEntry.objects.for_user(context.user).in_period(year_range(now.year)).category_totals()
+            if row['category']
+        ]
         year_category_totals.sort(key=lambda x: x['amount'], reverse=True)
-        
-        # Get top vendors/merchants with detailed info (from both models)
-        # For Expense model
-        expense_vendors = Expense.objects.filter(
-            user=request.user, 
-            date__year=now.year, 
-            date__month=now.month
-        ).values('merchant').annotate(
-            total=Sum('amount'),
-            count=models.Count('id'),
-            avg_amount=Sum('amount') / models.Count('id')
-        )
-        
-        # For Transaction model (using description as merchant)
-        transaction_vendors = Transaction.objects.filter(
-            user=request.user, 
-            date__year=now.year, 
-            date__month=now.month
-        ).values('description').annotate(
-            total=Sum('amount'),
-            count=models.Count('id'),
-            avg_amount=Sum('amount') / models.Count('id')
-        )
-        
-        # Combine and sort by total
-        top_vendors = list(expense_vendors) + list(transaction_vendors)
-        top_vendors.sort(key=lambda x: x['total'], reverse=True)
-        top_vendors = top_vendors[:10]
-        
-        # Get average spending by category for last 6 months
+        return year_category_totals
+    
+    def top_vendors(self, context):
+        """This month's top vendors/merchants, grouped on the normalized merchant id"""
+        now = timezone.now()
+        top_vendors = vendor_totals(LedgerEntry.objects.for_user(context.user).in_month(now.year, now.month))
+        for vendor in top_vendors:
+            vendor['avg_amount'] = vendor['total'] / vendor['count']
+        return top_vendors
+    
+    def avg_category_spending(self, context):
+        """
+        Average spending by category for the last 6 months (averaged over
+        the months in which the category had any spending)
+        """
+        now = timezone.now()
+        six_month_rows = LedgerEntry.objects.for_user(context.user)\
+                                            .in_period(months_back_range(now.date(), 6))\
+                                            .annotate(period=TruncMonth('date'))\
+                                            .values('period', 'category')\
+                                            .annotate(total=sum_in())
         avg_category_spending = {}
-        for i in range(6):
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            
-            # Get category spending from both models
-            expense_categories = Expense.objects.filter(
-                user=request.user, 
-                date__year=year, 
-                date__month=month
-            ).values('category__name').annotate(total=Sum('amount'))
-            
-            transaction_categories = Transaction.objects.filter(
-                user=request.user, 
-                date__year=year, 
-                date__month=month
-            ).values('category').annotate(total=Sum('amount'))
-            
-            # Combine category data
-            month_categories = {}
-            for cat in expense_categories:
-                cat_name = cat['category__name']
-                if cat_name in month_categories:
-                    month_categories[cat_name] += cat['total']
-                else:
-                    month_categories[cat_name] = cat['total']
-            
-            for cat in transaction_categories:
-                cat_name = cat['category']
-                if cat_name in month_categories:
-                    month_categories[cat_name] += cat['total']
-                else:
-                    month_categories[cat_name] = cat['total']
-            
-            for cat_name, total in month_categories.items():
-                if cat_name not in avg_category_spending:
-                    avg_category_spending[cat_name] = []
-                avg_category_spending[cat_name].append(total)
+        for row in six_month_rows:
+            avg_category_spending.setdefault(row['category'], []).append(row['total'])
         
         # Calculate averages
         for cat_name in avg_category_spending:
             avg_category_spending[cat_name] = sum(avg_category_spending[cat_name]) / len(avg_category_spending[cat_name])
+        return avg_category_spending
+    
+    def month_figures(self, user):
+        """This month's income, spending and spending per category, largest first"""
+        now = timezone.now()
+        monthly_income = MonthlyIncome.objects.filter(user=user, month=now.month, year=now.year).aggregate(total=Sum('amount'))['total'] or 0
         
-        # Get spending trends and patterns
-        spending_trends = self.analyze_spending_trends(historical_spending)
-        
-        # Get budget information if available
-        budget_info = self.get_budget_analysis(request.user, category_totals, monthly_income)
+        # Both Expense and Transaction models via the ledger view
+        current_month = LedgerEntry.objects.for_user(user).in_month(now.year, now.month)
+        total_expenses = current_month.total()
         
-        # Check for greetings and non-financial messages first
+        # Get category spending data for current month
+        category_totals = [
+            {'category': row['category'], 'amount': row['total']}
+            for row in current_month.category_totals()
+            if row['category'] and (row['total'] or 0) > 0
+        ]
+        return {
+            'monthly_income': monthly_income,
+            'total_expenses': total_expenses,
+            'category_totals': category_totals
+        }
+    
+    def intent_reply(self, context, user_message):
+        """
+        Answer to a factual question (see intents.py), or None for the model.
+        This month's figures are read from ``context``, which keeps them.
+        """
+        intent = classify_intent(user_message)
+        reply = answer_intent(intent, context) if intent else None
+        intent_stats.record(intent.name if reply else None)
+        return reply
+    
+    def canned_reply(self, user_message):
+        """Reply to greetings and other non-financial messages, or None"""
         user_message_lower = user_message.lower()
         
         # Handle greetings and non-financial messages
         if any(word == user_message_lower.strip() for word in ['hello', 'hi', 'hey', 'greetings']):
-            response = "Hello! I'm your comprehensive AI financial advisor with complete knowledge of your financial data. I can help you with spending analysis, savings tracking, budget monitoring, spending trends, vendor analysis, and personalized financial advice. Ask me anything about your finances!"
+            return "Hello! I'm your comprehensive AI financial advisor with complete knowledge of your financial data. I can help you with spending analysis, savings tracking, budget monitoring, spending trends, vendor analysis, and personalized financial advice. Ask me anything about your finances!"
         elif any(phrase in user_message_lower for phrase in ['how are you', 'how do you do', 'what\'s up']):
-            response = "I'm doing well, thank you! I'm your AI financial advisor ready to help you with comprehensive financial analysis, spending insights, budget tracking, and personalized advice. What would you like to know about your finances?"
+            return "I'm doing well, thank you! I'm your AI financial advisor ready to help you with comprehensive financial analysis, spending insights, budget tracking, and personalized advice. What would you like to know about your finances?"
         elif any(phrase in user_message_lower for phrase in ['thanks', 'thank you', 'bye', 'goodbye']):
-            response = "You're welcome! Feel free to ask me about your finances anytime. I'm here to provide comprehensive financial insights and analysis."
-        else:
-            # Use OpenAI AI service for financial questions
-            try:
-                from .openai_service import OpenAIAIService
-                
-                ai_service = OpenAIAIService()
-                
-                # Prepare financial context for AI
-                financial_context = {
-                    'monthly_income': monthly_income,
-                    'total_expenses': total_expenses,
-                    'category_totals': category_totals,
-                    'all_category_totals': all_category_totals,
-                    'historical_spending': historical_spending,
-                    'year_category_totals': year_category_totals,
-                    'top_vendors': top_vendors,
-                    'avg_category_spending': avg_category_spending,
-                    'transaction_details': transaction_details,
-                    'spending_trends': spending_trends,
-                    'budget_info': budget_info
-                }
-                
-                response = ai_service.generate_response(user_message, financial_context)
-                
-            except Exception as e:
-                print(f"OpenAI AI service error: {str(e)}")
-                # Fallback to rule-based response if AI service fails
-                response = self.generate_enhanced_response(
-                    user_message, 
-                    monthly_income, 
-                    total_expenses, 
-                    category_totals,
-                    historical_spending,
-                    year_category_totals,
-                    top_vendors,
-                    avg_category_spending,
-                    transaction_details,
-                    spending_trends,
-                    budget_info
-                )
-        
-        return Response({'message': response, 'timestamp': timezone.now()})
+            return "You're welcome! Feel free to ask me about your finances anytime. I'm here to provide comprehensive financial insights and analysis."
+        return None
     
-    def analyze_spending_trends(self, historical_spending):
-        """Analyze spending trends and patterns"""
-        if len(historical_spending) < 2:
-            return {'trend': 'insufficient_data', 'message': 'Need more data to analyze trends'}
-        
-        # Calculate month-over-month changes
-        recent_months = historical_spending[:3]  # Last 3 months
-        avg_recent_spending = sum([m['expenses'] for m in recent_months]) / len(recent_months)
-        avg_older_spending = sum([m['expenses'] for m in historical_spending[3:6]]) / 3 if len(historical_spending) >= 6 else avg_recent_spending
-        
-        spending_change = ((avg_recent_spending - avg_older_spending) / avg_older_spending * 100) if avg_older_spending > 0 else 0
-        
-        # Determine trend
-        if spending_change > 10:
-            trend = 'increasing'
-            message = f'Your spending has increased by {abs(spending_change):.1f}% compared to previous months'
-        elif spending_change < -10:
-            trend = 'decreasing'
-            message = f'Your spending has decreased by {abs(spending_change):.1f}% compared to previous months'
-        else:
-            trend = 'stable'
-            message = 'Your spending has remained relatively stable'
-        
-        return {
-            'trend': trend,
-            'change_percentage': spending_change,
-            'message': message,
-            'avg_recent_spending': avg_recent_spending,
-            'avg_older_spending': avg_older_spending
-        }
+    def rule_based_response(self, user_message, context):
+        """``generate_enhanced_response`` over a context from ``build_financial_context``"""
+        return self.generate_enhanced_response(
+            user_message,
+            context['monthly_income'],
+            context['total_expenses'],
+            context['category_totals'],
+            context['historical_spending'],
+            context['year_category_totals'],
+            context['top_vendors'],
+            context['avg_category_spending'],
+            context['transaction_details'],
+            context['spending_trends'],
+            context['budget_info']
+        )
     
     def get_budget_analysis(self, user, category_totals, monthly_income):
         """Get budget analysis and recommendations"""
@@ -606,13 +646,14 @@ class ChatView(APIView):
         }
         
         # Check if user has set budgets
-        user_budgets = Budget.objects.filter(user=user)
+        # Limits converted to the base currency, like the ledger totals
+        user_budgets = Budget.objects.filter(user=user).select_related('category').annotate(converted=amount_in())
         if user_budgets.exists():
             budget_info['has_budgets'] = True
             
             for budget in user_budgets:
                 category_name = budget.category.name if budget.category else 'Overall'
-                budget_limit = budget.amount
+                budget_limit = budget.converted
                 
                 # Find actual spending for this category
                 actual_spending = 0
@@ -652,14 +693,14 @@ class ChatView(APIView):
             if savings_rate < 20:
                 budget_info['recommendations'].append('Consider saving at least 20% of your income')
             
-            if category_totals and category_totals[0]['amount'] > float(monthly_income) * 0.3:
+            if category_totals and category_totals[0]['amount'] * 10 > monthly_income * 3:
                 budget_info['recommendations'].append(f"Your {category_totals[0]['category']} spending is over 30% of your income - consider reducing it")
         
         return budget_info
         
     def generate_ollama_response(self, user_message, monthly_income, total_expenses, category_totals, historical_spending, year_category_totals, top_vendors, avg_category_spending, transaction_details, spending_trends, budget_info):
         try:
-            import requests
+            from .llm_transport import get_transport
             
             # Create comprehensive financial context
             savings = monthly_income - total_expenses
@@ -707,8 +748,8 @@ RESPONSE:"""
             llm_api_url = f"{settings.LLM_SETTINGS['API_URL']}/generate"
             llm_model = settings.LLM_SETTINGS['DEFAULT_MODEL']
             
-            # Make request to LLM API
-            response = requests.post(
+            # Make request to LLM API over the shared keep-alive session
+            response = get_transport().post(
                 llm_api_url,
                 json={
                     "model": llm_model,
@@ -848,8 +889,8 @@ RESPONSE:"""
                 suggestions = []
                 if savings_rate < 20:
                     suggestions.append("aim to save at least 20% of your income")
-                if category_totals[0]['amount'] > float(monthly_income) * 0.3:
-                    suggestions.append(f"consider reducing spending in {category_totals[0]['category']} which is {((category_totals[0]['amount'] / float(monthly_income)) * 100):.1f}% of your income")
+                if category_totals[0]['amount'] * 10 > monthly_income * 3:
+                    suggestions.append(f"consider reducing spending in {category_totals[0]['category']} which is {(category_totals[0]['amount'] / monthly_income * 100):.1f}% of your income")
                 
                 if len(suggestions) > 0:
                     return f"To **improve your savings** (currently {savings_rate:.1f}%), I suggest:\n\n✅ {', '.join(suggestions)}\n\n💸 **Highest Spending**: {category_totals[0]['category']} at NPR {category_totals[0]['amount']:,.2f}{rec_text}\n\n💡 **Quick Wins**:\n• Review subscriptions and cancel unused ones\n• Cook more meals at home\n• Use public transport when possible\n• Set up automatic savings transfers"
@@ -941,6 +982,177 @@ Just ask me anything about your finances, and I'll provide personalized insights
             # Only provide financial info if user asks a specific question
             return "I'm here to help with your finances. Ask me about your spending, budget, savings, or any financial questions!"
 
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def iterate_in_thread(iterator):
+    """
+    ``iterator`` as an async iterator, each step run in the request's
+    thread. Under ASGI, Django reads a synchronous streaming body to the
+    end before sending any of it.
+    """
+    step = sync_to_async(next)
+    end = object()
+    try:
+        while (item := await step(iterator, end)) is not end:
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            await sync_to_async(close)()
+
+def streaming_content(request, iterator):
+    """A streaming body for ``request``'s server: async under ASGI, as is under WSGI"""
+    if isinstance(request._request, ASGIRequest):
+        return iterate_in_thread(iterator)
+    return iterator
+
+class ChatStreamView(ChatView):
+    """
+    Chat answers as server-sent events, forwarded while the model produces
+    them instead of after the whole completion:
+
+    - ``token``: ``{"text": ...}``, the next piece of the answer
+    - ``message``: ``{"text": ...}``, a whole answer from the rule-based
+      generator when the model is not used or fails before answering
+    - ``error``: ``{"error": ...}``, the model failed part-way through
+    - ``done``: ``{"timestamp": ...}``, always last
+
+    Takes the same ``{"message": ...}`` POST body as ChatView. Under ASGI
+    the events are read from the model in the request's thread, one at a
+    time, so they are still sent as they arrive.
+    """
+    
+    def post(self, request):
+        user_message = request.data.get('message', '').lower()
+        answers = get_chat_cache()
+        version = data_version_token(request.user.pk)
+        
+        # The prompt's database work happens here, before the response starts streaming
+        context = self.build_financial_context(request.user)
+        reply = self.canned_reply(user_message)
+        if reply is None:
+            reply = self.intent_reply(context, user_message)
+        if reply is None and answers:
+            reply = answers.lookup(request.user.pk, user_message, version)
+        ai_service = store = None
+        if reply is None:
+            from .openai_service import OpenAIAIService
+            ai_service = OpenAIAIService()
+            prompt_sections = context.load(ai_service.REQUIRED_SECTIONS)
+            if answers:
+                digest = context_digest(prompt_sections, ai_service.model)
+                reply = answers.revalidate(request.user.pk, user_message, version, digest)
+                store = functools.partial(answers.store, request.user.pk, user_message, version, digest)
+        
+        response = StreamingHttpResponse(
+            streaming_content(request, self.events(user_message, context, reply, ai_service, store)),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def events(self, user_message, context, reply, ai_service, store=None):
+        if reply is None:
+            sent_tokens = []
+            try:
+                for token in ai_service.stream_response(user_message, context):
+                    sent_tokens.append(token)
+                    yield sse_event('token', {'text': token})
+                if store and sent_tokens:
+                    store(''.join(sent_tokens).strip())
+            except Exception as e:
+                logger.warning("Streaming chat failed: %s", e)
+                if sent_tokens:
+                    yield sse_event('error', {'error': 'The answer was cut short. Please try again.'})
+                else:
+                    reply = self.rule_based_response(user_message, context)
+        if reply is not None:
+            yield sse_event('message', {'text': reply})
+        yield sse_event('done', {'timestamp': timezone.now().isoformat()})
+
+class AsyncChatView(ChatView):
+    """
+    ChatView as a coroutine, for ASGI servers (``budjet_backend.asgi``).
+    The model is called through the async LLM transport, so a request
+    waiting on the model holds no worker thread. Same request and response
+    as ChatView.
+    
+    DRF's APIView is synchronous: its dispatch (authentication, permission
+    checks) runs in a thread and hands back the handler's coroutine, which
+    is awaited here. The prompt's sections and the rule-based fallback are
+    read in the request's thread too.
+    """
+    
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            response = await sync_to_async(super().dispatch)(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                try:
+                    response = await response
+                except Exception as exc:
+                    response = self.handle_exception(exc)
+                self.response = response = super().finalize_response(self.request, response, *args, **kwargs)
+            return response
+        finally:
+            if not isinstance(request, ASGIRequest):
+                # Under WSGI the event loop ends with the request
+                await aclose_async_transport()
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        # The handler's coroutine is finalized by dispatch once awaited
+        if asyncio.iscoroutine(response):
+            return response
+        return super().finalize_response(request, response, *args, **kwargs)
+    
+    async def post(self, request):
+        user_message = request.data.get('message', '').lower()
+        user = request.user
+        
+        figures = None
+        response = self.canned_reply(user_message)
+        if response is None:
+            intent = classify_intent(user_message)
+            if intent:
+                figures = await sync_to_async(self.month_figures)(user)
+                response = answer_intent(intent, figures)
+            intent_stats.record(intent.name if response else None)
+        if response is not None:
+            return Response({'message': response, 'timestamp': timezone.now()})
+        
+        answers = get_chat_cache()
+        version = await sync_to_async(data_version_token)(user.pk)
+        if answers:
+            response = answers.lookup(user.pk, user_message, version)
+            if response is not None:
+                return Response({'message': response, 'timestamp': timezone.now(), 'cached': True})
+        
+        context = self.build_financial_context(user, figures)
+        try:
+            from .openai_service import OpenAIAIService
+            
+            ai_service = OpenAIAIService()
+            await ai_service.aensure_available()
+            
+            prompt_sections = await sync_to_async(context.load)(ai_service.REQUIRED_SECTIONS)
+            digest = context_digest(prompt_sections, ai_service.model)
+            
+            response = answers.revalidate(user.pk, user_message, version, digest) if answers else None
+            if response is None:
+                response = await ai_service.aanswer(user_message, prompt_sections)
+                if answers:
+                    answers.store(user.pk, user_message, version, digest, response)
+        
+        except Exception as e:
+            logger.warning("OpenAI AI service error: %s", e)
+            # Fallback to rule-based response if AI service fails
+            response = await sync_to_async(self.rule_based_response)(user_message, context)
+        
+        return Response({'message': response, 'timestamp': timezone.now()})
+
 # Authentication Views
 class LoginView(APIView):
     permission_classes = []
@@ -1163,6 +1375,10 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class CategoryListView(generics.ListAPIView):
     serializer_class = CategorySerializer
     
+    @etag_user_response('category-list')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def get_queryset(self):
         return Category.objects.all().order_by('name')
 
@@ -1172,8 +1388,14 @@ class PaymentMethodListView(generics.ListAPIView):
     def get_queryset(self):
         return PaymentMethod.objects.all().order_by('name')
 
-class ExpenseListView(generics.ListAPIView):
+class ExpenseListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = ExpenseSerializer
+    values_serializer_class = ExpenseValuesSerializer
+    pagination_class = DateKeysetPagination
+    
+    @etag_user_response('expense-list')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
         queryset = Expense.objects.filter(user=self.request.user).select_related('category', 'payment_method')
@@ -1195,9 +1417,9 @@ class ExpenseListView(generics.ListAPIView):
             try:
                 y = int(year) if year else now.year
                 m = int(month) if month else now.month
-                queryset = queryset.filter(date__year=y, date__month=m)
+                queryset = queryset.filter(**date_range_filter(month_range(y, m)))
             except Exception:
-                queryset = queryset.filter(date__year=now.year, date__month=now.month)
+                queryset = queryset.filter(**date_range_filter(month_range(now.year, now.month)))
         
         if start_date:
             queryset = queryset.filter(date__gte=start_date)
@@ -1217,69 +1439,131 @@ class ExpenseListView(generics.ListAPIView):
         if merchant:
             queryset = queryset.filter(merchant__icontains=merchant)
         
-        # Order by date (newest first)
-        queryset = queryset.order_by('-date')
-
-        # Optional simple pagination via query params: limit & offset
-        try:
-            limit = int(self.request.query_params.get('limit')) if self.request.query_params.get('limit') else None
-            offset = int(self.request.query_params.get('offset', 0))
-        except ValueError:
-            limit = None
-            offset = 0
-        
-        if limit is not None:
-            return queryset[offset:offset+limit]
+        # Ordered by (date, id), newest first, and paged by the paginator
         return queryset
 
 class ExpenseStatsView(APIView):
-    def get(self, request):
+    @etag_user_response('expense-stats')
+    @cache_user_response('expense-stats')
+    @with_reporting_currency
+    def get(self, request, currency):
         user = request.user
         now = timezone.now()
         
         # Get total expenses for current month (from both Expense and Transaction models)
-        expense_total = Expense.objects.filter(
-            user=user,
-            date__year=now.year,
-            date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        transaction_total = Transaction.objects.filter(
-            user=user,
-            date__year=now.year,
-            date__month=now.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        current_month_expenses = expense_total + transaction_total
+        current_month_expenses = LedgerEntry.objects.for_user(user).in_month(now.year, now.month).total(currency)
         
         # Get expenses by category for current month
+        current_month = date_range_filter(month_range(now.year, now.month))
         category_expenses = Expense.objects.filter(
             user=user,
-            date__year=now.year,
-            date__month=now.month
+            **current_month
         ).values('category__name').annotate(
-            total=Sum('amount'),
+            total=sum_in(currency),
             count=models.Count('id')
         ).order_by('-total')
         
         # Get top merchants
-        top_merchants = Expense.objects.filter(
-            user=user,
-            date__year=now.year,
-            date__month=now.month
-        ).values('merchant').annotate(
-            total=Sum('amount'),
-            count=models.Count('id')
-        ).order_by('-total')[:5]
+        top_merchants = vendor_totals(Expense.objects.filter(user=user, **current_month), limit=5, currency=currency)
         
         # Get recent expenses
         recent_expenses = Expense.objects.filter(user=user).select_related('category', 'payment_method').order_by('-date')[:10]
         
         return Response({
             'current_month_total': current_month_expenses,
+            'currency': currency,
             'category_breakdown': list(category_expenses),
-            'top_merchants': list(top_merchants),
+            'top_merchants': top_merchants,
             'recent_expenses': ExpenseSerializer(recent_expenses, many=True).data
         })
 
+class SearchView(APIView):
+    """
+    Ranked full-text search over the user's expenses and receipt text.
+
+    Query parameters:
+    - ``q``: words to search for; the last word also matches as a prefix
+    - ``source``: ``expense`` or ``transaction`` to search only one of them
+    - ``limit``: maximum number of results (default 20, at most 100)
+    """
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        source = request.query_params.get('source')
+        if source and source not in full_text_search.SOURCES:
+            return Response({
+                'error': f"Unknown source. Choose one of: {', '.join(full_text_search.SOURCES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        
+        # Search and return the matches, best first
+        results = full_text_search.search(request.user, query, [source] if source else None, limit)
+        return Response({
+            'query': query,
+            'count': len(results),
+            'results': results
+        })
+
+class MerchantAutocompleteView(APIView):
+    """
+    Merchant suggestions for expense entry, ranked by frequency and recency.
+    Served from an in-memory prefix index; ``q`` is the typed prefix.
+    """
+    
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 8)), 25))
+        except ValueError:
+            limit = 8
+        
+        return Response({
+            'query': query,
+            'suggestions': suggest_merchants(request.user, query, limit)
+        })
+
+class SpendingInsightsView(APIView):
+    """
+    Spending trends, anomalies, seasonality and month-end projection for the
+    user. Served from the stored analysis, which is recomputed when the
+    user's data has changed or ``refresh=1`` is passed.
+    """
+    
+    def get(self, request):
+        insight = get_user_insights(request.user, refresh=request.query_params.get('refresh') == '1')
+        return Response({
+            **insight.data,
+            'currency': base_currency(),
+            'computed_at': insight.computed_at
+        })
+
+class SpendingForecastView(APIView):
+    """
+    Projected month-end spending per category for the current month, with
+    budget status. Reads running totals kept up to date as expenses and
+    transactions are saved, so the cost doesn't grow with history.
+    """
+    
+    @with_reporting_currency
+    def get(self, request, currency):
+        return Response(get_forecast(request.user, currency=currency))
+
+class CacheStatsView(APIView):
+    """Hit rates of the per-user response cache, the chat answer cache and the chat intent router"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        answers = get_chat_cache()
+        return Response({
+            **get_cache_stats(),
+            # Per process, unlike the response cache counters
+            'chat_answers': answers.stats() if answers else None,
+            'chat_intents': intent_stats.snapshot()
+        })
+
 class ExpenseExtractionView(APIView):
     """
     Extract structured expense data from uploaded receipts/bills with enhanced quality control.
@@ -1340,7 +1624,7 @@ class ExpenseExtractionView(APIView):
                         amount=item['amount'],
                         category=category,
                         date=extracted_data.get('date') or datetime.now().date(),
-                        vendor=extracted_data.get('vendor', 'Unknown'),
+                        vendor=resolve_merchant(extracted_data.get('vendor')),
                         source_file=uploaded_file.name
                     )
                     transactions.append({
@@ -1456,7 +1740,7 @@ class BulkExpenseExtractionView(APIView):
                                 amount=item['amount'],
                                 category=category,
                                 date=extracted_data.get('date') or datetime.now().date(),
-                                vendor=extracted_data.get('vendor', 'Unknown'),
+                                vendor=resolve_merchant(extracted_data.get('vendor')),
                                 source_file=uploaded_file.name
                             )
                             transactions.append({
@@ -1523,138 +1807,92 @@ class BulkExpenseExtractionView(APIView):
             )
 
 class DeleteUserDataView(APIView):
-    """Delete all user data for privacy compliance"""
+    """
+    Delete all user data for privacy compliance.
+
+    Deletion runs as a background job (see receipts/jobs.py); the response
+    is returned straight away with the job to poll for progress.
+    """
     
     def post(self, request):
         try:
-            user = request.user
-            
-            # Delete all user-related data
-            deleted_data = {
-                'expenses': 0,
-                'transactions': 0,
-                'budgets': 0,
-                'monthly_incomes': 0,
-                'custom_categories': 0
-            }
-            
-            # Delete expenses
-            expenses_count = Expense.objects.filter(user=user).count()
-            Expense.objects.filter(user=user).delete()
-            deleted_data['expenses'] = expenses_count
-            
-            # Delete transactions
-            transactions_count = Transaction.objects.filter(user=user).count()
-            Transaction.objects.filter(user=user).delete()
-            deleted_data['transactions'] = transactions_count
-            
-            # Delete budgets
-            budgets_count = Budget.objects.filter(user=user).count()
-            Budget.objects.filter(user=user).delete()
-            deleted_data['budgets'] = budgets_count
-            
-            # Delete monthly incomes
-            incomes_count = MonthlyIncome.objects.filter(user=user).count()
-            MonthlyIncome.objects.filter(user=user).delete()
-            deleted_data['monthly_incomes'] = incomes_count
-            
-            # Delete custom categories (user-specific categories)
-            custom_categories_count = Category.objects.filter(user=user).count()
-            Category.objects.filter(user=user).delete()
-            deleted_data['custom_categories'] = custom_categories_count
+            job, created = start_deletion_job(request.user)
             
             return Response({
-                'message': 'All user data deleted successfully',
-                'deleted_data': deleted_data
-            }, status=status.HTTP_200_OK)
+                'message': 'Data deletion started' if created else 'Data deletion already in progress',
+                'job': DataDeletionJobSerializer(job).data,
+                'status_url': request.build_absolute_uri(f'{job.pk}/')
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             return Response({
                 'error': f'Error deleting user data: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class DataDeletionJobView(APIView):
+    """Status and progress of one of the user's data deletion jobs"""
+    
+    def get(self, request, job_id):
+        job = DataDeletionJob.objects.filter(user=request.user, pk=job_id).first()
+        if job is None:
+            return Response({'error': 'Deletion job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DataDeletionJobSerializer(job).data)
+
 class ExportUserDataView(APIView):
-    """Export all user data for data portability"""
+    """
+    Export all user data for data portability.
+
+    The export is streamed table by table, so memory stays flat no matter how
+    many rows a user has. Query parameters:
+    - ``export_format``: ``json`` (default), ``ndjson``, ``csv``, or
+      ``parquet`` / ``arrow`` for a zip of typed columnar files
+    - ``table``: table to export as CSV (default ``expenses``)
+    - ``compress``: ``gzip`` to compress the stream
+    """
     
     def get(self, request):
-        try:
-            user = request.user
-            
-            # Gather all user data
-            user_data = {
-                'user_info': {
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'date_joined': user.date_joined.isoformat()
-                },
-                'expenses': [],
-                'transactions': [],
-                'budgets': [],
-                'monthly_incomes': [],
-                'custom_categories': []
-            }
-            
-            # Export expenses
-            expenses = Expense.objects.filter(user=user).select_related('category', 'payment_method')
-            for expense in expenses:
-                user_data['expenses'].append({
-                    'date': expense.date.isoformat(),
-                    'merchant': expense.merchant,
-                    'amount': float(expense.amount),
-                    'currency': expense.currency,
-                    'category': expense.category.name if expense.category else None,
-                    'payment_method': expense.payment_method.name if expense.payment_method else None,
-                    'description': expense.description,
-                    'created_at': expense.created_at.isoformat()
-                })
-            
-            # Export transactions
-            transactions = Transaction.objects.filter(user=user)
-            for transaction in transactions:
-                user_data['transactions'].append({
-                    'description': transaction.description,
-                    'amount': float(transaction.amount) if transaction.amount else None,
-                    'category': transaction.category,
-                    'date': transaction.date.isoformat() if transaction.date else None,
-                    'created_at': transaction.created_at.isoformat()
-                })
-            
-            # Export budgets
-            budgets = Budget.objects.filter(user=user).select_related('category')
-            for budget in budgets:
-                user_data['budgets'].append({
-                    'category': budget.category.name,
-                    'amount': float(budget.amount),
-                    'currency': budget.currency,
-                    'month': budget.month,
-                    'year': budget.year
-                })
-            
-            # Export monthly incomes
-            monthly_incomes = MonthlyIncome.objects.filter(user=user)
-            for income in monthly_incomes:
-                user_data['monthly_incomes'].append({
-                    'amount': float(income.amount),
-                    'month': income.month,
-                    'year': income.year,
-                    'created_at': income.created_at.isoformat()
-                })
-            
-            # Export custom categories
-            custom_categories = Category.objects.filter(user=user)
-            for category in custom_categories:
-                user_data['custom_categories'].append({
-                    'name': category.name
-                })
-            
-            return Response(user_data, status=status.HTTP_200_OK)
-            
-        except Exception as e:
+        export_format = request.query_params.get('export_format', 'json')
+        table = request.query_params.get('table', 'expenses')
+        compress = request.query_params.get('compress') == 'gzip'
+        
+        if export_format in columnar_export.FILE_FORMATS:
+            return self.columnar_response(request, export_format)
+        
+        if export_format not in EXPORT_FORMATS:
             return Response({
-                'error': f'Error exporting user data: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': f"Unsupported export format. Choose one of: {', '.join(EXPORT_FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if export_format == 'csv' and table not in EXPORT_TABLES:
+            return Response({
+                'error': f"Unknown table. Choose one of: {', '.join(EXPORT_TABLES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        filename = f"smartbudget-data-{timezone.localdate().isoformat()}"
+        if export_format == 'csv':
+            filename += f"-{table}"
+        filename += f".{export_format}"
+        
+        content_type = EXPORT_CONTENT_TYPES[export_format]
+        if compress:
+            # A .gz download rather than Content-Encoding, which clients would transparently undo
+            filename += '.gz'
+            content_type = 'application/gzip'
+        
+        response = StreamingHttpResponse(
+            streaming_content(request, export_stream(request.user, export_format, table, compress)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    def columnar_response(self, request, file_format):
+        """Expenses and transactions as Parquet/Arrow files in one zip"""
+        if not columnar_export.is_available():
+            return Response({'error': 'pyarrow not installed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        archive, _ = columnar_export.export_user_archive(request.user, file_format)
+        filename = f"smartbudget-data-{timezone.localdate().isoformat()}-{file_format}.zip"
+        return FileResponse(archive, as_attachment=True, filename=filename, content_type='application/zip')
 
 class PrivacySettingsView(APIView):
     """Manage user privacy settings"""
@@ -34,7 +34,7 @@ export const AuthTest: React.FC = () => {
       
       const response = await apiService.getTransactions();
       console.log('Transactions response:', response.data);
-      setTransactions(response.data);
+      setTransactions(response.data.results);
     } catch (error: any) {
       console.error('API Error:', error);
       setError(error.response?.data?.detail || error.message);
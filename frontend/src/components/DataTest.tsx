@@ -34,8 +34,8 @@ export default function DataTest() {
           expenseStats: expenseStats.data,
           categories: categories.data,
           paymentMethods: paymentMethods.data,
-          expenses: expenses.data,
-          transactions: transactions.data
+          expenses: expenses.data.results,
+          transactions: transactions.data.results
         });
       } catch (err: any) {
         console.error('Data fetch error:', err);
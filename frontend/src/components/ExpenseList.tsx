@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { apiService, Expense, ExpenseStats } from '@/lib/api';
+import { apiService, Expense, ExpenseStats, MerchantSuggestion } from '@/lib/api';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
@@ -18,12 +18,13 @@ export default function ExpenseList() {
   const [month, setMonth] = useState<number>(new Date().getMonth() + 1);
   const [year, setYear] = useState<number>(new Date().getFullYear());
   const [limit, setLimit] = useState<number>(20);
-  const [offset, setOffset] = useState<number>(0);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [stats, setStats] = useState<ExpenseStats | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [categories, setCategories] = useState<Category[]>([]);
   const [dashboardSummary, setDashboardSummary] = useState<any>(null);
+  const [merchantSuggestions, setMerchantSuggestions] = useState<MerchantSuggestion[]>([]);
   const [filters, setFilters] = useState({
     category: 'all',
     merchant: '',
@@ -38,6 +39,16 @@ export default function ExpenseList() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [filters, month, year]);
 
+  useEffect(() => {
+    if (!filters.merchant) {
+      setMerchantSuggestions([]);
+      return;
+    }
+    apiService.getMerchantSuggestions(filters.merchant)
+      .then((res) => setMerchantSuggestions(res.data.suggestions))
+      .catch(() => setMerchantSuggestions([]));
+  }, [filters.merchant]);
+
   const fetchAllData = async (reset: boolean = false) => {
     setLoading(true);
     setError(null);
@@ -47,8 +58,8 @@ export default function ExpenseList() {
       const params = getFilterParams();
       params.month = month;
       params.year = year;
-      params.limit = limit;
-      params.offset = reset ? 0 : offset;
+      params.page_size = limit;
+      if (!reset && cursor) params.cursor = cursor;
 
       const [expensesRes, statsRes, categoriesRes, dashboardRes] = await Promise.all([
         apiService.getExpenses(params),
@@ -58,7 +69,7 @@ export default function ExpenseList() {
       ]);
 
       console.log('Data fetched successfully:', {
-        expenses: expensesRes.data?.length,
+        expenses: expensesRes.data?.results?.length,
         stats: statsRes.data,
         categories: categoriesRes.data?.length,
         dashboard: dashboardRes.data
@@ -71,12 +82,12 @@ export default function ExpenseList() {
       console.log('🔍 DEBUG - Stats Data:', statsRes.data);
       console.log('🔍 DEBUG - Current Month Total:', statsRes.data?.current_month_total);
 
-      const newExpenses = expensesRes.data || [];
+      const newExpenses = expensesRes.data?.results || [];
       setExpenses(reset ? newExpenses : [...expenses, ...newExpenses]);
       setStats(statsRes.data);
       setCategories(categoriesRes.data || []);
       setDashboardSummary(dashboardRes.data);
-      setOffset((reset ? 0 : offset) + (newExpenses.length || 0));
+      setCursor(expensesRes.data?.next ? new URL(expensesRes.data.next).searchParams.get('cursor') : null);
     } catch (err: any) {
       console.error('Data fetch error:', err);
       console.error('Error details:', {
@@ -123,7 +134,7 @@ export default function ExpenseList() {
     });
     setMonth(new Date().getMonth() + 1);
     setYear(new Date().getFullYear());
-    setOffset(0);
+    setCursor(null);
     fetchAllData(true);
   };
 
@@ -274,9 +285,15 @@ export default function ExpenseList() {
               <label className="text-sm font-medium">Merchant</label>
               <Input
                 placeholder="Search merchant..."
+                list="merchant-suggestions"
                 value={filters.merchant}
                 onChange={(e) => setFilters({...filters, merchant: e.target.value})}
               />
+              <datalist id="merchant-suggestions">
+                {merchantSuggestions.map((suggestion) => (
+                  <option key={suggestion.merchant} value={suggestion.merchant} />
+                ))}
+              </datalist>
             </div>
             <div>
               <label className="text-sm font-medium">Amount Range</label>
@@ -364,7 +381,7 @@ export default function ExpenseList() {
                 </div>
               ))}
               <div className="flex justify-center pt-2">
-                <Button variant="outline" onClick={() => fetchAllData(false)}>Show more</Button>
+                <Button variant="outline" onClick={() => fetchAllData(false)} disabled={!cursor}>Show more</Button>
               </div>
             </div>
           )}
@@ -58,7 +58,7 @@ export const SmartBudgetDashboard = () => {
         ]);
 
         setDashboardData(summaryRes.data);
-        setTransactions(txRes.data);
+        setTransactions(txRes.data.results);
         setTrends(trendsRes.data);
         setLoading(false);
       } catch (err: any) {
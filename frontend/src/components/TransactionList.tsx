@@ -26,7 +26,7 @@ export default function TransactionList() {
         };
 
         const res = await axios.get('http://localhost:8000/api/upload-receipt/transactions/', config);
-        setTransactions(res.data);
+        setTransactions(res.data.results);
         setLoading(false);
       } catch (err: any) {
         console.error('Transactions fetch error:', err);
@@ -103,6 +103,7 @@ export const API_ENDPOINTS = {
   // Expenses
   EXPENSES: `${API_PREFIX}/expenses/`,
   EXPENSE_STATS: `${API_PREFIX}/expense-stats/`,
+  MERCHANT_AUTOCOMPLETE: `${API_PREFIX}/merchants/autocomplete/`,
   
   // Transactions
   TRANSACTIONS: `${API_PREFIX}/transactions/`,
@@ -145,12 +146,11 @@ export const apiService = {
     apiClient.post(API_ENDPOINTS.TOKEN_REFRESH, data),
   
   // Dashboard
+  // No cache-busting parameters: the server revalidates with ETags
   getDashboardSummary: () => apiClient.get(API_ENDPOINTS.DASHBOARD_SUMMARY, { 
-    params: { _t: Date.now(), _v: '2.0' }
-  }),
-  getDashboardTrends: () => apiClient.get(API_ENDPOINTS.DASHBOARD_TRENDS, { 
-    params: { _t: Date.now() } 
+    params: { _v: '2.0' }
   }),
+  getDashboardTrends: () => apiClient.get(API_ENDPOINTS.DASHBOARD_TRENDS),
   
   // Budget & Categories
   getBudgetCategories: () => apiClient.get(API_ENDPOINTS.BUDGET_CATEGORIES),
@@ -166,10 +166,14 @@ export const apiService = {
     min_amount?: number;
     max_amount?: number;
     merchant?: string;
+    page_size?: number;
+    cursor?: string;
   }) => apiClient.get(API_ENDPOINTS.EXPENSES, { params }),
   getExpenseStats: () => apiClient.get(API_ENDPOINTS.EXPENSE_STATS, { 
-    params: { _t: Date.now(), _v: '2.0' }
+    params: { _v: '2.0' }
   }),
+  getMerchantSuggestions: (q: string, limit?: number) =>
+    apiClient.get<{ query: string; suggestions: MerchantSuggestion[] }>(API_ENDPOINTS.MERCHANT_AUTOCOMPLETE, { params: { q, limit } }),
   
   // Transactions
   getTransactions: () => apiClient.get(API_ENDPOINTS.TRANSACTIONS),
@@ -225,6 +229,12 @@ export interface DashboardSummary {
   }>;
 }
 
+export interface MerchantSuggestion {
+  merchant: string;
+  uses: number;
+  last_used: string | null;
+}
+
 export interface DashboardTrend {
   month: string;
   income: number;
@@ -289,6 +299,7 @@ export interface ExpenseStats {
     count: number;
   }>;
   top_merchants: Array<{
+    merchant_id: number;
     merchant: string;
     total: number;
     count: number;
@@ -197,6 +197,19 @@ export default function SettingsPage() {
         headers: { 'Authorization': `Bearer ${token}` }
       });
 
+      // Deletion runs in the background; poll the job until it finishes
+      let job = response.data.job;
+      while (job.status === 'pending' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusResponse = await axios.get(`http://localhost:8000/api/upload-receipt/privacy/delete-data/${job.id}/`, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        job = statusResponse.data;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to delete data.');
+      }
+
       toast({
         title: "Data Deleted",
         description: "All your data has been deleted successfully.",
@@ -207,7 +220,7 @@ export default function SettingsPage() {
     } catch (error: any) {
       toast({
         title: "Deletion Failed",
-        description: error.response?.data?.error || "Failed to delete data.",
+        description: error.response?.data?.error || error.message || "Failed to delete data.",
         variant: "destructive",
       });
     } finally {